@@ -1,6 +1,17 @@
 from _bootstrap import *
 
-from pipelines.make_labels import build_labels
+import argparse
+
+from pipelines.make_labels import update_labels
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build labels.parquet; appends new trading days from the online state when possible.")
+    ap.add_argument("--full", action="store_true", help="recompute every label from the full price history")
+    args = ap.parse_args()
+
+    update_labels(full=args.full)
+
 
 if __name__ == "__main__":
-    build_labels()
+    main()
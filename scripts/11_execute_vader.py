@@ -1,5 +1,5 @@
 from _bootstrap import *
-from pipelines.vader_pipeline import run_vader_on_reddit_posts
+from pipelines.vader_pipeline import build_vader_features, run_vader_on_reddit_posts
 
 
 def main() -> None:
@@ -9,6 +9,9 @@ def main() -> None:
     print(f"Input : {result['input']}")
     print(f"Output: {result['output']}")
     print(f"Rows  : {result['rows_written']}")
+    print(f"Texts scored: {result['texts_scored']}")
+
+    build_vader_features()
 
 
 if __name__ == "__main__":
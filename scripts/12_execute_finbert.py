@@ -1,5 +1,5 @@
 from _bootstrap import *
-from pipelines.finbert_pipeline import run_finbert_on_yahoo_news
+from pipelines.finbert_pipeline import build_finbert_features, run_finbert_on_yahoo_news
 
 
 def main() -> None:
@@ -10,6 +10,9 @@ def main() -> None:
     print(f"Input : {result['input']}")
     print(f"Output: {result['output']}")
     print(f"Rows  : {result['rows_written']}")
+    print(f"FinBERT calls: {result['clusters']} (saved {result['inference_saved']} via near-duplicate clustering)")
+
+    build_finbert_features()
 
 
 if __name__ == "__main__":
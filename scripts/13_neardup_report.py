@@ -0,0 +1,17 @@
+from _bootstrap import *
+
+from pipelines.news_dedupe import NEWS_RAW_DIR, near_duplicate_report
+
+
+def main() -> None:
+    # Report over every Yahoo news dump on disk
+    for path in sorted(NEWS_RAW_DIR.glob("yahoo_news_*.jsonl")):
+        r = near_duplicate_report(path)
+        print(
+            f"{path.name}: {r['articles']} articles -> {r['distinct_links']} links -> {r['clusters']} clusters, "
+            f"{r['inference_saved']} FinBERT calls saved ({r['inference_saved_pct']}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
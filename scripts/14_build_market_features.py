@@ -0,0 +1,6 @@
+from _bootstrap import *
+
+from pipelines.market_features import build_market_features
+
+if __name__ == "__main__":
+    build_market_features()
@@ -0,0 +1,6 @@
+from _bootstrap import *
+
+from pipelines.merge_features import merge_all_features
+
+if __name__ == "__main__":
+    merge_all_features()
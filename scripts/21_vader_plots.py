@@ -13,5 +13,6 @@ if __name__ == "__main__":
         score_col="compound",
         group_col="match_term",
         rolling_window_days=5,
+        n_jobs=None,                 # render groups on every core
         verbose=True,
     )
@@ -0,0 +1,6 @@
+from _bootstrap import *
+
+from models.ensemble.model import train_har
+
+if __name__ == "__main__":
+    train_har()
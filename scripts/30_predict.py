@@ -1,3 +1,26 @@
 from _bootstrap import *
 
-print("Prediction routing works")
+import argparse
+
+from models.server import PredictionServer, load_server_config
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve ensemble predictions over local HTTP.")
+    ap.add_argument("--host", help="bind address (default: ensemble.yaml serving.host)")
+    ap.add_argument("--port", type=int, help="port (default: ensemble.yaml serving.port)")
+    ap.add_argument("--model-dir", help="model artifact directory")
+    ap.add_argument("--max-wait-ms", type=float, help="micro-batching window")
+    args = ap.parse_args()
+
+    cfg = load_server_config(
+        host=args.host,
+        port=args.port,
+        model_dir=args.model_dir,
+        max_wait_ms=args.max_wait_ms,
+    )
+    PredictionServer(cfg).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from _bootstrap import *
+
+import argparse
+
+from evaluation.search import run_search
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Walk-forward hyperparameter / feature search (configs/search.yaml).")
+    ap.add_argument("--config", default="search.yaml")
+    ap.add_argument("--jobs", type=int, help="parallel candidate fits (default: search.n_jobs)")
+    ap.add_argument("--restart", action="store_true", help="discard logged results instead of resuming")
+    args = ap.parse_args()
+
+    run_search(args.config, n_jobs=args.jobs, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from _bootstrap import *
+
+import argparse
+import os
+import sys
+
+from common import instrument, profiling
+from pipelines.runner import run_pipeline
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the pipeline stage graph (configs/pipeline.yaml), skipping up-to-date stages.")
+    ap.add_argument("targets", nargs="*", help="stages to bring up to date, with their upstream (default: all)")
+    ap.add_argument("--config", default="pipeline.yaml")
+    ap.add_argument("--dry-run", action="store_true", help="show what would run, in which wave, and why")
+    ap.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="run these stages even if up to date ('all' for every stage)")
+    ap.add_argument("--jobs", type=int, help="stages run at once (default: pipeline.n_jobs)")
+    ap.add_argument("--profile", metavar="FUNCS", help="profile these @profiled functions in every stage, e.g. run_finbert_on_yahoo_news (see common.profiling)")
+    ap.add_argument("--metrics", nargs="?", const="1", metavar="DIR", help=f"record metrics in every stage (default dir: {instrument.METRICS_DIR})")
+    args = ap.parse_args()
+
+    if args.metrics:
+        if args.metrics != "1":
+            args.metrics = os.path.abspath(args.metrics)
+        os.environ[instrument.ENV_VAR] = args.metrics    # inherited by the stage scripts
+        instrument.enable(None if args.metrics == "1" else args.metrics)
+
+    if args.profile:
+        os.environ[profiling.ENV_VAR] = args.profile
+
+    results = run_pipeline(args.config, targets=args.targets, force=args.force, n_jobs=args.jobs, dry_run=args.dry_run)
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from _bootstrap import *
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+from common import profiling
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Run a pipeline script with profiling on its @profiled functions (artifacts/reports/profiles/).",
+        usage="%(prog)s [options] SCRIPT [script args ...]",
+    )
+    ap.add_argument("script", help="script to run, e.g. scripts/12_execute_finbert.py")
+    ap.add_argument("script_args", nargs=argparse.REMAINDER, help="arguments passed to the script")
+    ap.add_argument("--target", default="all", help="comma-separated functions to profile, e.g. run_finbert_on_yahoo_news (default: all)")
+    ap.add_argument("--modes", default="cpu,memory", help=f"comma-separated from {', '.join(profiling.MODES)} (default: cpu,memory)")
+    ap.add_argument("--top", type=int, default=20, help="rows per printed summary table")
+    ap.add_argument("--interval-ms", type=float, default=5.0, help="sampling interval for --modes sample")
+    ap.add_argument("--out-dir", help=f"default: {profiling.PROFILES_DIR}")
+    args = ap.parse_args()
+
+    profiling.configure(
+        args.target.split(","),
+        modes=args.modes.split(","),
+        top=args.top,
+        interval_ms=args.interval_ms,
+        out_dir=args.out_dir,
+    )
+
+    script = Path(args.script).resolve()
+    sys.argv = [str(script), *args.script_args]
+    sys.path.insert(0, str(script.parent))
+    runpy.run_path(str(script), run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from _bootstrap import *
+
+import argparse
+from pathlib import Path
+
+from common.paths import MODELS_DIR
+from models.artifacts import compare_with_pickle, find_artifacts, print_comparison
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare model artifact load time against pickle.")
+    ap.add_argument("paths", nargs="*", help="artifact directories (default: every artifact under artifacts/models)")
+    ap.add_argument("--repeats", type=int, default=5, help="best-of-N timing")
+    args = ap.parse_args()
+
+    paths = [Path(p) for p in args.paths] or find_artifacts(MODELS_DIR)
+    if not paths:
+        print(f"No model artifacts found under {MODELS_DIR}")
+        return
+
+    print_comparison([compare_with_pickle(p, repeats=args.repeats) for p in paths])
+
+
+if __name__ == "__main__":
+    main()
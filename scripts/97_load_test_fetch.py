@@ -0,0 +1,36 @@
+from _bootstrap import *
+
+import argparse
+
+from apis.load_test import print_load_test, run_load_test
+from apis.standin_server import StandinConfig
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load-test the fetch layer against a local stand-in server.")
+    ap.add_argument("--latency", type=float, default=0.005, help="fixed response latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="random extra latency (s)")
+    ap.add_argument("--pages", type=int, default=5, help="reddit listing pages per subreddit")
+    ap.add_argument("--payload", type=int, default=500, help="filler bytes per post/article")
+    ap.add_argument("--burst-every", type=int, default=0, help="send a 429 burst after N OK responses")
+    ap.add_argument("--burst-len", type=int, default=1, help="429s per burst")
+    ap.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with 429s")
+    ap.add_argument("--concurrency", type=int, default=1, help="parallel fetch jobs per fetcher")
+    args = ap.parse_args()
+
+    cfg = StandinConfig(
+        latency_s=args.latency,
+        jitter_s=args.jitter,
+        reddit_pages=args.pages,
+        payload_bytes=args.payload,
+        burst_every=args.burst_every,
+        burst_len=args.burst_len,
+        retry_after_s=args.retry_after,
+    )
+
+    results = run_load_test(cfg, concurrency=args.concurrency)
+    print_load_test(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from apis import ollama_data
+from apis.market_data import get_ticker_daily
+from apis.news_data import fetch_yahoo_news
+from apis.rate_limit import request_with_retry, reset_retry_counts, retry_counts
+from apis.social_data import RedditListingParams, fetch_subreddit_new
+from apis.standin_server import StandinConfig, StandinServer
+
+
+# ---------------------------------------------------------
+# Load-test harness for the fetch layer (runs against StandinServer)
+# ---------------------------------------------------------
+def _run_jobs(jobs: List[Callable[[], Any]], concurrency: int) -> int:
+    """Run zero-arg jobs, return the number of records they produced."""
+    if concurrency <= 1:
+        return sum(len(job() or []) for job in jobs)
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        return sum(len(r or []) for r in ex.map(lambda job: job(), jobs))
+
+
+def _measure(name: str, label: str, server: StandinServer, jobs: List[Callable[[], Any]], concurrency: int) -> Dict[str, Any]:
+    before = server.stats()
+    reset_retry_counts()
+
+    t0 = time.perf_counter()
+    records = _run_jobs(jobs, concurrency)
+    elapsed = time.perf_counter() - t0
+
+    after = server.stats()
+    n_requests = after["requests"] - before["requests"]
+
+    return {
+        "fetcher": name,
+        "jobs": len(jobs),
+        "records": records,
+        "requests": n_requests,
+        "throttled": after["throttled"] - before["throttled"],
+        "retries": int(retry_counts[label]),
+        "bytes": after["bytes_sent"] - before["bytes_sent"],
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_s": round(n_requests / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def run_load_test(
+    cfg: Optional[StandinConfig] = None,
+    *,
+    subreddits: Optional[List[str]] = None,
+    tickers: Optional[List[str]] = None,
+    llm_calls: int = 20,
+    concurrency: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Exercise each fetcher against a local stand-in server and report
+    requests/s, end-to-end crawl time and retry counts per fetcher.
+    """
+    subreddits = subreddits or ["stocks", "investing", "wallstreetbets", "options"]
+    tickers = tickers or ["NVDA", "AMD", "INTC", "QCOM", "AVGO", "MRVL"]
+
+    results: List[Dict[str, Any]] = []
+
+    with StandinServer(cfg) as srv:
+        base = srv.url
+        listing = RedditListingParams(
+            limit=srv.cfg.reddit_page_size,
+            max_pages=srv.cfg.reddit_pages,
+            sleep_s=0.0,
+            base=base,
+        )
+
+        results.append(_measure(
+            "fetch_subreddit_new", "reddit", srv,
+            [lambda s=s: fetch_subreddit_new(s, params=listing) for s in subreddits],
+            concurrency,
+        ))
+
+        results.append(_measure(
+            "get_ticker_daily", "tiingo", srv,
+            [lambda t=t: get_ticker_daily(t, start_date="2020-01-01", token="standin", base_url=base) for t in tickers],
+            concurrency,
+        ))
+
+        def yahoo_raw(t: str) -> List[Dict[str, Any]]:
+            resp = request_with_retry("GET", f"{base}/yahoo/news/{t}", label="yahoo", timeout=30)
+            resp.raise_for_status()
+            return resp.json()
+
+        results.append(_measure(
+            "fetch_yahoo_news", "yahoo", srv,
+            [lambda t=t: fetch_yahoo_news(t, start_date="2000-01-01", raw_fetcher=yahoo_raw) for t in tickers],
+            concurrency,
+        ))
+
+        # Point Ollama at the stand-in and bypass the response cache for the duration
+        old_url, old_cache = ollama_data.URL, ollama_data.CACHE_ENABLED
+        ollama_data.URL, ollama_data.CACHE_ENABLED = f"{base}/api/generate", False
+        try:
+            results.append(_measure(
+                "ollama /api/generate", "ollama", srv,
+                [lambda i=i: ollama_data.get_peer_tickers("NVDA", sample=i) for i in range(llm_calls)],
+                concurrency,
+            ))
+        finally:
+            ollama_data.URL, ollama_data.CACHE_ENABLED = old_url, old_cache
+
+    return results
+
+
+def print_load_test(results: List[Dict[str, Any]]) -> None:
+    cols = ["fetcher", "jobs", "records", "requests", "throttled", "retries", "elapsed_s", "requests_per_s"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in cols}
+
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in cols))
@@ -1,4 +1,9 @@
-import requests
+import os
+
+from apis.rate_limit import request_with_retry
+
+# Overridable so the fetch layer can be pointed at a local stand-in server
+BASE_URL = os.getenv("TIINGO_BASE_URL", "https://api.tiingo.com")
 
 headers = {
     'Content-Type': 'application/json'
@@ -9,7 +14,8 @@ def get_ticker_daily(ticker='NVDA',
     end_date='2030-01-01',
     resample_freq='daily',
     columns=None,
-    token='3d657ef651a029d6e8e71f6670282dfdb8877f8d'):
+    token='3d657ef651a029d6e8e71f6670282dfdb8877f8d',
+    base_url=None):
     """
         Fetches ticker data from Tiingo for specific tickers or tags.
         Returns raw JSON data (list of dicts) from the API.
@@ -19,9 +25,9 @@ def get_ticker_daily(ticker='NVDA',
 
     columns = ",".join(columns)
 
-    url = f"https://api.tiingo.com/tiingo/daily/{ticker}/prices"
+    url = f"{base_url or BASE_URL}/tiingo/daily/{ticker}/prices"
     query_params = { 'token' : token, 'columns' : columns, 'startDate' : start_date, 'endDate' : end_date, 'resampleFreq' : resample_freq }
-    response = requests.get(url, headers=headers, params=query_params)
+    response = request_with_retry("GET", url, label="tiingo", headers=headers, params=query_params)
     response.raise_for_status()
 
     data = response.json()
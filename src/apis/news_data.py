@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from datetime import date, datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable
 
 import yfinance as yf
 
+from common import instrument
+
 
 def fetch_yahoo_news(
     ticker: str,
@@ -12,6 +14,7 @@ def fetch_yahoo_news(
     end_date: str | None = None,     # "YYYY-MM-DD"
     *,
     limit: int = 200,
+    raw_fetcher: Callable[[str], list[dict[str, Any]]] | None = None,
 ) -> list[dict[str, Any]]:
     """
     Fetch Yahoo Finance news for a ticker between [start_date, end_date] inclusive.
@@ -19,6 +22,8 @@ def fetch_yahoo_news(
     Defaults:
         - end_date = today (local date)
         - start_date = end_date - 7 days
+        - raw_fetcher = yfinance `Ticker(t).news` (override to read from another source,
+          e.g. the local stand-in server)
 
     Returns:
         List of normalized dicts with:
@@ -39,8 +44,11 @@ def fetch_yahoo_news(
     # --------------------------------------------------
     raw_items: list[dict[str, Any]] = []
     try:
-        raw_items = yf.Ticker(t).news or []
+        with instrument.timer("http_request_seconds", api="yahoo_news"):
+            raw_items = (raw_fetcher(t) if raw_fetcher else yf.Ticker(t).news) or []
+        instrument.count("http_requests", api="yahoo_news", status="ok")
     except Exception:
+        instrument.count("http_requests", api="yahoo_news", status="error")
         raw_items = []
 
     # --------------------------------------------------
@@ -86,4 +94,5 @@ def fetch_yahoo_news(
         if len(out) >= limit:
             break
 
+    instrument.rows("yahoo_news_fetch", rows_in=len(raw_items), rows_out=len(out))
     return out
@@ -1,4 +1,10 @@
-import os, re, time, requests
+import os, re, time, json, hashlib, threading
+from pathlib import Path
+from typing import Any
+
+from apis.rate_limit import request_with_retry
+from common import instrument
+from common.paths import INTERIM_DATA_DIR
 
 
 # ---------------------------------------------------------
@@ -9,10 +15,170 @@ URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL = os.getenv("OLLAMA_MODEL", "phi4")
 
 
+# ---------------------------------------------------------
+# Response / result cache
+# ---------------------------------------------------------
+# Raw LLM responses and aggregated per-ticker results are kept in one
+# append-only JSON-lines log: every put appends a single line, so the cost
+# per LLM call does not grow with the cache and an interrupted run keeps
+# everything written so far. Later lines win on load; the log is compacted
+# when superseded lines dominate. Entries expire after CACHE_TTL_S; bumping
+# CACHE_VERSION invalidates everything written by an older version of the
+# prompts/parsing.
+CACHE_PATH = Path(os.getenv("OLLAMA_CACHE_PATH", INTERIM_DATA_DIR / "ollama_cache.jsonl"))
+CACHE_TTL_S = float(os.getenv("OLLAMA_CACHE_TTL_DAYS", "7")) * 24 * 3600
+CACHE_VERSION = 1
+CACHE_ENABLED = os.getenv("OLLAMA_CACHE", "1") != "0"
+COMPACT_RATIO = 2   # rewrite the log once it holds this many lines per live entry
+
+_cache: dict[str, dict[str, Any]] | None = None
+_cache_lock = threading.Lock()
+
+
+def _cache_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _load_cache() -> dict[str, dict[str, Any]]:
+    global _cache
+    if _cache is not None:
+        return _cache
+
+    cache: dict[str, dict[str, Any]] = {"responses": {}, "results": {}}
+    n_lines, torn = 0, False
+    if CACHE_PATH.exists():
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    cache[rec.pop("section")][rec.pop("key")] = rec
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    torn = True  # interrupted write / unknown section
+                    continue
+                n_lines += 1
+
+    _cache = cache
+    live = len(cache["responses"]) + len(cache["results"])
+    # Compacting also drops a torn last line that the next append would extend
+    if torn or n_lines > COMPACT_RATIO * max(live, 1):
+        _compact_cache()
+    return _cache
+
+
+def _compact_cache() -> None:
+    """Rewrite the log with one line per live entry (atomic replace)."""
+    cache = _load_cache()
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = CACHE_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for section, entries in cache.items():
+            for key, entry in entries.items():
+                f.write(json.dumps({"section": section, "key": key, **entry}, ensure_ascii=False) + "\n")
+    os.replace(tmp, CACHE_PATH)
+
+
+def _cache_get(section: str, key: str, ttl_s: float | None = None) -> Any:
+    if not CACHE_ENABLED:
+        return None
+
+    entry = _load_cache()[section].get(key)
+    if not entry or entry.get("version") != CACHE_VERSION:
+        instrument.count("cache_lookups", cache=f"ollama_{section}", result="miss")
+        return None
+
+    ttl = CACHE_TTL_S if ttl_s is None else ttl_s
+    if time.time() - float(entry.get("created_at", 0)) > ttl:
+        instrument.count("cache_lookups", cache=f"ollama_{section}", result="expired")
+        return None
+
+    instrument.count("cache_lookups", cache=f"ollama_{section}", result="hit")
+    return entry["value"]
+
+
+def _cache_put(section: str, key: str, value: Any, **meta: Any) -> None:
+    if not CACHE_ENABLED:
+        return
+
+    entry = {
+        "version": CACHE_VERSION,
+        "created_at": time.time(),
+        "value": value,
+        **meta,
+    }
+    line = json.dumps({"section": section, "key": key, **entry}, ensure_ascii=False) + "\n"
+    with _cache_lock:
+        _load_cache()[section][key] = entry
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def clear_cache() -> None:
+    """Drop every cached response and result (in memory and on disk)."""
+    global _cache
+    _cache = {"responses": {}, "results": {}}
+    if CACHE_PATH.exists():
+        CACHE_PATH.unlink()
+
+
+def _generate(prompt: str, *, sample: int = 0, attempt: int = 0) -> str:
+    """
+    POST a prompt to Ollama and return the raw response text.
+
+    `sample` and `attempt` are part of the cache key so repeated runs over the
+    same prompt (used for keyword voting) each keep their own cached response.
+    """
+    options = {"stream": False}
+    key = _cache_key(MODEL, prompt, options, sample, attempt)
+
+    cached = _cache_get("responses", key)
+    if cached is not None:
+        return cached
+
+    r = request_with_retry(
+        "POST",
+        URL,
+        label="ollama",
+        json={"model": MODEL, "prompt": prompt, **options},
+        timeout=60
+    )
+    r.raise_for_status()
+    text = r.json().get("response", "")
+
+    _cache_put("responses", key, text, model=MODEL)
+    return text
+
+
+# ---------------------------------------------------------
+# Aggregated per-ticker results (keywords.json / peertickers.json)
+# ---------------------------------------------------------
+def _result_key(kind: str, ticker: str, k: int) -> str:
+    return _cache_key(kind, MODEL, ticker.upper(), k)
+
+
+def load_cached_result(kind: str, ticker: str, k: int, runs: int = 1) -> list[str] | None:
+    """
+    Return a cached aggregated result ("keywords" or "peers") for a ticker.
+
+    A result built from fewer LLM runs than requested is treated as a miss.
+    """
+    key = _result_key(kind, ticker, k)
+    value = _cache_get("results", key)
+    if value is None or int(_load_cache()["results"][key].get("runs", 0)) < runs:
+        return None
+    return list(value)
+
+
+def save_cached_result(kind: str, ticker: str, k: int, runs: int, value: list[str]) -> None:
+    _cache_put("results", _result_key(kind, ticker, k), list(value), model=MODEL, runs=runs)
+
+
 # ---------------------------------------------------------
 # Generate single-word finance keywords for a stock ticker
 # ---------------------------------------------------------
-def get_keywords(stock: str, k: int = 15, retries: int = 2) -> list[str]:
+def get_keywords(stock: str, k: int = 15, retries: int = 2, *, sample: int = 0) -> list[str]:
 
     # Prompt instructing the model to output only single-word keywords
     prompt = f"""
@@ -33,19 +199,11 @@ def get_keywords(stock: str, k: int = 15, retries: int = 2) -> list[str]:
     banned = {"stock", "price", "market", "trading", "investing", "investment", "news", "analysis"}
 
     # Try multiple times in case the model misbehaves
-    for _ in range(retries + 1):
+    for attempt in range(retries + 1):
 
         try:
-            # Call Ollama local API
-            r = requests.post(
-                URL,
-                json={"model": MODEL, "stream": False, "prompt": prompt},
-                timeout=60
-            )
-            r.raise_for_status()
-
-            # Raw model output
-            text = r.json().get("response", "")
+            # Call Ollama local API (cached per sample/attempt)
+            text = _generate(prompt, sample=sample, attempt=attempt)
 
             # Extract single words (letters/numbers only)
             words = re.findall(r"\b[a-zA-Z][a-zA-Z0-9]+\b", text.lower())
@@ -76,7 +234,7 @@ def get_keywords(stock: str, k: int = 15, retries: int = 2) -> list[str]:
     return []
 
 
-def get_peer_tickers(ticker: str, k: int = 6, retries: int = 2) -> list[str]:
+def get_peer_tickers(ticker: str, k: int = 6, retries: int = 2, *, sample: int = 0) -> list[str]:
 
     prompt = f"""
         Give {k} US stock TICKERS of companies operating in the same industry as {ticker}.
@@ -84,11 +242,9 @@ def get_peer_tickers(ticker: str, k: int = 6, retries: int = 2) -> list[str]:
         No punctuation, no bullets, no numbering, no extra text.
         """.strip()
 
-    for _ in range(retries + 1):
+    for attempt in range(retries + 1):
         try:
-            r = requests.post(URL, json={"model": MODEL, "stream": False, "prompt": prompt}, timeout=60)
-            r.raise_for_status()
-            text = r.json().get("response", "")
+            text = _generate(prompt, sample=sample, attempt=attempt)
 
             # Extract uppercase-ish tickers (1-5 chars, allow dot for BRK.B etc.)
             raw = re.findall(r"\b[A-Z]{1,5}(?:\.[A-Z])?\b", text)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from typing import Any
+
+import requests
+
+from common import instrument
+
+# Status codes worth retrying (rate limits and transient upstream failures)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Retries performed so far, keyed by caller label ("reddit", "tiingo", ...)
+retry_counts: Counter = Counter()
+
+
+def _retry_after_s(resp: requests.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def request_with_retry(
+    method: str,
+    url: str,
+    *,
+    label: str = "default",
+    max_retries: int = 4,
+    backoff_s: float = 0.5,
+    max_backoff_s: float = 30.0,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send an HTTP request, retrying 429/5xx responses and connection errors.
+
+    Honors the Retry-After header when present, otherwise backs off
+    exponentially. The final response is returned as-is (callers still
+    call raise_for_status), so a persistent 429 surfaces as an HTTPError.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with instrument.timer("http_request_seconds", api=label):
+                resp = requests.request(method, url, **kwargs)
+        except requests.ConnectionError:
+            instrument.count("http_requests", api=label, status="connection_error")
+            if attempt == max_retries:
+                raise
+            retry_counts[label] += 1
+            instrument.count("http_retries", api=label)
+            time.sleep(min(backoff_s * 2 ** attempt, max_backoff_s))
+            continue
+
+        if instrument.enabled():
+            instrument.count("http_requests", api=label, status=resp.status_code)
+            instrument.count("http_response_bytes", len(resp.content), api=label)
+
+        if resp.status_code not in RETRY_STATUS or attempt == max_retries:
+            return resp
+
+        retry_counts[label] += 1
+        instrument.count("http_retries", api=label)
+        wait = _retry_after_s(resp)
+        if wait is None:
+            wait = backoff_s * 2 ** attempt
+        time.sleep(min(wait, max_backoff_s))
+
+    raise AssertionError("unreachable")
+
+
+def reset_retry_counts() -> None:
+    retry_counts.clear()
@@ -8,7 +8,7 @@ from datetime import datetime, timezone
 from typing import Any, Dict, Iterable, List, Optional
 from urllib.parse import urlencode
 
-import requests
+from apis.rate_limit import request_with_retry
 
 DEFAULT_USER_AGENT = "stock-volatility-prediction/1.0 (social_data)"
 
@@ -23,7 +23,13 @@ class RedditListingParams:
 
 
 def _get_json(url: str, *, user_agent: str = DEFAULT_USER_AGENT, timeout_s: int = 30) -> Dict[str, Any]:
-    resp = requests.get(url, headers={"User-Agent": user_agent, "Accept": "application/json"}, timeout=timeout_s)
+    resp = request_with_retry(
+        "GET",
+        url,
+        label="reddit",
+        headers={"User-Agent": user_agent, "Accept": "application/json"},
+        timeout=timeout_s,
+    )
     resp.raise_for_status()
     try:
         return resp.json()
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+# ---------------------------------------------------------
+# Local stand-in for the external providers used by apis/*
+# ---------------------------------------------------------
+# Mimics just enough of each endpoint for the fetchers to run unchanged:
+#   GET  /r/<sub>/new.json?limit=&after=      (Reddit listing, fetch_subreddit_new)
+#   GET  /tiingo/daily/<ticker>/prices         (Tiingo, get_ticker_daily)
+#   GET  /yahoo/news/<ticker>                  (yfinance Ticker.news items)
+#   POST /api/generate                         (Ollama)
+
+
+@dataclass
+class StandinConfig:
+    latency_s: float = 0.0          # fixed delay added to every response
+    jitter_s: float = 0.0           # uniform random extra delay in [0, jitter_s]
+    reddit_pages: int = 5           # listing pages available per subreddit
+    reddit_page_size: int = 100     # max children per page (capped by ?limit=)
+    market_days: int = 250          # price rows returned per ticker
+    news_items: int = 50            # news items returned per ticker
+    payload_bytes: int = 500        # filler size of selftext / summary / LLM text
+    burst_every: int = 0            # after this many OK responses, send a 429 burst (0 = never)
+    burst_len: int = 1              # consecutive 429s per burst
+    retry_after_s: float = 0.0      # Retry-After header sent with 429s
+    seed: int = 42
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._ok_since_burst = 0
+        self._burst_left = 0
+
+    def should_throttle(self, cfg: StandinConfig) -> bool:
+        with self.lock:
+            self.requests += 1
+            if self._burst_left > 0:
+                self._burst_left -= 1
+                self.throttled += 1
+                return True
+            if cfg.burst_every and self._ok_since_burst >= cfg.burst_every:
+                self._ok_since_burst = 0
+                self._burst_left = cfg.burst_len - 1
+                self.throttled += 1
+                return True
+            self._ok_since_burst += 1
+            return False
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return {"requests": self.requests, "throttled": self.throttled, "bytes_sent": self.bytes_sent}
+
+
+def _filler(n: int, rng: random.Random) -> str:
+    words = ["chip", "supply", "guidance", "margin", "datacenter", "earnings", "demand", "export"]
+    out: List[str] = []
+    size = 0
+    while size < n:
+        w = rng.choice(words)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out)[:n]
+
+
+def _reddit_listing(cfg: StandinConfig, sub: str, limit: int, after: Optional[str]) -> Dict[str, Any]:
+    limit = max(1, min(limit, cfg.reddit_page_size))
+    total = cfg.reddit_pages * limit
+    offset = int(after.split("_")[-1]) if after else 0
+    rng = random.Random(f"{cfg.seed}:{sub}:{offset}")
+    now = time.time()
+
+    children = []
+    for i in range(offset, min(offset + limit, total)):
+        pid = f"{sub[:3]}{i:06d}"
+        children.append({
+            "kind": "t3",
+            "data": {
+                "id": pid,
+                "name": f"t3_{pid}",
+                "subreddit": sub,
+                "author": f"user{i % 97}",
+                "created_utc": now - i * 60,
+                "title": f"NVDA AMD post {i} {_filler(40, rng)}",
+                "selftext": _filler(cfg.payload_bytes, rng),
+                "score": i % 50,
+                "num_comments": i % 20,
+                "permalink": f"/r/{sub}/comments/{pid}/",
+                "url": f"https://example.invalid/{pid}",
+                "over_18": False,
+            },
+        })
+
+    next_offset = offset + limit
+    return {"data": {"children": children, "after": f"t3_{next_offset}" if next_offset < total else None}}
+
+
+def _market_rows(cfg: StandinConfig, ticker: str, start: str) -> List[Dict[str, Any]]:
+    rng = random.Random(f"{cfg.seed}:{ticker}")
+    day = date.fromisoformat(start) if start else date(2020, 1, 1)
+    close = 100.0
+    rows = []
+    while len(rows) < cfg.market_days:
+        if day.weekday() < 5:
+            o = close * (1 + rng.gauss(0, 0.005))
+            close = o * (1 + rng.gauss(0, 0.02))
+            hi = max(o, close) * (1 + abs(rng.gauss(0, 0.01)))
+            lo = min(o, close) * (1 - abs(rng.gauss(0, 0.01)))
+            rows.append({
+                "date": f"{day.isoformat()}T00:00:00.000Z",
+                "adjOpen": o, "adjHigh": hi, "adjLow": lo, "adjClose": close,
+                "adjVolume": rng.randint(1_000_000, 50_000_000),
+            })
+        day += timedelta(days=1)
+    return rows
+
+
+def _news_items(cfg: StandinConfig, ticker: str) -> List[Dict[str, Any]]:
+    rng = random.Random(f"{cfg.seed}:news:{ticker}")
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(cfg.news_items):
+        pub = (now - timedelta(hours=3 * i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        items.append({
+            "content": {
+                "title": f"{ticker} headline {i}",
+                "pubDate": pub,
+                "summary": _filler(cfg.payload_bytes, rng),
+                "canonicalUrl": {"url": f"https://example.invalid/news/{ticker}/{i}"},
+                "provider": {"displayName": "Stand-in Wire"},
+            }
+        })
+    return items
+
+
+def _make_handler(cfg: StandinConfig, stats: _Stats):
+    rng = random.Random(cfg.seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:  # keep load tests quiet
+            pass
+
+        def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+            with stats.lock:
+                stats.bytes_sent += len(body)
+
+        def _delay_or_throttle(self) -> bool:
+            delay = cfg.latency_s + (rng.uniform(0, cfg.jitter_s) if cfg.jitter_s else 0.0)
+            if delay:
+                time.sleep(delay)
+            if stats.should_throttle(cfg):
+                self._send(429, {"error": "rate limited"}, {"Retry-After": str(cfg.retry_after_s)})
+                return True
+            return False
+
+        def do_GET(self) -> None:
+            if self._delay_or_throttle():
+                return
+            u = urlparse(self.path)
+            q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+
+            m = re.fullmatch(r"/r/([^/]+)/new\.json", u.path)
+            if m:
+                return self._send(200, _reddit_listing(cfg, m.group(1), int(q.get("limit", 100)), q.get("after")))
+
+            m = re.fullmatch(r"/tiingo/daily/([^/]+)/prices", u.path)
+            if m:
+                return self._send(200, _market_rows(cfg, m.group(1), q.get("startDate", "")))
+
+            m = re.fullmatch(r"/yahoo/news/([^/]+)", u.path)
+            if m:
+                return self._send(200, _news_items(cfg, m.group(1)))
+
+            self._send(404, {"error": f"unknown path {u.path}"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            if self._delay_or_throttle():
+                return
+            if urlparse(self.path).path != "/api/generate":
+                return self._send(404, {"error": "unknown path"})
+            text = "AMD INTC QCOM AVGO MRVL TER " + _filler(cfg.payload_bytes, rng)
+            self._send(200, {"response": text, "done": True})
+
+    return Handler
+
+
+class StandinServer:
+    """
+    Threaded localhost server running in the background.
+
+    Usage:
+        with StandinServer(StandinConfig(latency_s=0.01)) as srv:
+            fetch_subreddit_new("stocks", params=RedditListingParams(base=srv.url, sleep_s=0))
+            print(srv.stats())
+    """
+
+    def __init__(self, cfg: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.cfg = cfg or StandinConfig()
+        self._stats = _Stats()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self.cfg, self._stats))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandinServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        return self._stats.snapshot()
+
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
@@ -1,5 +1,7 @@
 import yfinance as yf
 
+from common import instrument
+
 def get_vix_data(start_date, end_date):
     """
     Fetches historical VIX data from Yahoo Finance.
@@ -12,7 +14,9 @@ def get_vix_data(start_date, end_date):
     list[dict]: Raw historical VIX price records
     """
     # The VIX ticker on Yahoo Finance is ^VIX
-    df = yf.download("^VIX", start=start_date, end=end_date)
+    with instrument.timer("http_request_seconds", api="yahoo_vix"):
+        df = yf.download("^VIX", start=start_date, end=end_date)
+    instrument.count("http_requests", api="yahoo_vix", status="ok" if not df.empty else "empty")
 
     if df.empty:
         raise ValueError(f"No VIX data returned between {start_date} and {end_date}")
@@ -26,4 +30,5 @@ def get_vix_data(start_date, end_date):
     # Convert Timestamp to ISO string for raw output
     df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
 
+    instrument.rows("vix_fetch", rows_out=len(df))
     return df.to_dict(orient='records')
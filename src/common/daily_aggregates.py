@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from common.paths import INTERIM_DATA_DIR
+
+AGGREGATES_DIR = INTERIM_DATA_DIR / "aggregates"
+FORMAT_VERSION = 2
+
+# VADER's conventional cut-offs for a positive / negative text
+POS_THRESHOLD = 0.05
+NEG_THRESHOLD = -0.05
+
+_DAY_OFFSET = 1 << 31   # keeps day numbers before 1970 non-negative inside the cell key
+
+
+def _day_numbers(values: Any) -> np.ndarray:
+    """Calendar day (int64 days since epoch) per value; NaT -> int64 min."""
+    ts = pd.DatetimeIndex(pd.to_datetime(pd.Series(values), errors="coerce"))
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _hash_ids(ids: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(ids.astype(str), index=False).to_numpy(dtype=np.uint64)
+
+
+def histogram_quantile(hist: np.ndarray, q: float, lo: float, hi: float) -> np.ndarray:
+    """
+    q-quantile per row of a fixed-bin histogram (NaN for empty rows).
+
+    Same rank convention as pandas / numpy "linear": the value at rank
+    q * (n - 1), interpolated between its neighbouring order statistics.
+    Each order statistic is placed at its position inside its bin, so the
+    result is within one bin width of the exact quantile.
+    """
+    hist = np.atleast_2d(hist).astype(np.float64)
+    total = hist.sum(axis=1)
+    cum = np.cumsum(hist, axis=1)
+    rows = np.arange(len(hist))
+    width = (hi - lo) / hist.shape[1]
+
+    def order_stat(k: np.ndarray) -> np.ndarray:
+        # 0-based k-th smallest value: first bin with more than k values
+        idx = np.minimum((cum <= k[:, None]).sum(axis=1), hist.shape[1] - 1)
+        before = cum[rows, idx] - hist[rows, idx]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = (k - before + 0.5) / hist[rows, idx]
+        return lo + (idx + np.nan_to_num(frac)) * width
+
+    rank = q * np.maximum(total - 1, 0)
+    below = np.floor(rank)
+    out = order_stat(below) + (rank - below) * (order_stat(np.minimum(below + 1, np.maximum(total - 1, 0))) - order_stat(below))
+    out[total == 0] = np.nan
+    return out
+
+
+# ---------------------------------------------------------
+# Materialized (key, day) table
+# ---------------------------------------------------------
+class DailyAggregates:
+    """
+    Materialized sufficient statistics per (key, day), updated incrementally.
+
+    Each cell holds n, n_pos, n_neg, <field>_sum and <field>_sumsq for every
+    field, plus a fixed-bin histogram of `score_field` as a quantile sketch.
+    Ingested rows are tracked by id (a 64-bit hash) together with the cell
+    and values they contributed, so re-reading a scored file only touches
+    the cells of new or changed rows: a row whose id was ingested before
+    replaces its old contribution (e.g. after re-scoring), an unchanged one
+    is skipped. Means, variances and daily / windowed features are all
+    derived from the sums; cells from different keys or days can simply be
+    added.
+    """
+
+    def __init__(
+        self,
+        *,
+        fields: Sequence[str] = ("compound",),
+        score_field: Optional[str] = None,
+        key_col: str = "ticker",
+        bins: int = 200,
+        value_range: Sequence[float] = (-1.0, 1.0),
+    ) -> None:
+        self.fields = list(fields)
+        self.score_field = score_field or self.fields[0]
+        if self.score_field not in self.fields:
+            self.fields.insert(0, self.score_field)
+        self.key_col = key_col
+        self.bins = int(bins)
+        self.value_range = (float(value_range[0]), float(value_range[1]))
+
+        self.keys: List[str] = []
+        self._key_codes: Dict[str, int] = {}
+        self.cells = np.empty(0, dtype=np.int64)
+        self.stats = np.zeros((0, len(self.stat_names)))
+        self.hist = np.zeros((0, self.bins), dtype=np.int32)
+        # Ingested rows, sorted by id hash: the cell each one went into and
+        # its field values
+        self.ids = np.empty(0, dtype=np.uint64)
+        self.id_cells = np.empty(0, dtype=np.int64)
+        self.id_values = np.zeros((0, len(self.fields)))
+
+    @property
+    def stat_names(self) -> List[str]:
+        names = ["n", "n_pos", "n_neg"]
+        for f in self.fields:
+            names += [f"{f}_sum", f"{f}_sumsq"]
+        return names
+
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "fields": self.fields,
+            "score_field": self.score_field,
+            "key_col": self.key_col,
+            "bins": self.bins,
+            "value_range": list(self.value_range),
+        }
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    # -----------------------------
+    # Incremental update
+    # -----------------------------
+    def _codes(self, keys: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(keys)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, k in enumerate(uniques):
+            k = str(k)
+            code = self._key_codes.get(k)
+            if code is None:
+                code = self._key_codes[k] = len(self.keys)
+                self.keys.append(k)
+            mapping[i] = code
+        return mapping[codes]
+
+    def _prepare(self, rows: pd.DataFrame, day_col: str, key_col: str, id_col: Optional[str]) -> Dict[str, Any]:
+        """
+        Usable rows of a batch with their cells and values, and what they do
+        to the table: `add` (new or changed rows), `drop` (tracked rows whose
+        old contribution is removed: changed, or no longer usable) and
+        `skipped` (unusable, unchanged or repeated within the batch).
+        """
+        days = _day_numbers(rows[day_col])
+        score = pd.to_numeric(rows[self.score_field], errors="coerce").to_numpy(dtype=np.float64)
+        ok = rows[key_col].notna().to_numpy() & (rows[key_col] != "").to_numpy() & (days != np.iinfo(np.int64).min) & np.isfinite(score)
+
+        values = np.empty((len(rows), len(self.fields)))
+        for i, f in enumerate(self.fields):
+            x = score if f == self.score_field else pd.to_numeric(rows[f], errors="coerce").to_numpy(dtype=np.float64)
+            values[:, i] = np.nan_to_num(x)
+
+        cells = np.full(len(rows), -1, dtype=np.int64)
+        if ok.any():
+            cells[ok] = (self._codes(rows.loc[ok, key_col]) << 32) | (days[ok] + _DAY_OFFSET)
+
+        out: Dict[str, Any] = {"n": len(rows), "cells": cells, "values": values, "add": ok, "drop": np.empty(0, dtype=np.int64), "hashed": None}
+        if not (id_col and id_col in rows):
+            return out
+
+        ids = rows[id_col]
+        missing = ids.isna()
+        if missing.any():
+            ids = ids.where(~missing, rows[key_col].astype(str) + "|" + pd.Series(days, index=rows.index).astype(str) + "|" + pd.Series(score, index=rows.index).astype(str))
+        hashed = _hash_ids(ids)
+
+        # The last row of an id within the batch is its current version
+        last = len(hashed) - 1 - np.unique(hashed[::-1], return_index=True)[1]
+        latest = np.zeros(len(rows), dtype=bool)
+        latest[last] = True
+
+        pos = np.minimum(np.searchsorted(self.ids, hashed), max(len(self.ids) - 1, 0))
+        known = latest & (self.ids[pos] == hashed) if len(self.ids) else np.zeros(len(rows), dtype=bool)
+        old_cells = np.where(known, self.id_cells[pos] if len(self.ids) else -1, -1)
+        unchanged = known & ((old_cells == cells) & (self.id_values[pos] == values).all(axis=1) if len(self.ids) else False)
+
+        out["add"] = ok & latest & ~unchanged
+        out["drop"] = pos[known & ~unchanged]
+        out["hashed"] = hashed
+        return out
+
+    def new_rows(self, rows: pd.DataFrame, *, day_col: str = "date", key_col: Optional[str] = None, id_col: Optional[str] = "id") -> np.ndarray:
+        """Boolean mask of the rows ingest() would add (new, or changed since they were ingested)."""
+        return self._prepare(rows, day_col, key_col or self.key_col, id_col)["add"]
+
+    def _apply(self, cells: np.ndarray, values: np.ndarray, sign: np.ndarray) -> tuple[int, int]:
+        """Add (sign +1) / remove (sign -1) row contributions; returns (cells updated, cells added)."""
+        batch_cells, inv = np.unique(cells, return_inverse=True)
+        m = len(batch_cells)
+        score = values[:, self.fields.index(self.score_field)]
+
+        batch = np.empty((m, len(self.stat_names)))
+        batch[:, 0] = np.bincount(inv, weights=sign, minlength=m)
+        batch[:, 1] = np.bincount(inv, weights=sign * (score > POS_THRESHOLD), minlength=m)
+        batch[:, 2] = np.bincount(inv, weights=sign * (score < NEG_THRESHOLD), minlength=m)
+        for i in range(len(self.fields)):
+            x = values[:, i]
+            batch[:, 3 + 2 * i] = np.bincount(inv, weights=sign * x, minlength=m)
+            batch[:, 4 + 2 * i] = np.bincount(inv, weights=sign * x * x, minlength=m)
+
+        lo, hi = self.value_range
+        b = np.clip(((score - lo) / (hi - lo) * self.bins).astype(np.int64), 0, self.bins - 1)
+        batch_hist = np.bincount(inv * self.bins + b, weights=sign, minlength=m * self.bins).reshape(m, self.bins)
+        batch_hist = np.rint(batch_hist).astype(np.int32)
+
+        # Add into existing cells, append the rest
+        order = np.argsort(self.cells, kind="stable")
+        sorted_cells = self.cells[order]
+        pos = np.minimum(np.searchsorted(sorted_cells, batch_cells), max(len(sorted_cells) - 1, 0))
+        found = (sorted_cells[pos] == batch_cells) if len(sorted_cells) else np.zeros(m, dtype=bool)
+
+        rows_idx = order[pos[found]]
+        self.stats[rows_idx] += batch[found]
+        self.hist[rows_idx] += batch_hist[found]
+
+        self.cells = np.concatenate([self.cells, batch_cells[~found]])
+        self.stats = np.concatenate([self.stats, batch[~found]])
+        self.hist = np.concatenate([self.hist, batch_hist[~found]])
+
+        # Cells whose every row was replaced or removed
+        empty = np.rint(self.stats[:, 0]) <= 0
+        if empty.any():
+            self.cells, self.stats, self.hist = self.cells[~empty], self.stats[~empty], self.hist[~empty]
+        return int(found.sum()), int((~found).sum())
+
+    def ingest(
+        self,
+        rows: pd.DataFrame,
+        *,
+        day_col: str = "date",
+        key_col: Optional[str] = None,
+        id_col: Optional[str] = "id",
+    ) -> Dict[str, int]:
+        """
+        Add new scored rows and replace changed ones (matched by id); rows
+        identical to what was ingested under their id are skipped.
+
+        Only the (key, day) cells of new, changed or removed rows are
+        updated. Returns counts of rows ingested (new + changed) / replaced
+        (changed) / skipped and cells updated / added.
+        """
+        key_col = key_col or self.key_col
+        batch = self._prepare(rows, day_col, key_col, id_col)
+        add, drop = batch["add"], batch["drop"]
+
+        n_added = int(add.sum())
+        n_skipped = int(batch["n"] - n_added)
+        if not n_added and not len(drop):
+            return {"rows_ingested": 0, "rows_replaced": 0, "rows_skipped": n_skipped, "cells_updated": 0, "cells_added": 0}
+
+        cells = np.concatenate([self.id_cells[drop], batch["cells"][add]])
+        values = np.concatenate([self.id_values[drop], batch["values"][add]])
+        sign = np.concatenate([np.full(len(drop), -1.0), np.ones(n_added)])
+        cells_updated, cells_added = self._apply(cells, values, sign)
+
+        hashed = batch["hashed"]
+        if hashed is not None:
+            # Forget the replaced / removed rows, then track the added ones
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[drop] = False
+            ids = np.concatenate([self.ids[keep], hashed[add]])
+            order = np.argsort(ids, kind="stable")
+            self.ids = ids[order]
+            self.id_cells = np.concatenate([self.id_cells[keep], batch["cells"][add]])[order]
+            self.id_values = np.concatenate([self.id_values[keep], batch["values"][add]])[order]
+
+        return {
+            "rows_ingested": n_added,
+            "rows_replaced": int(len(drop)),
+            "rows_skipped": n_skipped,
+            "cells_updated": cells_updated,
+            "cells_added": cells_added,
+        }
+
+    @classmethod
+    def from_rows(cls, rows: pd.DataFrame, *, day_col: str = "date", id_col: Optional[str] = None, **spec: Any) -> "DailyAggregates":
+        table = cls(**spec)
+        table.ingest(rows, day_col=day_col, id_col=id_col)
+        return table
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def _decode(self) -> tuple[np.ndarray, np.ndarray]:
+        codes = self.cells >> 32
+        days = (self.cells & 0xFFFFFFFF) - _DAY_OFFSET
+        return codes, days
+
+    def frame(self) -> pd.DataFrame:
+        """Long (key, date, n, n_pos, n_neg, <field>_sum, <field>_sumsq...) rows."""
+        codes, days = self._decode()
+        keys, rank = self._sorted_keys()
+        out: Dict[str, Any] = {
+            self.key_col: pd.Categorical.from_codes(rank[codes], categories=keys),
+            "date": days.astype("datetime64[D]").astype("datetime64[ns]"),
+        }
+        for i, name in enumerate(self.stat_names):
+            out[name] = self.stats[:, i]
+        return pd.DataFrame(out).sort_values([self.key_col, "date"], kind="stable").reset_index(drop=True)
+
+    def daily(self, keys: Optional[Iterable[str]] = None, *, quantiles: Sequence[float] = (0.5,)) -> pd.DataFrame:
+        """
+        Per-day stats of `score_field` pooled over `keys` (default: all keys):
+        day, n, mean, std, var (ddof=1) and the requested quantiles (q50, ...).
+        """
+        codes, days = self._decode()
+        sel = np.ones(len(self.cells), dtype=bool)
+        if keys is not None:
+            wanted = [self._key_codes[k] for k in map(str, keys) if k in self._key_codes]
+            sel = np.isin(codes, wanted)
+
+        uniq_days, inv = np.unique(days[sel], return_inverse=True)
+        m = len(uniq_days)
+        j = self.stat_names.index(f"{self.score_field}_sum")
+
+        n = np.bincount(inv, weights=self.stats[sel, 0], minlength=m)
+        s = np.bincount(inv, weights=self.stats[sel, j], minlength=m)
+        ss = np.bincount(inv, weights=self.stats[sel, j + 1], minlength=m)
+        hist = np.zeros((m, self.bins))
+        np.add.at(hist, inv, self.hist[sel])
+
+        return self._score_frame({"day": uniq_days}, n, s, ss, hist, quantiles)
+
+    def daily_by_key(self, *, quantiles: Sequence[float] = (0.5,)) -> pd.DataFrame:
+        """
+        daily() for every key at once: one row per (key, day) cell with
+        <key_col>, day, n, mean, std, var and quantiles, sorted by key then day.
+
+        Cells already are (key, day) sums, so this is a single vectorized pass
+        over the table instead of one filtered pooling per key.
+        """
+        codes, days = self._decode()
+        keys, rank = self._sorted_keys()
+        j = self.stat_names.index(f"{self.score_field}_sum")
+
+        out = self._score_frame(
+            {self.key_col: pd.Categorical.from_codes(rank[codes], categories=keys), "day": days},
+            self.stats[:, 0], self.stats[:, j], self.stats[:, j + 1], self.hist, quantiles,
+        )
+        return out.sort_values([self.key_col, "day"], kind="stable").reset_index(drop=True)
+
+    def _sorted_keys(self) -> tuple[pd.Index, np.ndarray]:
+        """Keys in sorted order + each key code's rank in it (codes follow first-seen order)."""
+        labels = np.asarray(self.keys, dtype=object)
+        by_name = np.argsort(labels, kind="stable")
+        rank = np.empty(len(labels), dtype=np.int64)
+        rank[by_name] = np.arange(len(labels))
+        return pd.Index(labels[by_name]), rank
+
+    def _score_frame(
+        self,
+        index: Dict[str, Any],
+        n: np.ndarray,
+        s: np.ndarray,
+        ss: np.ndarray,
+        hist: np.ndarray,
+        quantiles: Sequence[float],
+    ) -> pd.DataFrame:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s / n
+            var = np.maximum(ss - s * mean, 0.0) / (n - 1)
+        var[n < 2] = np.nan
+
+        out = pd.DataFrame({
+            **index,
+            "n": n.astype(np.int64),
+            "mean": mean,
+            "std": np.sqrt(var),
+            "var": var,
+        })
+        out["day"] = np.asarray(out["day"], dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+        for q in quantiles:
+            out[f"q{int(round(q * 100))}"] = histogram_quantile(hist, q, *self.value_range)
+        return out
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: Path) -> Path:
+        """Write arrays + meta.json into `path` (meta last, so a partial write is not picked up)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("cells", "stats", "hist", "ids", "id_cells", "id_values"):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, path / f"{name}.npy")
+
+        meta = {"version": FORMAT_VERSION, **self.spec(), "keys": self.keys, "cells": len(self.cells)}
+        tmp = path / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path / "meta.json")
+        return path
+
+    @classmethod
+    def load(cls, path: Path, **spec: Any) -> "DailyAggregates":
+        """
+        Load a saved table; returns an empty table when none exists, the
+        format version changed, or its spec differs from the one requested
+        (e.g. new sentiment_fields), so the caller rebuilds from scratch.
+        """
+        path = Path(path)
+        fresh = cls(**spec)
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return fresh
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION or (spec and {k: meta.get(k) for k in fresh.spec()} != fresh.spec()):
+            return fresh
+
+        table = cls(**{k: meta[k] for k in fresh.spec()})
+        table.keys = list(meta["keys"])
+        table._key_codes = {k: i for i, k in enumerate(table.keys)}
+        for name in ("cells", "stats", "hist", "ids", "id_cells", "id_values"):
+            setattr(table, name, np.load(path / f"{name}.npy"))
+        if len(table.cells) != meta.get("cells"):
+            return fresh
+        return table
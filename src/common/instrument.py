@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.paths import REPORTS_DIR
+
+# "1" -> METRICS_DIR, any other non-empty value (except "0") -> that directory
+ENV_VAR = "PIPELINE_METRICS"
+METRICS_DIR = REPORTS_DIR / "metrics"
+METRICS_FILE = "metrics.jsonl"
+PREFIX = "stockvol_"
+
+_enabled = False
+_out_dir: Optional[Path] = None
+_job = "python"
+_lock = threading.Lock()
+
+# (kind, name, labels) -> value; timers hold [count, sum, max]
+_metrics: Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], Any] = {}
+_span_path: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("span_path", default=())
+
+
+# --------------------------------------------------
+# Switch
+# --------------------------------------------------
+def enable(out_dir: Optional[str | Path] = None, *, job: Optional[str] = None) -> Path:
+    """
+    Start recording. Spans are appended to <out_dir>/metrics.jsonl as they
+    end; counters / gauges / timers are written as a final JSON-lines snapshot
+    plus a Prometheus textfile <out_dir>/<job>.prom at exit (and after every
+    top-level span). `job` defaults to the running script's name.
+    """
+    global _enabled, _out_dir, _job
+    _out_dir = Path(out_dir) if out_dir else METRICS_DIR
+    _out_dir.mkdir(parents=True, exist_ok=True)
+    _job = job or Path(sys.argv[0] or "python").stem or "python"
+    if not _enabled:
+        atexit.register(flush)
+    _enabled = True
+    return _out_dir
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    atexit.unregister(flush)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _metrics.clear()
+
+
+def _from_env() -> None:
+    value = os.getenv(ENV_VAR, "").strip()
+    if value and value != "0":
+        enable(None if value == "1" else value)
+
+
+# --------------------------------------------------
+# Recording (each call is a no-op while disabled)
+# --------------------------------------------------
+def _key(kind: str, name: str, labels: Dict[str, Any]) -> Tuple[str, str, Tuple[Tuple[str, str], ...]]:
+    return kind, name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    """Add to a counter (rows, requests, bytes, cache hits, ...)."""
+    if not _enabled:
+        return
+    key = _key("counter", name, labels)
+    with _lock:
+        _metrics[key] = _metrics.get(key, 0) + value
+
+
+def gauge(name: str, value: float, **labels: Any) -> None:
+    """Set a gauge to its latest value."""
+    if not _enabled:
+        return
+    with _lock:
+        _metrics[_key("gauge", name, labels)] = value
+
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    """Record one duration in a timer (count / sum / max)."""
+    if not _enabled:
+        return
+    key = _key("timer", name, labels)
+    with _lock:
+        t = _metrics.get(key)
+        if t is None:
+            _metrics[key] = [1, seconds, seconds]
+        else:
+            t[0] += 1
+            t[1] += seconds
+            t[2] = max(t[2], seconds)
+
+
+def rows(stage: str, *, rows_in: Optional[int] = None, rows_out: Optional[int] = None) -> None:
+    """rows_in / rows_out counters of one stage run."""
+    if not _enabled:
+        return
+    if rows_in is not None:
+        count("rows_in", rows_in, stage=stage)
+    if rows_out is not None:
+        count("rows_out", rows_out, stage=stage)
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name: str, labels: Dict[str, Any]) -> None:
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        observe(self.name, time.perf_counter() - self.t0, **self.labels)
+
+
+class _Span:
+    """
+    Wall + CPU time of a block, written as one JSON line when it ends.
+
+    CPU time is process-wide (time.process_time), so it includes other
+    threads running meanwhile. `set` attaches fields (rows in / out, ...)
+    to the event.
+    """
+    __slots__ = ("name", "labels", "fields", "t0", "c0", "token")
+
+    def __init__(self, name: str, labels: Dict[str, Any]) -> None:
+        self.name = name
+        self.labels = labels
+        self.fields: Dict[str, Any] = {}
+
+    def set(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    def __enter__(self) -> "_Span":
+        self.token = _span_path.set(_span_path.get() + (self.name,))
+        self.c0 = time.process_time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        wall = time.perf_counter() - self.t0
+        cpu = time.process_time() - self.c0
+        path = _span_path.get()
+        _span_path.reset(self.token)
+        if not _enabled:
+            return
+
+        observe("span_seconds", wall, span=self.name, **self.labels)
+        observe("span_cpu_seconds", cpu, span=self.name, **self.labels)
+        _write_lines([{
+            "type": "span",
+            "name": self.name,
+            "path": "/".join(path),
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "ok": exc_type is None,
+            "labels": {k: str(v) for k, v in self.labels.items()},
+            **({"fields": self.fields} if self.fields else {}),
+        }])
+        if len(path) == 1:
+            write_textfile()
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullContext":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **fields: Any) -> None:
+        return None
+
+
+_NULL = _NullContext()
+
+
+def timer(name: str, **labels: Any) -> Any:
+    """`with timer("finbert_inference"): ...` records the block's wall time."""
+    return _Timer(name, labels) if _enabled else _NULL
+
+
+def span(name: str, **labels: Any) -> Any:
+    """
+    `with span("finbert.score") as s: ...; s.set(rows_out=n)` records wall /
+    CPU time into span_seconds / span_cpu_seconds and appends an event with
+    the enclosing span path to the metrics file.
+    """
+    return _Span(name, labels) if _enabled else _NULL
+
+
+def traced(name: Optional[str] = None, **labels: Any) -> Callable:
+    """Decorator: run the function inside span(name or module.function)."""
+    def wrap(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, labels):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# --------------------------------------------------
+# Output
+# --------------------------------------------------
+def snapshot() -> List[Dict[str, Any]]:
+    """Current value of every counter / gauge / timer."""
+    with _lock:
+        items = [(k, list(v) if isinstance(v, list) else v) for k, v in _metrics.items()]
+    out = []
+    for (kind, name, labels), v in sorted(items, key=lambda kv: kv[0]):
+        row: Dict[str, Any] = {"kind": kind, "name": name, "labels": dict(labels)}
+        if kind == "timer":
+            row.update(count=v[0], sum=round(v[1], 6), max=round(v[2], 6))
+        else:
+            row["value"] = v
+        out.append(row)
+    return out
+
+
+def _write_lines(records: List[Dict[str, Any]]) -> None:
+    if _out_dir is None:
+        return
+    stamp = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "job": _job, "pid": os.getpid()}
+    lines = "".join(json.dumps({**stamp, **r}, default=str) + "\n" for r in records)
+    with open(_out_dir / METRICS_FILE, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def _metric_name(name: str) -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _label_str(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    esc = {k: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in labels.items()}
+    return "{" + ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", k)}="{v}"' for k, v in esc.items()) + "}"
+
+
+def prometheus_text(rows: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Prometheus text exposition of a snapshot; every series carries job=<job>."""
+    rows = snapshot() if rows is None else rows
+    series: Dict[str, Tuple[str, List[str]]] = {}
+
+    def add(family: str, kind: str, name: str, labels: Dict[str, str], value: float) -> None:
+        series.setdefault(family, (kind, []))[1].append(f"{name}{_label_str({'job': _job, **labels})} {value:.10g}")
+
+    for r in rows:
+        base = _metric_name(r["name"])
+        if r["kind"] == "counter":
+            name = base if base.endswith("_total") else f"{base}_total"
+            add(name, "counter", name, r["labels"], r["value"])
+        elif r["kind"] == "gauge":
+            add(base, "gauge", base, r["labels"], r["value"])
+        else:
+            # Timers: a summary without quantiles, plus the slowest observation
+            add(base, "summary", f"{base}_count", r["labels"], r["count"])
+            add(base, "summary", f"{base}_sum", r["labels"], r["sum"])
+            add(f"{base}_max", "gauge", f"{base}_max", r["labels"], r["max"])
+    ts = _metric_name("snapshot_timestamp_seconds")
+    add(ts, "gauge", ts, {}, time.time())
+
+    out = []
+    for name, (kind, lines) in series.items():
+        out.append(f"# TYPE {name} {kind}")
+        out += lines
+    return "\n".join(out) + "\n"
+
+
+def write_textfile(path: Optional[Path] = None) -> Optional[Path]:
+    """
+    Atomically (re)write the Prometheus textfile for this job, so a node
+    exporter textfile collector never reads a partial file.
+    """
+    if _out_dir is None and path is None:
+        return None
+    path = Path(path) if path else _out_dir / f"{_job}.prom"
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+
+def flush() -> None:
+    """Append the metric snapshot to the JSON-lines file and rewrite the textfile."""
+    if not _enabled or _out_dir is None:
+        return
+    rows = snapshot()
+    if rows:
+        _write_lines([{"type": "metric", **r} for r in rows])
+    write_textfile()
+
+
+_from_env()
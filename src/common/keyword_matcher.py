@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _fold(text: str) -> str:
+    """Lowercase without changing string length (so match offsets stay valid)."""
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return "".join(ch.lower()[:1] for ch in text)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the search terms of many labels (tickers).
+
+    Built once; each text is then scanned in a single pass regardless of how
+    many labels/terms there are. Matching is case-insensitive and respects
+    word boundaries: a term that starts (ends) with a word character must not
+    be preceded (followed) by one, so "ai" matches "AI chips" but not "said".
+    Terms starting with a symbol such as "$NVDA" are anchored by the symbol.
+
+    Example:
+        m = KeywordMatcher.for_tickers({"NVDA": ["cuda", "gpu"]})
+        m.first_matches("Bought $NVDA calls")  # {"NVDA": "$NVDA"}
+    """
+
+    def __init__(self, terms_by_label: Dict[str, List[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        self._term_len: List[int] = []
+        self._term_start_word: List[bool] = []
+        self._term_end_word: List[bool] = []
+        self._term_labels: List[List[str]] = []
+        self._term_index: Dict[str, int] = {}
+
+        for label, terms in terms_by_label.items():
+            for term in terms:
+                self._add(label, term)
+
+        self._build_fail_links()
+
+    @classmethod
+    def for_tickers(cls, keywords_by_ticker: Dict[str, List[str]]) -> "KeywordMatcher":
+        """Terms per ticker: the ticker itself, "$TICKER", then its keywords."""
+        return cls({t: [t, f"${t}"] + list(kws) for t, kws in keywords_by_ticker.items()})
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    def _add(self, label: str, term: str) -> None:
+        term = (term or "").strip()
+        if not term:
+            return
+        key = _fold(term)
+
+        idx = self._term_index.get(key)
+        if idx is not None:
+            if label not in self._term_labels[idx]:
+                self._term_labels[idx].append(label)
+            return
+
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+
+        idx = len(self._term_len)
+        self._term_index[key] = idx
+        self._term_len.append(len(key))
+        self._term_start_word.append(_is_word_char(key[0]))
+        self._term_end_word.append(_is_word_char(key[-1]))
+        self._term_labels.append([label])
+        self._out[state].append(idx)
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                # Inherit outputs of the suffix state so each state lists every term ending here
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # -----------------------------
+    # Matching
+    # -----------------------------
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (term_idx, start, end) for every boundary-respecting occurrence."""
+        if not text:
+            return
+        folded = _fold(text)
+        n = len(folded)
+        goto, fail, out = self._goto, self._fail, self._out
+
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for idx in out[state]:
+                start = i - self._term_len[idx] + 1
+                end = i + 1
+                if self._term_start_word[idx] and start > 0 and _is_word_char(folded[start - 1]):
+                    continue
+                if self._term_end_word[idx] and end < n and _is_word_char(folded[end]):
+                    continue
+                yield idx, start, end
+
+    def find_all(self, text: str) -> List[Tuple[str, str]]:
+        """Every (label, matched_text) pair found in text, in order of occurrence."""
+        return [
+            (label, text[start:end])
+            for idx, start, end in self.iter_matches(text)
+            for label in self._term_labels[idx]
+        ]
+
+    def first_matches(self, text: str) -> Dict[str, str]:
+        """
+        Leftmost match per label (longest term wins a tie), as it appears in text.
+        """
+        best: Dict[str, Tuple[int, int]] = {}
+        for idx, start, end in self.iter_matches(text):
+            for label in self._term_labels[idx]:
+                cur = best.get(label)
+                if cur is None or start < cur[0] or (start == cur[0] and end > cur[1]):
+                    best[label] = (start, end)
+        return {label: text[s:e] for label, (s, e) in best.items()}
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# ---------------------------------------------------------
+# Ticker x day panels
+# ---------------------------------------------------------
+def to_panel(
+    df: pd.DataFrame,
+    value_cols: list[str],
+    *,
+    ticker_col: str = "ticker",
+    date_col: str = "date",
+) -> Tuple[np.ndarray, pd.DatetimeIndex, Dict[str, np.ndarray]]:
+    """
+    Pivot long (ticker, date, values...) rows into dense ticker x day arrays.
+
+    The day axis is the sorted union of dates across tickers; cells with no
+    row are NaN (before a ticker starts, after it ends, or missing days).
+    Duplicate (ticker, date) rows keep the last value.
+
+    Returns:
+        (tickers, dates, {value_col: float64 array of shape (n_tickers, n_dates)})
+    """
+    dates_raw = pd.to_datetime(df[date_col]).to_numpy()
+    t_codes, tickers = pd.factorize(df[ticker_col], sort=True)
+    d_codes, dates = pd.factorize(dates_raw, sort=True)
+
+    panels: Dict[str, np.ndarray] = {}
+    for col in value_cols:
+        panel = np.full((len(tickers), len(dates)), np.nan)
+        panel[t_codes, d_codes] = df[col].to_numpy(dtype=np.float64)
+        panels[col] = panel
+
+    return np.asarray(tickers), pd.DatetimeIndex(dates), panels
+
+
+def from_panel(
+    tickers: np.ndarray,
+    dates: pd.DatetimeIndex,
+    panels: Dict[str, np.ndarray],
+    *,
+    mask: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    Flatten ticker x day arrays back into long (ticker, date, ...) rows.
+
+    Only cells where `mask` is True are kept (default: any value present).
+    """
+    if mask is None:
+        mask = np.zeros(next(iter(panels.values())).shape, dtype=bool)
+        for p in panels.values():
+            mask |= ~np.isnan(p)
+
+    ti, di = np.nonzero(mask)
+    out = {
+        "ticker": pd.Categorical.from_codes(ti, categories=pd.Index(tickers)),
+        "date": dates[di],
+    }
+    for name, p in panels.items():
+        out[name] = p[ti, di]
+
+    return pd.DataFrame(out)
+
+
+def cumulative(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Zero-padded cumulative sum and finite-count along the day axis.
+
+    Computed once, these give the trailing sum for any window via window_sums.
+    """
+    finite = np.isfinite(values)
+    filled = np.where(finite, values, 0.0)
+
+    pad = np.zeros(values.shape[:-1] + (1,))
+    cs = np.concatenate([pad, np.cumsum(filled, axis=-1)], axis=-1)
+    cn = np.concatenate([pad, np.cumsum(finite, axis=-1, dtype=np.float64)], axis=-1)
+    return cs, cn
+
+
+def window_total(cs: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day total from one zero-padded cumulative array of cumulative()."""
+    n = cs.shape[-1] - 1
+    total = cs[..., 1:].copy()
+    if window < n:
+        total[..., window:] -= cs[..., 1:n + 1 - window]
+    return total
+
+
+def window_sums(cs: np.ndarray, cn: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Trailing `window`-day sum and count from the output of cumulative()."""
+    return window_total(cs, window), window_total(cn, window)
+
+
+def rolling_sum(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing window sum and count of finite values along the day axis.
+
+    Uses one cumulative sum per array, so the cost does not depend on window.
+    """
+    return window_sums(*cumulative(values), window)
+
+
+def trailing_mean(values: np.ndarray, window: int, *, min_periods: int = 1) -> np.ndarray:
+    """Trailing `window`-day mean of finite values (NaN below min_periods)."""
+    sums, counts = rolling_sum(values, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+    mean[counts < max(min_periods, 1)] = np.nan
+    return mean
+
+
+# ---------------------------------------------------------
+# Realized volatility
+# ---------------------------------------------------------
+def log_returns(close: np.ndarray) -> np.ndarray:
+    """
+    Close-to-close log returns on a ticker x day panel.
+
+    A return is measured against the ticker's previous observed close, so a
+    missing day does not break the series; the first observation is NaN.
+    """
+    n = close.shape[-1]
+    valid = np.isfinite(close) & (close > 0)
+
+    # Index of the last valid close at or before each day (-1 = none yet)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(n), -1), axis=-1)
+    prev_idx = np.concatenate([np.full(close.shape[:-1] + (1,), -1), last_valid[..., :-1]], axis=-1)
+
+    prev_close = np.take_along_axis(close, np.maximum(prev_idx, 0), axis=-1)
+    ok = valid & (prev_idx >= 0)
+
+    out = np.full(close.shape, np.nan)
+    out[ok] = np.log(close[ok] / prev_close[ok])
+    return out
+
+
+def realized_volatility(
+    close: np.ndarray,
+    *,
+    window_days: int = 20,
+    annualize: bool = True,
+    trading_days_per_year: int = 252,
+    min_periods: int | None = None,
+) -> np.ndarray:
+    """
+    Trailing close-to-close realized volatility on a ticker x day panel:
+
+        rv_t = sqrt(mean(r^2 over the last window_days returns)) [* sqrt(252)]
+
+    Days with no close (or fewer than min_periods returns in the window) are NaN.
+    """
+    min_periods = window_days if min_periods is None else min_periods
+
+    r = log_returns(close)
+    sum_sq, count = rolling_sum(r * r, window_days)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.maximum(sum_sq, 0.0) / count
+    if annualize:
+        var = var * trading_days_per_year
+
+    rv = np.sqrt(var)
+    rv[(count < min_periods) | ~np.isfinite(close)] = np.nan
+    return rv
+
+
+def daily_realized_volatility(
+    close: np.ndarray,
+    *,
+    annualize: bool = True,
+    trading_days_per_year: int = 252,
+) -> np.ndarray:
+    """
+    One-day realized volatility, sqrt(r_t^2) = |r_t| [* sqrt(252)]: the daily
+    term of HAR-RV, built from that day's return only.
+    """
+    rv = np.abs(log_returns(close))
+    return rv * np.sqrt(trading_days_per_year) if annualize else rv
+
+
+def har_terms(daily: np.ndarray, windows: Iterable[int]) -> Dict[str, np.ndarray]:
+    """
+    HAR weekly / monthly terms: rv_<w>d = trailing w-day mean of the daily
+    realized-vol panel, NaN until half the window has returns.
+    """
+    return {f"rv_{int(w)}d": trailing_mean(daily, int(w), min_periods=max(1, int(w) // 2)) for w in windows}
+
+
+def shift_days(panel: np.ndarray, horizon: int) -> np.ndarray:
+    """Value `horizon` days ahead on the panel's day axis (NaN past the end)."""
+    if horizon <= 0:
+        return panel.copy()
+    out = np.full(panel.shape, np.nan)
+    out[..., :-horizon] = panel[..., horizon:]
+    return out
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.labeling import to_panel
+
+METRICS = ("mse", "mae", "qlike", "mz_alpha", "mz_beta", "mz_r2", "hit_rate")
+
+
+# ---------------------------------------------------------
+# Sufficient statistics
+# ---------------------------------------------------------
+def _iter_terms(y: np.ndarray, f: np.ndarray, ref: Optional[np.ndarray] = None) -> Iterator[Tuple[str, np.ndarray]]:
+    y = np.asarray(y, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    y, f = np.broadcast_arrays(y, f)
+
+    ok = np.isfinite(y) & np.isfinite(f)
+    yz = np.where(ok, y, 0.0)
+    fz = np.where(ok, f, 0.0)
+
+    yield "n", ok.astype(np.float64)
+    e = fz - yz
+    yield "se", e * e
+    yield "ae", np.abs(e)
+    del e
+
+    pos = ok & (y > 0) & (f > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.where(pos, (yz / np.where(pos, fz, 1.0)) ** 2, 1.0)
+    yield "nq", pos.astype(np.float64)
+    yield "q", r - np.log(r) - 1.0
+    del r, pos
+
+    yield "sf", fz
+    yield "sy", yz
+    yield "sff", fz * fz
+    yield "syy", yz * yz
+    yield "sfy", fz * yz
+
+    if ref is None:
+        yield "nh", np.zeros_like(yz)
+        yield "h", np.zeros_like(yz)
+    else:
+        ref = np.broadcast_to(np.asarray(ref, dtype=np.float64), y.shape)
+        okh = ok & np.isfinite(ref) & (y != ref)
+        with np.errstate(invalid="ignore"):
+            hit = okh & (np.sign(f - ref) == np.sign(y - ref))
+        yield "nh", okh.astype(np.float64)
+        yield "h", hit.astype(np.float64)
+
+
+def loss_terms(y: np.ndarray, f: np.ndarray, ref: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-cell contributions for realized values `y` and forecasts `f`.
+
+    Every metric is a function of the sums of these terms, so pooling over
+    tickers, days or bootstrap resamples is plain summation. Arrays broadcast,
+    so f may carry extra leading axes (e.g. models x tickers x days against a
+    tickers x days y). Missing cells contribute zero. QLIKE is on variances:
+    r = y^2 / f^2, r - log(r) - 1. The hit rate compares the predicted and
+    realized direction relative to `ref` (the value known at forecast time,
+    e.g. today's rv); without `ref` it is NaN.
+    """
+    return dict(_iter_terms(y, f, ref))
+
+
+def summed_terms(y: np.ndarray, f: np.ndarray, ref: Optional[np.ndarray] = None, *, axis=None) -> Dict[str, np.ndarray]:
+    """loss_terms summed over `axis`, reducing each term as soon as it is built."""
+    return {k: v.sum(axis=axis) for k, v in _iter_terms(y, f, ref)}
+
+
+def metrics_from_sums(s: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """All metrics from summed statistics (vectorized over any shape)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = s["n"]
+        mse = s["se"] / n
+        mae = s["ae"] / n
+        qlike = s["q"] / s["nq"]
+
+        # Mincer-Zarnowitz: y = a + b f + e; R^2 = squared correlation of y and f
+        cov = s["sfy"] - s["sf"] * s["sy"] / n
+        var_f = s["sff"] - s["sf"] ** 2 / n
+        var_y = s["syy"] - s["sy"] ** 2 / n
+        beta = cov / var_f
+        alpha = (s["sy"] - beta * s["sf"]) / n
+        r2 = cov * cov / (var_f * var_y)
+
+        hit = s["h"] / s["nh"]
+
+    return {
+        "n": n,
+        "mse": mse,
+        "mae": mae,
+        "qlike": qlike,
+        "mz_alpha": alpha,
+        "mz_beta": beta,
+        "mz_r2": r2,
+        "hit_rate": hit,
+    }
+
+
+# ---------------------------------------------------------
+# Panels: per ticker + pooled
+# ---------------------------------------------------------
+def forecast_metrics(y: np.ndarray, f: np.ndarray, ref: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """Pooled metrics over every cell (floats)."""
+    m = metrics_from_sums(summed_terms(y, f, ref))
+    return {k: float(v) for k, v in m.items()}
+
+
+def panel_metrics(y: np.ndarray, f: np.ndarray, ref: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Per-ticker metrics on (..., tickers, days) panels, reducing the day axis."""
+    return metrics_from_sums(summed_terms(y, f, ref, axis=-1))
+
+
+def previous_value(panel: np.ndarray) -> np.ndarray:
+    """Value one step earlier on the day axis (a naive `ref` for the hit rate)."""
+    out = np.full(panel.shape, np.nan)
+    out[..., 1:] = panel[..., :-1]
+    return out
+
+
+# ---------------------------------------------------------
+# Block bootstrap
+# ---------------------------------------------------------
+def block_bootstrap_indices(n_days: int, n_boot: int, block: int, seed: int = 0) -> np.ndarray:
+    """
+    (n_boot, n_days) matrix of resampled day indices: circular moving blocks
+    of length `block`, all drawn at once.
+    """
+    rng = np.random.default_rng(seed)
+    block = max(1, min(int(block), n_days))
+    n_blocks = -(-n_days // block)
+    starts = rng.integers(0, n_days, size=(n_boot, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)) % n_days
+    return idx.reshape(n_boot, -1)[:, :n_days]
+
+
+def _draw_counts(idx: np.ndarray, n_days: int) -> np.ndarray:
+    """How often each day appears in each resample: (n_boot, n_days)."""
+    n_boot = len(idx)
+    flat = (np.arange(n_boot)[:, None] * n_days + idx).ravel()
+    return np.bincount(flat, minlength=n_boot * n_days).reshape(n_boot, n_days).astype(np.float64)
+
+
+def bootstrap_ci(
+    y: np.ndarray,
+    f: np.ndarray,
+    ref: Optional[np.ndarray] = None,
+    *,
+    n_boot: int = 1000,
+    block: int = 10,
+    alpha: float = 0.05,
+    seed: int = 0,
+) -> Dict[str, np.ndarray]:
+    """
+    Block-bootstrap confidence intervals of the pooled metrics.
+
+    Days (last axis) are resampled in blocks to respect serial dependence;
+    all tickers of a day move together. Statistics are summed per day once,
+    and every resample is a row of a (n_boot x days) draw-count matrix, so all
+    resamples come from a single matrix product. Extra leading axes of f
+    (models) are evaluated in the same pass.
+
+    Returns {metric: array [..., 2]} with the (alpha/2, 1 - alpha/2) quantiles.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    day_sums = summed_terms(y, f, ref, axis=-2) if y.ndim >= 2 else loss_terms(y, f, ref)   # (..., days)
+    n_days = next(iter(day_sums.values())).shape[-1]
+
+    counts = _draw_counts(block_bootstrap_indices(n_days, n_boot, block, seed), n_days)
+    boot = {k: v @ counts.T for k, v in day_sums.items()}                          # (..., n_boot)
+
+    m = metrics_from_sums(boot)
+    q = [alpha / 2, 1 - alpha / 2]
+    return {k: np.moveaxis(np.nanquantile(v, q, axis=-1), 0, -1) for k, v in m.items() if k != "n"}
+
+
+# ---------------------------------------------------------
+# Long (ticker, date) predictions -> tidy table
+# ---------------------------------------------------------
+def evaluate_predictions(
+    df: pd.DataFrame,
+    *,
+    y_col: str = "y_true",
+    f_cols: Sequence[str] = ("y_pred",),
+    ref_col: Optional[str] = None,
+    ticker_col: str = "ticker",
+    date_col: str = "date",
+    n_boot: int = 0,
+    block: int = 10,
+    alpha: float = 0.05,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Tidy metrics for one or more forecast columns: a row per (model, ticker)
+    plus a pooled row per model (ticker="__all__"), with bootstrap CI columns
+    <metric>_lo / <metric>_hi on the pooled rows when n_boot > 0.
+    """
+    cols = [y_col, *f_cols] + ([ref_col] if ref_col else [])
+    tickers, _, panels = to_panel(df, cols, ticker_col=ticker_col, date_col=date_col)
+    y = panels[y_col]
+    f = np.stack([panels[c] for c in f_cols])          # models x tickers x days
+    ref = panels[ref_col] if ref_col else None
+
+    per = panel_metrics(y, f, ref)
+    pooled = metrics_from_sums(summed_terms(y, f, ref, axis=(-2, -1)))
+    ci = bootstrap_ci(y, f, ref, n_boot=n_boot, block=block, alpha=alpha, seed=seed) if n_boot else {}
+
+    frames = []
+    for i, model in enumerate(f_cols):
+        t = pd.DataFrame({"model": model, "ticker": np.asarray(tickers, dtype=object)})
+        for k, v in per.items():
+            t[k] = v[i]
+        p = {"model": model, "ticker": "__all__", **{k: float(v[i]) for k, v in pooled.items()}}
+        for k, v in ci.items():
+            p[f"{k}_lo"], p[f"{k}_hi"] = float(v[i, 0]), float(v[i, 1])
+        frames += [t, pd.DataFrame([p])]
+
+    out = pd.concat(frames, ignore_index=True)
+    out["n"] = out["n"].astype(np.int64)
+    return out
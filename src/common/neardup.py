@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Smallest prime above 2**32; with a, b, x < 2**32, (a * x + b) fits in uint64
+_PRIME = np.uint64(4294967311)
+_TOKEN_RX = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str, n: int = 3) -> set[int]:
+    """Hashed word n-grams of a normalized text (short texts fall back to single words)."""
+    tokens = _TOKEN_RX.findall((text or "").lower())
+    if len(tokens) < n:
+        grams = tokens
+    else:
+        grams = [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+
+def minhash_signatures(texts: Sequence[str], *, num_perm: int = 64, shingle_size: int = 3, seed: int = 42) -> np.ndarray:
+    """
+    MinHash signature matrix of shape (len(texts), num_perm), dtype uint64.
+
+    Empty texts get an all-max signature (they only collide with each other).
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+
+    sigs = np.full((len(texts), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, text in enumerate(texts):
+        sh = shingles(text, shingle_size)
+        if not sh:
+            continue
+        x = np.fromiter(sh, dtype=np.uint64, count=len(sh))
+        sigs[i] = ((np.outer(x, a) + b) % _PRIME).min(axis=0)
+    return sigs
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_near_duplicates(
+    texts: Sequence[str],
+    *,
+    threshold: float = 0.8,
+    num_perm: int = 64,
+    bands: int = 16,
+    shingle_size: int = 3,
+    seed: int = 42,
+) -> np.ndarray:
+    """
+    Group near-identical texts with MinHash + LSH banding.
+
+    Candidate pairs share at least one band; they are merged when their
+    estimated Jaccard similarity is >= threshold.
+
+    Returns:
+        int array of length len(texts): the index of each text's cluster
+        representative (the first text of the cluster, so rep[i] <= i).
+    """
+    n = len(texts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+    sigs = minhash_signatures(texts, num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+    rows = num_perm // bands
+    parent = list(range(n))
+
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        block = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            buckets[block[i].tobytes()].append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            head = members[0]
+            for j in members[1:]:
+                ri, rj = _find(parent, head), _find(parent, j)
+                if ri == rj:
+                    continue
+                if np.mean(sigs[head] == sigs[j]) >= threshold:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    return np.array([_find(parent, i) for i in range(n)], dtype=np.int64)
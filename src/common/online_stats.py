@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from common.paths import INTERIM_DATA_DIR
+
+STATE_PATH = INTERIM_DATA_DIR / "online_stats.json"
+
+
+# ---------------------------------------------------------
+# Constant-time building blocks
+# ---------------------------------------------------------
+@dataclass
+class RollingWindow:
+    """
+    Mean / variance over the last `window` slots, updated in O(1) per push.
+
+    Slots hold NaN for missing observations (they occupy a position but do
+    not count), matching pandas `rolling(window, min_periods=...)`. Welford
+    add/remove updates are used between pushes; the moments are recomputed
+    exactly from the ring buffer once per full cycle to stop float drift.
+    """
+    window: int
+    min_periods: int = 1
+    buffer: List[Optional[float]] = field(default_factory=list)
+    pos: int = 0
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.buffer:
+            self.buffer = [None] * self.window
+
+    @classmethod
+    def from_values(cls, window: int, min_periods: int, values: Sequence[Optional[float]]) -> "RollingWindow":
+        """Window state after pushing `values` (oldest first) one by one."""
+        tail = [None if v is None or not math.isfinite(v) else float(v) for v in list(values)[-window:]]
+        rw = cls(window, min_periods, [None] * (window - len(tail)) + tail)
+        rw._recompute()
+        return rw
+
+    def push(self, x: Optional[float]) -> None:
+        if x is not None and not math.isfinite(x):
+            x = None
+
+        old = self.buffer[self.pos]
+        if old is not None:
+            self._remove(old)
+        self.buffer[self.pos] = x
+        if x is not None:
+            self._add(x)
+
+        self.pos = (self.pos + 1) % self.window
+        if self.pos == 0:
+            self._recompute()
+
+    def _add(self, x: float) -> None:
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+
+    def _remove(self, x: float) -> None:
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        d = x - self.mean
+        self.mean -= d / (self.count - 1)
+        self.m2 -= d * (x - self.mean)
+        self.count -= 1
+
+    def _recompute(self) -> None:
+        vals = [v for v in self.buffer if v is not None]
+        self.count = len(vals)
+        self.mean = sum(vals) / self.count if vals else 0.0
+        self.m2 = sum((v - self.mean) ** 2 for v in vals)
+
+    def value_mean(self) -> float:
+        return self.mean if self.count >= self.min_periods and self.count else math.nan
+
+    def value_var(self, ddof: int = 1) -> float:
+        if self.count < max(self.min_periods, ddof + 1):
+            return math.nan
+        return max(self.m2, 0.0) / (self.count - ddof)
+
+
+@dataclass
+class RollingRealizedVol:
+    """
+    Trailing close-to-close realized vol, one day at a time.
+
+    Same definition as common.labeling.realized_volatility: mean of squared
+    log returns over the last `window_days` calendar slots, annualized.
+    `daily` is the latest day's one-day vol (labeling.daily_realized_volatility).
+    """
+    window_days: int = 20
+    min_periods: int = 20
+    trading_days_per_year: int = 252
+    annualize: bool = True
+    last_close: Optional[float] = None
+    sq_returns: Optional[RollingWindow] = None
+    daily: float = math.nan
+
+    def __post_init__(self) -> None:
+        if self.sq_returns is None:
+            self.sq_returns = RollingWindow(self.window_days, self.min_periods)
+        elif isinstance(self.sq_returns, dict):
+            self.sq_returns = RollingWindow(**self.sq_returns)
+
+    def update(self, close: Optional[float]) -> float:
+        """Advance one day (close=None when the ticker has no price that day)."""
+        if close is None or not math.isfinite(close) or close <= 0:
+            self.sq_returns.push(None)
+            self.daily = math.nan
+            return math.nan
+
+        r2 = math.log(close / self.last_close) ** 2 if self.last_close else None
+        self.last_close = close
+        self.sq_returns.push(r2)
+        self.daily = math.nan if r2 is None else math.sqrt(r2 * (self.trading_days_per_year if self.annualize else 1))
+
+        m = self.sq_returns.value_mean()
+        if self.annualize:
+            m *= self.trading_days_per_year
+        return math.sqrt(m) if math.isfinite(m) else math.nan
+
+
+# ---------------------------------------------------------
+# Persisted per-ticker state
+# ---------------------------------------------------------
+@dataclass
+class TickerState:
+    last_day: Optional[str] = None
+    last_close_day: Optional[str] = None
+    rv: Optional[RollingRealizedVol] = None
+    har: Dict[str, RollingWindow] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.rv, dict):
+            self.rv = RollingRealizedVol(**self.rv)
+        self.har = {k: RollingWindow(**v) if isinstance(v, dict) else v for k, v in self.har.items()}
+
+
+class OnlineStatsStore:
+    """
+    Per-ticker rolling state for daily label updates.
+
+    Example:
+        store = OnlineStatsStore.load()
+        row = store.update_closes("2026-02-18", {"NVDA": 187.9})["NVDA"]
+        row["rv"], row["rv_d"], row["rv_5d"]
+        store.save()
+    """
+
+    def __init__(
+        self,
+        *,
+        window_days: int = 20,
+        min_periods: int = 20,
+        trading_days_per_year: int = 252,
+        annualize: bool = True,
+        har_windows: Sequence[int] = (),
+        tickers: Optional[Dict[str, TickerState]] = None,
+    ):
+        self.window_days = window_days
+        self.min_periods = min_periods
+        self.trading_days_per_year = trading_days_per_year
+        self.annualize = annualize
+        self.har_windows = [int(w) for w in har_windows]
+        self.tickers: Dict[str, TickerState] = tickers or {}
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "window_days": self.window_days,
+            "min_periods": self.min_periods,
+            "trading_days_per_year": self.trading_days_per_year,
+            "annualize": self.annualize,
+            "har_windows": self.har_windows,
+        }
+
+    @property
+    def last_day(self) -> Optional[str]:
+        return max((st.last_day for st in self.tickers.values() if st.last_day), default=None)
+
+    def _state(self, ticker: str) -> TickerState:
+        st = self.tickers.get(ticker)
+        if st is None:
+            st = self.tickers[ticker] = TickerState()
+        return st
+
+    def update_closes(self, day: str, closes: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+        """
+        Advance every tracked ticker by one trading day.
+
+        Tickers already tracked but absent from `closes` get a missing slot,
+        exactly like a NaN cell in the batch panel. Returns {ticker: {"rv",
+        "rv_d", "rv_<w>d"...}} for the tickers with a close that day, the
+        columns pipelines.make_labels.compute_labels writes for that row.
+        """
+        out: Dict[str, Dict[str, float]] = {}
+        for ticker in set(self.tickers) | set(closes):
+            st = self._state(ticker)
+            if st.rv is None:
+                if ticker not in closes:
+                    continue
+                st.rv = RollingRealizedVol(self.window_days, self.min_periods, self.trading_days_per_year, self.annualize)
+                st.har = {f"rv_{w}d": RollingWindow(w, max(1, w // 2)) for w in self.har_windows}
+            if st.last_day is not None and day <= st.last_day:
+                raise ValueError(f"{ticker}: day {day} is not after last update {st.last_day}")
+
+            st.last_day = day
+            close = closes.get(ticker)
+            rv = st.rv.update(close)
+            for window in st.har.values():
+                window.push(st.rv.daily)
+            if close is not None and math.isfinite(close) and close > 0:
+                st.last_close_day = day
+                out[ticker] = {"rv": rv, "rv_d": st.rv.daily, **{k: w.value_mean() for k, w in st.har.items()}}
+        return out
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.settings(), "tickers": {t: asdict(st) for t, st in self.tickers.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OnlineStatsStore":
+        data = dict(data)
+        tickers = {t: TickerState(**st) for t, st in (data.pop("tickers", None) or {}).items()}
+        return cls(tickers=tickers, **data)
+
+    def save(self, path: Path = STATE_PATH) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = STATE_PATH, **defaults: Any) -> "OnlineStatsStore":
+        path = Path(path)
+        if not path.exists():
+            return cls(**defaults)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
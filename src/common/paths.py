@@ -16,6 +16,7 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 MARKET_PROCESSED_DATA_DIR = PROCESSED_DATA_DIR / "market"
 NEWS_PROCESSED_DATA_DIR = PROCESSED_DATA_DIR / "news"
 SOCIAL_PROCESSED_DATA_DIR = PROCESSED_DATA_DIR / "social"
+LABELS_PROCESSED_DATA_DIR = PROCESSED_DATA_DIR / "labels"
 
 ARTIFACTS_DIR = PROJECT_ROOT / "artifacts"
 MODELS_DIR = ARTIFACTS_DIR / "models"
@@ -41,6 +42,7 @@ def ensure_dirs():
         MARKET_PROCESSED_DATA_DIR,
         NEWS_PROCESSED_DATA_DIR,
         SOCIAL_PROCESSED_DATA_DIR,
+        LABELS_PROCESSED_DATA_DIR,
 
         MODELS_DIR,
         PREDICTIONS_DIR,
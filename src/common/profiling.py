@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from common.paths import PROJECT_ROOT, REPORTS_DIR
+
+# Comma-separated function names ("run_finbert_on_yahoo_news", or
+# "finbert_pipeline.run_finbert_on_yahoo_news"), or "all"
+ENV_VAR = "PIPELINE_PROFILE"
+ENV_MODES = "PIPELINE_PROFILE_MODES"          # cpu, memory, sample (default: cpu,memory)
+ENV_TOP = "PIPELINE_PROFILE_TOP"              # rows per summary table (default: 20)
+ENV_INTERVAL = "PIPELINE_PROFILE_INTERVAL_MS" # sampling interval (default: 5)
+PROFILES_DIR = REPORTS_DIR / "profiles"
+MODES = ("cpu", "memory", "sample")
+MEMORY_FRAMES = 5       # traceback depth per allocation; tracing cost grows with it
+
+_targets: set = set()
+_modes: tuple = ("cpu", "memory")
+_top = 20
+_interval_s = 0.005
+_out_dir = PROFILES_DIR
+_active = False
+
+
+# --------------------------------------------------
+# Switch
+# --------------------------------------------------
+def configure(
+    targets: Iterable[str] = (),
+    *,
+    modes: Iterable[str] = ("cpu", "memory"),
+    top: int = 20,
+    interval_ms: float = 5.0,
+    out_dir: Optional[str | Path] = None,
+) -> None:
+    """
+    Select the functions to profile. Only functions decorated with
+    @profiled can be selected; an empty `targets` turns profiling off.
+    """
+    global _targets, _modes, _top, _interval_s, _out_dir
+    modes = tuple(m.strip() for m in modes if m.strip())
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise ValueError(f"Unknown profiling mode(s) {sorted(unknown)}; choose from {MODES}")
+    _targets = {t.strip() for t in targets if t.strip()}
+    _modes = modes
+    _top = int(top)
+    _interval_s = float(interval_ms) / 1e3
+    _out_dir = Path(out_dir) if out_dir else PROFILES_DIR
+
+
+def _from_env() -> None:
+    targets = os.getenv(ENV_VAR, "")
+    if targets.strip():
+        configure(
+            targets.split(","),
+            modes=os.getenv(ENV_MODES, "cpu,memory").split(","),
+            top=int(os.getenv(ENV_TOP, "20")),
+            interval_ms=float(os.getenv(ENV_INTERVAL, "5")),
+        )
+
+
+def _selected(fn: Callable) -> bool:
+    if not _targets:
+        return False
+    module = fn.__module__.rsplit(".", 1)[-1]
+    names = {"all", fn.__name__, f"{module}.{fn.__name__}", f"{fn.__module__}:{fn.__name__}"}
+    return not _targets.isdisjoint(names)
+
+
+# --------------------------------------------------
+# Sampling
+# --------------------------------------------------
+class _Sampler:
+    """
+    Stack sampler for one thread: every `interval` seconds the thread's
+    current stack is recorded, giving collapsed stacks ("a;b;c count") for
+    flame graphs. Cheap enough to leave on for long stages; the precision
+    is the interval.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.n = 0
+        self._names: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = self._names.get(code)
+                if name is None:
+                    module = short_path(code.co_filename)
+                    if not module.startswith("<"):
+                        module = os.path.splitext(module)[0].replace("/", ".")
+                    name = self._names[code] = f"{module}.{code.co_name}"
+                stack.append(name)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.n += 1
+
+    def __enter__(self) -> "_Sampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def leaf_counts(self) -> Counter:
+        leaves: Counter = Counter()
+        for stack, n in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        return leaves
+
+
+# --------------------------------------------------
+# Profiling one call
+# --------------------------------------------------
+def short_path(filename: str) -> str:
+    """
+    File name for reports: relative to the project root for project files,
+    else to the sys.path entry it was imported from (e.g. pandas/core/frame.py).
+    Unlike a bare basename, two files named model.py or __init__.py stay apart.
+    """
+    if not filename or filename.startswith("<") or filename == "~":
+        return filename
+    path = os.path.abspath(filename)
+    for root in [str(PROJECT_ROOT), *sorted((p for p in sys.path if p), key=len, reverse=True)]:
+        root = os.path.abspath(root)
+        if path.startswith(root + os.sep):
+            return os.path.relpath(path, root).replace(os.sep, "/")
+    return path
+
+
+def _short_stats(stats: pstats.Stats) -> pstats.Stats:
+    """pstats.Stats.strip_dirs(), but keeping short_path() names instead of basenames."""
+    names: Dict[str, str] = {}
+
+    def short(func: tuple) -> tuple:
+        if func[0] not in names:
+            names[func[0]] = short_path(func[0])
+        return (names[func[0]], *func[1:])
+
+    new: Dict[tuple, tuple] = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        key = short(func)
+        entry = (cc, nc, tt, ct, {short(c): v for c, v in callers.items()})
+        new[key] = pstats.add_func_stats(new[key], entry) if key in new else entry
+    stats.stats = new
+    stats.top_level = {short(f) for f in stats.top_level}
+    stats.max_name_len = max((len(pstats.func_std_string(f)) for f in new), default=0)
+    stats.fcn_list = None
+    stats.all_callees = None
+    return stats
+
+
+def _cpu_report(prof: cProfile.Profile, top: int) -> str:
+    buf = io.StringIO()
+    stats = _short_stats(pstats.Stats(prof, stream=buf))
+    stats.sort_stats("cumulative").print_stats(top)
+    stats.sort_stats("tottime").print_stats(top)
+    return buf.getvalue()
+
+
+# Allocations made by the profilers themselves
+_OWN_FILES = [tracemalloc.Filter(False, f) for f in (tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__)]
+
+
+def _memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int) -> tuple[str, List[str]]:
+    before, after = before.filter_traces(_OWN_FILES), after.filter_traces(_OWN_FILES)
+    diff = after.compare_to(before, "lineno")
+    lines = [str(d) for d in diff[:top]]
+    by_size = after.statistics("traceback")[:max(3, top // 4)]
+    tb = []
+    for s in by_size:
+        tb.append(f"{s.size / 2**20:.1f} MiB in {s.count} blocks")
+        tb += [f"    {line}" for line in s.traceback.format()]
+    text = "Allocation growth by line (after - before):\n" + "\n".join(lines)
+    text += "\n\nLargest live allocations at the end, with tracebacks:\n" + "\n".join(tb) + "\n"
+    return text, lines
+
+
+def run_profiled(name: str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Call fn(*args, **kwargs) under the configured profilers and write the
+    artifacts to <profiles dir>/<name>_<timestamp>/:
+
+      cpu.prof / cpu.txt         cProfile stats (open .prof with snakeviz / pstats)
+      memory.txt / memory.snap   tracemalloc growth by line + the end snapshot
+      samples.folded             collapsed stacks (flamegraph.pl / speedscope)
+      summary.json               wall time, peak traced memory, top entries
+
+    A top-N summary is printed when the call returns (or raises).
+    """
+    global _active
+    stem = f"{name}_{time.strftime('%Y%m%d-%H%M%S')}"
+    out = _out_dir / stem
+    n = 1
+    while out.exists():         # same function profiled twice within a second
+        n += 1
+        out = _out_dir / f"{stem}_{n}"
+    out.mkdir(parents=True)
+    modes = set(_modes)
+
+    prof = cProfile.Profile() if "cpu" in modes else None
+    sampler = _Sampler(threading.get_ident(), _interval_s) if "sample" in modes else None
+    started_tracing = False
+    before = None
+    if "memory" in modes:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_FRAMES)
+            started_tracing = True
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+    _active = True
+    error: Optional[BaseException] = None
+    t0 = time.perf_counter()
+    try:
+        if sampler:
+            sampler.__enter__()
+        if prof:
+            prof.enable()
+        try:
+            return fn(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+    finally:
+        if prof:
+            prof.disable()
+        if sampler:
+            sampler.__exit__(None, None, None)
+        wall = time.perf_counter() - t0
+        _active = False
+
+        after = None
+        if before is not None:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+        summary: Dict[str, Any] = {"function": name, "wall_s": round(wall, 3), "modes": sorted(modes), "ok": error is None}
+        printed = [f"\n[profile] {name}: {wall:.2f}s wall -> {out}"]
+
+        if prof:
+            prof.dump_stats(out / "cpu.prof")
+            (out / "cpu.txt").write_text(_cpu_report(prof, _top), encoding="utf-8")
+            stats = _short_stats(pstats.Stats(prof)).sort_stats("cumulative")
+            rows = []
+            for func, (cc, nc, tt, ct, _) in stats.stats.items():
+                rows.append((ct, tt, nc, f"{func[0]}:{func[1]}({func[2]})"))
+            rows.sort(reverse=True)
+            summary["cpu_top"] = [
+                {"function": f, "calls": nc, "cumulative_s": round(ct, 4), "own_s": round(tt, 4)}
+                for ct, tt, nc, f in rows[:_top]
+            ]
+            printed.append(f"  CPU, top {_top} by cumulative time:")
+            printed += [f"    {ct:9.3f}s cum {tt:9.3f}s own {nc:>9} calls  {f}" for ct, tt, nc, f in rows[:_top]]
+
+        if after is not None:
+            after.dump(str(out / "memory.snap"))
+            text, lines = _memory_report(before, after, _top)
+            (out / "memory.txt").write_text(text, encoding="utf-8")
+            summary["peak_traced_mb"] = round(peak / 2**20, 1)
+            summary["memory_top"] = lines
+            printed.append(f"  Memory: peak {peak / 2**20:.1f} MiB traced; top {_top} growth by line:")
+            printed += [f"    {line}" for line in lines]
+
+        if sampler:
+            with open(out / "samples.folded", "w", encoding="utf-8") as f:
+                for stack, n in sampler.stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            leaves = sampler.leaf_counts().most_common(_top)
+            summary["samples"] = sampler.n
+            summary["sample_top"] = [{"function": k, "share": round(v / max(sampler.n, 1), 4)} for k, v in leaves]
+            printed.append(f"  Samples ({sampler.n} every {_interval_s * 1e3:g} ms), top {_top} leaf functions:")
+            printed += [f"    {100 * v / max(sampler.n, 1):5.1f}%  {k}" for k, v in leaves]
+
+        with open(out / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print("\n".join(printed))
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Decorator: profile the call when the function is selected (configure()
+    or PIPELINE_PROFILE); otherwise call straight through. Nested selected
+    calls run unprofiled inside the outer one.
+    """
+    @functools.wraps(fn)
+    def inner(*args: Any, **kwargs: Any) -> Any:
+        if not _targets or _active or not _selected(fn):
+            return fn(*args, **kwargs)
+        return run_profiled(fn.__name__, fn, *args, **kwargs)
+    return inner
+
+
+_from_env()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable
+
+import numpy as np
+
+from common.labeling import cumulative, log_returns, window_sums
+
+ESTIMATORS = ("parkinson", "garman_klass", "rogers_satchell", "yang_zhang")
+
+_LN2 = math.log(2.0)
+
+
+def range_volatility(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    *,
+    windows: Iterable[int] = (5, 10, 20),
+    estimators: Iterable[str] = ESTIMATORS,
+    min_periods_frac: float = 0.75,
+    annualize: bool = True,
+    trading_days_per_year: int = 252,
+) -> Dict[str, np.ndarray]:
+    """
+    OHLC range-based volatility estimators on ticker x day panels.
+
+    Per-day log ranges are computed once and shared by every estimator:
+        u = ln(H/O), d = ln(L/O), c = ln(C/O), o = ln(O / previous close)
+
+        parkinson        (u - d)^2 / (4 ln 2)
+        garman_klass     0.5 (u - d)^2 - (2 ln 2 - 1) c^2
+        rogers_satchell  u (u - c) + d (d - c)
+        yang_zhang       var(o) + k var(c) + (1 - k) mean(rogers_satchell),
+                         k = 0.34 / (1.34 + (n + 1) / (n - 1))
+
+    All per-day terms are stacked and cumulated once; each window is then two
+    array lookups. Returns {"<estimator>_<w>d": vol panel} (NaN where fewer
+    than ceil(min_periods_frac * w) days are available or the day has no bar).
+    """
+    estimators = tuple(estimators)
+    unknown = set(estimators) - set(ESTIMATORS)
+    if unknown:
+        raise ValueError(f"Unknown range-vol estimators: {sorted(unknown)}")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        u = np.log(high / open_)
+        d = np.log(low / open_)
+        c = np.log(close / open_)
+
+        # Overnight gap ln(O / previous close) = close-to-close return - intraday leg
+        o = log_returns(close) - c
+
+    hl = u - d
+    terms = np.stack([
+        hl * hl / (4.0 * _LN2),                       # 0 parkinson
+        0.5 * hl * hl - (2.0 * _LN2 - 1.0) * c * c,   # 1 garman_klass
+        u * (u - c) + d * (d - c),                    # 2 rogers_satchell
+        o,                                            # 3 overnight
+        o * o,                                        # 4
+        c,                                            # 5 open-to-close
+        c * c,                                        # 6
+    ])
+    cs, cn = cumulative(terms)
+
+    bar = np.isfinite(close) & np.isfinite(open_) & np.isfinite(high) & np.isfinite(low)
+    scale = trading_days_per_year if annualize else 1
+
+    out: Dict[str, np.ndarray] = {}
+    for w in windows:
+        sums, counts = window_sums(cs, cn, int(w))
+        min_periods = max(2, math.ceil(min_periods_frac * w))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / counts
+            var_by_name = {
+                "parkinson": mean[0],
+                "garman_klass": mean[1],
+                "rogers_satchell": mean[2],
+            }
+
+            if "yang_zhang" in estimators:
+                n_o, n_c = counts[3], counts[5]
+                var_o = (sums[4] - sums[3] ** 2 / n_o) / (n_o - 1)
+                var_c = (sums[6] - sums[5] ** 2 / n_c) / (n_c - 1)
+                k = 0.34 / (1.34 + (n_c + 1) / (n_c - 1))
+                var_by_name["yang_zhang"] = var_o + k * var_c + (1 - k) * mean[2]
+
+        invalid = (counts[0] < min_periods) | ~bar
+        for name in estimators:
+            vol = np.sqrt(np.maximum(var_by_name[name], 0.0) * scale)
+            if name == "yang_zhang":
+                invalid_yz = invalid | (counts[3] < min_periods)
+                vol[invalid_yz] = np.nan
+            else:
+                vol[invalid] = np.nan
+            out[f"{name}_{w}d"] = vol
+
+    return out
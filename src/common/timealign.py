@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TZ = "America/New_York"
+DEFAULT_CLOSE_TIME = "16:00:00"
+
+
+# ---------------------------------------------------------
+# Trading-session calendar
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class SessionCalendar:
+    """
+    Sorted session dates plus each session's close as UTC epoch nanoseconds.
+
+    A timestamp belongs to the first session whose close is strictly after
+    it: anything published at or after the 16:00 close (or on a weekend /
+    holiday) rolls forward to the next session it can affect.
+    """
+    sessions: pd.DatetimeIndex      # naive session dates (midnight)
+    closes_ns: np.ndarray           # int64, same length, strictly increasing
+
+    def session_index(self, ts_ns: np.ndarray) -> np.ndarray:
+        """Index into `sessions` per timestamp (-1 past the last close or for NaT)."""
+        ts_ns = np.asarray(ts_ns, dtype=np.int64)
+        idx = np.searchsorted(self.closes_ns, ts_ns, side="right")
+        idx[(idx >= len(self.closes_ns)) | (ts_ns == _NAT)] = -1
+        return idx
+
+    def align(self, values: Any) -> pd.DatetimeIndex:
+        """Session date per timestamp (NaT when no session is covered)."""
+        return self.align_ns(to_utc_ns(values))
+
+    def align_ns(self, ts_ns: np.ndarray) -> pd.DatetimeIndex:
+        """Like align(), for timestamps already in UTC epoch nanoseconds."""
+        idx = self.session_index(ts_ns)
+        out = self.sessions.values.take(np.maximum(idx, 0))
+        out[idx < 0] = np.datetime64("NaT")
+        return pd.DatetimeIndex(out)
+
+
+_NAT = np.iinfo(np.int64).min
+
+
+def build_session_calendar(
+    start: Any,
+    end: Any,
+    *,
+    tz: str = DEFAULT_TZ,
+    close_time: str = DEFAULT_CLOSE_TIME,
+    sessions: Optional[Iterable[Any]] = None,
+) -> SessionCalendar:
+    """
+    Precompute session closes between start and end (inclusive).
+
+    Sessions default to weekdays; pass the dates actually present in market
+    data as `sessions` to respect exchange holidays.
+    """
+    if sessions is None:
+        days = pd.bdate_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize())
+    else:
+        days = pd.DatetimeIndex(sorted(set(normalize_session_dates(pd.Series(list(sessions))))))
+
+    closes = (days + pd.Timedelta(close_time)).tz_localize(tz).tz_convert("UTC")
+    return SessionCalendar(sessions=days, closes_ns=closes.asi8.copy())
+
+
+def calendar_for_timestamps(
+    ts_ns: np.ndarray,
+    run_cfg: Optional[Dict[str, Any]] = None,
+    *,
+    sessions: Optional[Iterable[Any]] = None,
+    pad_days: int = 10,
+) -> SessionCalendar:
+    """
+    Calendar covering a batch of timestamps, using run.yaml's timezone and
+    frequency.market_close_time.
+    """
+    run_cfg = run_cfg or {}
+    tz = (run_cfg.get("project") or {}).get("timezone", DEFAULT_TZ)
+    close_time = (run_cfg.get("frequency") or {}).get("market_close_time", DEFAULT_CLOSE_TIME)
+
+    valid = ts_ns[ts_ns != _NAT]
+    if len(valid) == 0:
+        start = end = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    else:
+        start, end = pd.Timestamp(int(valid.min())), pd.Timestamp(int(valid.max()))
+
+    return build_session_calendar(
+        start - pd.Timedelta(days=1),
+        end + pd.Timedelta(days=pad_days),
+        tz=tz,
+        close_time=close_time,
+        sessions=sessions,
+    )
+
+
+# ---------------------------------------------------------
+# Conversions
+# ---------------------------------------------------------
+def to_utc_ns(values: Any) -> np.ndarray:
+    """
+    UTC epoch nanoseconds for epoch seconds (e.g. Reddit created_utc) or
+    ISO-8601 strings / datetimes (naive values are taken as UTC). Missing -> NaT.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        secs = s.to_numpy(dtype=np.float64)
+        out = np.full(len(secs), _NAT, dtype=np.int64)
+        ok = np.isfinite(secs)
+        out[ok] = np.round(secs[ok] * 1e9).astype(np.int64)
+        return out
+
+    ts = pd.to_datetime(s, utc=True, errors="coerce", format="mixed")
+    return pd.DatetimeIndex(ts).as_unit("ns").asi8.copy()
+
+
+def align_to_sessions(
+    values: Any,
+    run_cfg: Optional[Dict[str, Any]] = None,
+    *,
+    sessions: Optional[Iterable[Any]] = None,
+) -> pd.DatetimeIndex:
+    """Map a batch of timestamps to the trading session each can affect."""
+    ts_ns = to_utc_ns(values)
+    cal = calendar_for_timestamps(ts_ns, run_cfg, sessions=sessions)
+    return cal.align_ns(ts_ns)
+
+
+def session_dates_iso(
+    values: Any,
+    run_cfg: Optional[Dict[str, Any]] = None,
+    *,
+    sessions: Optional[Iterable[Any]] = None,
+) -> list[Optional[str]]:
+    """align_to_sessions as "YYYY-MM-DD" strings (None when unmapped), for JSONL rows."""
+    aligned = align_to_sessions(values, run_cfg, sessions=sessions)
+    iso = aligned.strftime("%Y-%m-%d")
+    return [None if pd.isna(d) else d for d in iso]
+
+
+def normalize_session_dates(values: Any) -> pd.Series:
+    """
+    Parse session-date values (e.g. Tiingo's "2026-02-10T00:00:00.000Z") into
+    naive midnight timestamps, keeping the calendar date as written.
+    """
+    ts = pd.to_datetime(pd.Series(values), utc=True, errors="coerce", format="mixed")
+    return ts.dt.tz_localize(None).dt.normalize()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.metrics import forecast_metrics
+from models.base import BaseModel
+
+KEY_COLS = ("ticker", "date")
+
+
+# --------------------------------------------------
+# Fold layout
+# --------------------------------------------------
+@dataclass(frozen=True)
+class Fold:
+    """
+    Row ranges of one walk-forward fold on the date-sorted table.
+
+    Train covers days [train_start, train_end) and test [test_start, test_end)
+    as half-open indices into the table's sorted unique dates.
+    """
+    fold: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def make_folds(
+    n_days: int,
+    *,
+    window: str = "expanding",
+    train_days: int = 250,
+    test_days: int = 20,
+    horizon: int = 1,
+) -> List[Fold]:
+    """
+    Walk-forward folds over `n_days` sorted dates.
+
+    Each test block of `test_days` follows its training window; the last
+    `horizon` days before the test block are purged from training, since
+    their labels (realized `horizon` days ahead) are not yet known at the
+    test start. window="expanding" trains on everything before the gap,
+    window="rolling" on the most recent `train_days` days only. The first
+    fold starts once `train_days` days are available.
+    """
+    if window not in ("expanding", "rolling"):
+        raise ValueError(f"Unknown window: {window}")
+
+    folds: List[Fold] = []
+    test_start = train_days + horizon
+    while test_start < n_days:
+        train_end = test_start - horizon
+        train_start = 0 if window == "expanding" else max(0, train_end - train_days)
+        folds.append(Fold(len(folds), train_start, train_end, test_start, min(test_start + test_days, n_days)))
+        test_start += test_days
+    return folds
+
+
+def _chunks(folds: List[Fold], n: int) -> List[List[Fold]]:
+    """Split folds into n contiguous runs (warm starts carry within a run)."""
+    bounds = np.linspace(0, len(folds), n + 1).round().astype(int)
+    return [folds[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+# --------------------------------------------------
+# Worker
+# --------------------------------------------------
+def _scored(y: np.ndarray, pred: np.ndarray, ref: np.ndarray) -> Dict[str, float]:
+    m = forecast_metrics(y, pred, ref)
+    return {"n_scored": int(m.pop("n")), **m}
+
+
+def _run_chunk(
+    matrix_dir: str,
+    day_rows: np.ndarray,
+    folds: List[Fold],
+    model_factory: Callable[[], BaseModel],
+    warm_start: bool,
+    group_labels: np.ndarray,
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, np.ndarray, np.ndarray]]]:
+    """
+    Fit / predict a contiguous run of folds against the memory-mapped matrix.
+
+    Train and test sets are contiguous row slices of the date-sorted arrays,
+    so nothing is copied until rows with missing values are dropped.
+    """
+    X = np.load(Path(matrix_dir) / "X.npy", mmap_mode="r")
+    y = np.load(Path(matrix_dir) / "y.npy", mmap_mode="r")
+    codes = np.load(Path(matrix_dir) / "groups.npy", mmap_mode="r")
+    ref = np.load(Path(matrix_dir) / "ref.npy", mmap_mode="r")
+
+    rows: List[Dict[str, Any]] = []
+    preds: List[Tuple[int, np.ndarray, np.ndarray]] = []
+    previous: Optional[BaseModel] = None
+
+    for f in folds:
+        tr = slice(day_rows[f.train_start], day_rows[f.train_end])
+        te = slice(day_rows[f.test_start], day_rows[f.test_end])
+
+        X_tr, y_tr = X[tr], y[tr]
+        keep = np.isfinite(y_tr) & np.isfinite(X_tr).all(axis=1)
+        X_te = X[te]
+        usable = np.isfinite(X_te).all(axis=1)
+
+        t0 = time.perf_counter()
+        model = model_factory()
+        warmed = bool(warm_start and previous is not None and model.supports_warm_start)
+        if warmed:
+            model.warm_start(previous)
+        if model.uses_groups:
+            model.fit(X_tr[keep], y_tr[keep], groups=group_labels[codes[tr][keep]])
+        else:
+            model.fit(X_tr[keep], y_tr[keep])
+        fit_s = time.perf_counter() - t0
+
+        pred = np.full(te.stop - te.start, np.nan)
+        if usable.any():
+            kw = {"groups": group_labels[codes[te][usable]]} if model.uses_groups else {}
+            pred[usable] = np.asarray(model.predict(X_te[usable], **kw), dtype=np.float64).ravel()
+
+        rows.append({
+            **asdict(f),
+            "n_train": int(keep.sum()),
+            "n_test": int(te.stop - te.start),
+            "warm_started": warmed,
+            "fit_seconds": round(fit_s, 4),
+            **_scored(np.asarray(y[te]), pred, np.asarray(ref[te])),
+        })
+        preds.append((f.fold, np.arange(te.start, te.stop), pred))
+        previous = model
+
+    return rows, preds
+
+
+# --------------------------------------------------
+# Engine
+# --------------------------------------------------
+@dataclass
+class BacktestResult:
+    metrics: pd.DataFrame        # one row per fold + a pooled row (scope="pooled")
+    predictions: pd.DataFrame    # ticker, date, fold, y_true, y_pred
+    seconds: float
+
+
+def walk_forward(
+    df: pd.DataFrame,
+    model_factory: Callable[[], BaseModel],
+    *,
+    label_col: str = "rv_1d",
+    feature_cols: Optional[Sequence[str]] = None,
+    ref_col: Optional[str] = "rv",
+    horizon: int = 1,
+    window: str = "expanding",
+    train_days: int = 250,
+    test_days: int = 20,
+    warm_start: bool = True,
+    n_jobs: Optional[int] = None,
+) -> BacktestResult:
+    """
+    Walk-forward evaluation of any BaseModel over a (ticker, date) table.
+
+    The table is sorted by date once and its features / labels / ticker codes
+    written to .npy files that every worker memory-maps read-only; models with
+    `uses_groups` receive each row's ticker as `groups`. Models that support
+    warm starts (with warm_start=True) run as one sequential chain, each fold
+    seeded from the previous fold's model, so every fold after the first is
+    warm-started; parallelize those across candidates / tickers instead
+    (e.g. evaluation.search). Otherwise folds are independent fits, split
+    into n_jobs contiguous runs processed in parallel. The pooled row's
+    warm_started_share is the fraction of folds that were warm-started.
+    `model_factory` must be picklable (a class or functools.partial).
+    Metrics come from common.metrics; `ref_col` (the value known at forecast
+    time) defines the direction for the hit rate.
+    """
+    t0 = time.perf_counter()
+    ticker_col, date_col = KEY_COLS
+
+    if feature_cols is None:
+        feature_cols = [
+            c for c in df.columns
+            if c not in KEY_COLS and c != label_col and pd.api.types.is_numeric_dtype(df[c])
+        ]
+    feature_cols = list(feature_cols)
+    if not feature_cols:
+        raise ValueError("No feature columns to backtest on")
+
+    data = df.sort_values([date_col, ticker_col], kind="stable").reset_index(drop=True)
+    days = pd.to_datetime(data[date_col]).to_numpy()
+    uniq_days, day_start = np.unique(days, return_index=True)
+    day_rows = np.append(day_start, len(data))     # day i -> rows [day_rows[i], day_rows[i + 1])
+
+    folds = make_folds(len(uniq_days), window=window, train_days=train_days, test_days=test_days, horizon=horizon)
+    if not folds:
+        raise ValueError(f"Not enough dates ({len(uniq_days)}) for train_days={train_days} + horizon={horizon}")
+
+    # A warm-start chain must run fold after fold; splitting it would cold-start every run
+    chained = warm_start and model_factory().supports_warm_start
+    n_jobs = 1 if chained else max(1, min(n_jobs or os.cpu_count() or 1, len(folds)))
+    chunks = _chunks(folds, n_jobs)
+
+    with tempfile.TemporaryDirectory(prefix="backtest_") as matrix_dir:
+        np.save(Path(matrix_dir) / "X.npy", data[feature_cols].to_numpy(dtype=np.float64))
+        np.save(Path(matrix_dir) / "y.npy", data[label_col].to_numpy(dtype=np.float64))
+        codes, group_labels = pd.factorize(data[ticker_col].astype(str))
+        np.save(Path(matrix_dir) / "groups.npy", codes)
+        ref = data[ref_col].to_numpy(dtype=np.float64) if ref_col and ref_col in data else np.full(len(data), np.nan)
+        np.save(Path(matrix_dir) / "ref.npy", ref)
+
+        args = [(matrix_dir, day_rows, chunk, model_factory, warm_start, np.asarray(group_labels)) for chunk in chunks]
+        if n_jobs == 1:
+            results = [_run_chunk(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                results = list(pool.map(_run_chunk, *zip(*args)))
+
+    fold_rows = [r for rows, _ in results for r in rows]
+    pred_parts = [p for _, parts in results for p in parts]
+
+    idx = np.concatenate([i for _, i, _ in pred_parts])
+    predictions = pd.DataFrame({
+        ticker_col: data[ticker_col].to_numpy()[idx],
+        date_col: data[date_col].to_numpy()[idx],
+        "fold": np.concatenate([np.full(len(i), k) for k, i, _ in pred_parts]),
+        "y_true": data[label_col].to_numpy(dtype=np.float64)[idx],
+        "y_pred": np.concatenate([p for _, _, p in pred_parts]),
+    })
+
+    metrics = pd.DataFrame(fold_rows)
+    for col in ("train_start", "train_end", "test_start", "test_end"):
+        # Day indices -> dates (end bounds are exclusive, report the last included day)
+        offset = 1 if col.endswith("_end") else 0
+        metrics[col] = uniq_days[metrics[col].to_numpy() - offset]
+    metrics.insert(0, "scope", "fold")
+
+    pooled = {
+        "scope": "pooled",
+        "fold": -1,
+        "train_start": metrics["train_start"].min(),
+        "train_end": metrics["train_end"].max(),
+        "test_start": metrics["test_start"].min(),
+        "test_end": metrics["test_end"].max(),
+        "n_train": int(metrics["n_train"].sum()),
+        "n_test": int(metrics["n_test"].sum()),
+        "warm_started": bool(metrics["warm_started"].any()),
+        "warm_started_share": float(metrics["warm_started"].mean()),
+        "fit_seconds": round(float(metrics["fit_seconds"].sum()), 4),
+        **_scored(predictions["y_true"].to_numpy(), predictions["y_pred"].to_numpy(), ref[idx]),
+    }
+    metrics = pd.concat([metrics, pd.DataFrame([pooled])], ignore_index=True)
+
+    return BacktestResult(metrics=metrics, predictions=predictions, seconds=time.perf_counter() - t0)
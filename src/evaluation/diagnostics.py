@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from common.daily_aggregates import histogram_quantile
+from common.io import write_csv
+from common.paths import INTERIM_DATA_DIR, PROJECT_ROOT
+
+DRIFT_DIR = INTERIM_DATA_DIR / "drift"
+FORMAT_VERSION = 1
+
+_EMPTY = np.iinfo(np.int64).min     # ring slot holds no day
+_STATE = ("ring", "ring_day", "ref", "latest", "vol_ref")
+
+
+def _day_numbers(values: Any) -> np.ndarray:
+    """Calendar day (int64 days since epoch) per value; NaT -> int64 min."""
+    ts = pd.DatetimeIndex(pd.to_datetime(pd.Series(values), errors="coerce"))
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _bin(values: np.ndarray, lo: float, hi: float, bins: int) -> np.ndarray:
+    """Fixed-width bin per value; out-of-range values land in the edge bins."""
+    return np.clip(((values - lo) / (hi - lo) * bins).astype(np.int64), 0, bins - 1)
+
+
+# ---------------------------------------------------------
+# Drift statistics (vectorized over leading axes)
+# ---------------------------------------------------------
+def _proportions(hist: np.ndarray, smoothing: float) -> np.ndarray:
+    hist = np.asarray(hist, dtype=np.float64) + smoothing
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return hist / hist.sum(axis=-1, keepdims=True)
+
+
+def psi(reference: np.ndarray, recent: np.ndarray, *, smoothing: float = 0.5) -> np.ndarray:
+    """
+    Population stability index between histograms (last axis = bins):
+    sum (p_recent - p_ref) * ln(p_recent / p_ref).
+
+    `smoothing` is added to every bin so empty bins stay finite. Rule of
+    thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant. Pure
+    sampling noise adds about (bins - 1) * (1/n_ref + 1/n_recent), so keep
+    n well above the bin count before reading the thresholds.
+    """
+    p = _proportions(reference, smoothing)
+    q = _proportions(recent, smoothing)
+    return ((q - p) * np.log(q / p)).sum(axis=-1)
+
+
+def psi_noise(n_reference: np.ndarray, n_recent: np.ndarray, bins: int, *, quantile: float = 0.99) -> np.ndarray:
+    """
+    PSI that pure sampling noise stays below with probability `quantile`
+    when both histograms come from one distribution: PSI is then about
+    (1/n_ref + 1/n_recent) * chi2(bins - 1), whose quantile is taken with
+    the Wilson-Hilferty approximation. NaN where either side is empty.
+    """
+    k = max(int(bins) - 1, 1)
+    z = NormalDist().inv_cdf(quantile)
+    chi2 = k * (1.0 - 2.0 / (9 * k) + z * np.sqrt(2.0 / (9 * k))) ** 3
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = 1.0 / np.asarray(n_reference, dtype=np.float64) + 1.0 / np.asarray(n_recent, dtype=np.float64)
+    return np.where(np.isfinite(scale), scale * chi2, np.nan)
+
+
+def ks_distance(reference: np.ndarray, recent: np.ndarray) -> np.ndarray:
+    """
+    Kolmogorov-Smirnov distance between histograms: the largest gap of the
+    two CDFs at the bin edges (a lower bound of the exact, unbinned distance).
+    """
+    p = _proportions(reference, 0.0)
+    q = _proportions(recent, 0.0)
+    return np.abs(np.cumsum(p, axis=-1) - np.cumsum(q, axis=-1)).max(axis=-1)
+
+
+# ---------------------------------------------------------
+# Streaming monitor
+# ---------------------------------------------------------
+class DriftMonitor:
+    """
+    Per-key (ticker) distribution sketches for drift checks, in fixed memory.
+
+    Every series (e.g. compound scores, feature columns) has, per key, a ring
+    of `recent_days` daily fixed-bin histograms (the recent window) and one
+    reference histogram. When a day leaves the recent window its histogram is
+    folded into the reference, so the reference is all history before the
+    recent window (exponentially down-weighted with `reference_halflife`
+    days, if set). The daily row counts of `volume_series` give a second,
+    post-volume distribution (`volume_bins` log1p bins up to `volume_max`
+    rows a day, over days with at least one row). A day's count is complete
+    when its rows arrive before it leaves the recent window or in one batch.
+
+    Memory per key: series x (recent_days + 1) x bins counts, independent of
+    how many rows have streamed through. Histograms of different keys add
+    up, so pooled drift over all keys needs no extra state.
+    """
+
+    def __init__(
+        self,
+        *,
+        series: Dict[str, Sequence[float]],
+        volume_series: Optional[str] = None,
+        key_col: str = "ticker",
+        recent_days: int = 30,
+        bins: int = 20,
+        volume_max: float = 1000.0,
+        volume_bins: int = 5,
+        reference_halflife: Optional[float] = None,
+    ) -> None:
+        self.series = {name: (float(r[0]), float(r[1])) for name, r in series.items()}
+        if volume_series is not None and volume_series not in self.series:
+            raise KeyError(f"volume_series {volume_series!r} is not a monitored series")
+        self.volume_series = volume_series
+        self.key_col = key_col
+        self.recent_days = int(recent_days)
+        self.bins = int(bins)
+        self.volume_max = float(volume_max)
+        self.volume_bins = int(volume_bins)
+        self.reference_halflife = None if reference_halflife is None else float(reference_halflife)
+
+        self.keys: List[str] = []
+        self._key_codes: Dict[str, int] = {}
+        s, d, b = len(self.series), self.recent_days, self.bins
+        self.ring = np.zeros((s, 0, d, b), dtype=np.int32)
+        self.ring_day = np.full((s, 0, d), _EMPTY, dtype=np.int64)
+        self.ref = np.zeros((s, 0, b))
+        self.latest = np.full((s, 0), _EMPTY, dtype=np.int64)
+        self.vol_ref = np.zeros((0, self.volume_bins))
+
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "series": {k: list(v) for k, v in self.series.items()},
+            "volume_series": self.volume_series,
+            "key_col": self.key_col,
+            "recent_days": self.recent_days,
+            "bins": self.bins,
+            "volume_max": self.volume_max,
+            "volume_bins": self.volume_bins,
+            "reference_halflife": self.reference_halflife,
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _STATE)
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def _codes(self, keys: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(keys)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, k in enumerate(uniques):
+            k = str(k)
+            code = self._key_codes.get(k)
+            if code is None:
+                code = self._key_codes[k] = len(self.keys)
+                self.keys.append(k)
+            mapping[i] = code
+        grow = len(self.keys) - self.ring.shape[1]
+        if grow > 0:
+            s, d, b = len(self.series), self.recent_days, self.bins
+            self.ring = np.concatenate([self.ring, np.zeros((s, grow, d, b), dtype=np.int32)], axis=1)
+            self.ring_day = np.concatenate([self.ring_day, np.full((s, grow, d), _EMPTY, dtype=np.int64)], axis=1)
+            self.ref = np.concatenate([self.ref, np.zeros((s, grow, b))], axis=1)
+            self.latest = np.concatenate([self.latest, np.full((s, grow), _EMPTY, dtype=np.int64)], axis=1)
+            self.vol_ref = np.concatenate([self.vol_ref, np.zeros((grow, self.volume_bins))])
+        return mapping[codes]
+
+    def _volume_bin(self, counts: np.ndarray) -> np.ndarray:
+        return _bin(np.log1p(counts), 0.0, np.log1p(self.volume_max), self.volume_bins)
+
+    def _expire(self, i: int, late_keys: Optional[np.ndarray] = None, late_days: Optional[np.ndarray] = None) -> int:
+        """
+        Fold ring days that fell out of each key's recent window into the
+        reference. Late rows (days already outside the window) are passed in
+        so a day split between the ring and the late rows counts once in the
+        volume reference.
+        """
+        ring_day = self.ring_day[i]
+        stale = (ring_day != _EMPTY) & (ring_day <= self.latest[i][:, None] - self.recent_days)
+        k, d = np.nonzero(stale)
+        folded = self.ring[i, k, d].astype(np.float64)
+
+        if len(k):
+            if self.reference_halflife:
+                n_days = np.bincount(k, minlength=len(self.keys))
+                decay = 0.5 ** (n_days / self.reference_halflife)
+                self.ref[i] *= decay[:, None]
+                if i == self._volume_index:
+                    self.vol_ref *= decay[:, None]
+            np.add.at(self.ref[i], k, folded)
+
+        if i == self._volume_index:
+            cell_keys = np.concatenate([k, late_keys if late_keys is not None else []]).astype(np.int64)
+            cell_days = np.concatenate([ring_day[k, d], late_days if late_days is not None else []]).astype(np.int64)
+            weights = np.concatenate([folded.sum(axis=1), np.ones(len(cell_keys) - len(k))])
+            if len(cell_keys):
+                cells, inv = np.unique(np.stack([cell_keys, cell_days]), axis=1, return_inverse=True)
+                counts = np.bincount(inv.ravel(), weights=weights, minlength=cells.shape[1])
+                np.add.at(self.vol_ref, (cells[0], self._volume_bin(counts)), 1.0)
+
+        self.ring[i, k, d] = 0
+        ring_day[k, d] = _EMPTY
+        return len(k)
+
+    @property
+    def _volume_index(self) -> int:
+        return list(self.series).index(self.volume_series) if self.volume_series else -1
+
+    def update(
+        self,
+        rows: pd.DataFrame,
+        *,
+        day_col: str = "date",
+        key_col: Optional[str] = None,
+        columns: Optional[Iterable[str]] = None,
+        new_days_only: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Add rows for the monitored series among `columns` (default: all
+        series present in `rows`). Values of days older than a key's recent
+        window go straight into its reference.
+
+        new_days_only=True keeps only days after the latest one already seen
+        for the key, for tables that are re-emitted whole on every run (e.g.
+        the feature tables), so each (key, day) is counted once.
+        """
+        key_col = key_col or self.key_col
+        names = [c for c in (columns if columns is not None else self.series) if c in self.series and c in rows]
+        report = {"rows": len(rows), "values_added": 0, "days_expired": 0}
+        if not names or rows.empty:
+            return report
+
+        days = _day_numbers(rows[day_col])
+        keys = rows[key_col]
+        ok = keys.notna().to_numpy() & (keys.astype(str) != "").to_numpy() & (days != _EMPTY)
+        codes = np.full(len(rows), -1, dtype=np.int64)
+        if ok.any():
+            codes[ok] = self._codes(keys[ok])
+
+        d, b = self.recent_days, self.bins
+        for name in names:
+            i = list(self.series).index(name)
+            lo, hi = self.series[name]
+            values = pd.to_numeric(rows[name], errors="coerce").to_numpy(dtype=np.float64)
+            use = ok & np.isfinite(values)
+            if new_days_only:
+                use &= days > self.latest[i][np.maximum(codes, 0)]
+            if not use.any():
+                continue
+
+            k, day = codes[use], days[use]
+            bin_ = _bin(values[use], lo, hi, b)
+            np.maximum.at(self.latest[i], k, day)
+
+            # Late rows (before the recent window, e.g. the backfill on a first
+            # run) only count towards the reference
+            late = day <= self.latest[i][k] - d
+            report["days_expired"] += self._expire(i, k[late], day[late])
+            if late.any():
+                np.add.at(self.ref[i], (k[late], bin_[late]), 1.0)
+
+            k, day, bin_ = k[~late], day[~late], bin_[~late]
+            slot = day % d
+            self.ring_day[i, k, slot] = day
+            flat, counts = np.unique((k * d + slot) * b + bin_, return_counts=True)
+            self.ring[i].reshape(-1)[flat] += counts.astype(np.int32)
+            report["values_added"] += int(use.sum())
+        return report
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def _recent_volume(self) -> np.ndarray:
+        """(keys, bins) histogram of log1p daily counts over the recent window's active days."""
+        i = self._volume_index
+        counts = self.ring[i].sum(axis=-1).astype(np.float64)           # keys x recent_days
+        active = self.ring_day[i] != _EMPTY
+        k = np.nonzero(active)[0]
+        hist = np.zeros((len(self.keys), self.volume_bins))
+        np.add.at(hist, (k, self._volume_bin(counts[active])), 1.0)
+        return hist
+
+    def report(
+        self,
+        *,
+        min_count: int = 200,
+        min_days: int = 10,
+        psi_threshold: float = 0.25,
+        noise_quantile: float = 0.99,
+    ) -> pd.DataFrame:
+        """
+        Drift per (key, series) plus pooled rows (key="__all__"):
+        n_reference, n_recent, psi, ks, reference / recent medians, the
+        psi_cutoff applied and a `drift` flag (psi >= psi_cutoff with at
+        least `min_count` values on both sides). The volume series adds a
+        "<series>_volume" row on daily row counts (n = active days, at least
+        `min_days`; medians in rows per day).
+
+        psi_cutoff is psi_threshold, raised to the PSI that sampling noise
+        alone exceeds with probability 1 - noise_quantile (psi_noise) when a
+        side has too few values for the fixed threshold to mean anything,
+        e.g. ~30 recent days of volume.
+        """
+        for i in range(len(self.series)):
+            self._expire(i)
+
+        labels = np.asarray(self.keys + ["__all__"], dtype=object)
+        frames = []
+        entries = [(name, self.ref[i], self.ring[i].sum(axis=1).astype(np.float64), self.series[name], False)
+                   for i, name in enumerate(self.series)]
+        if self.volume_series:
+            entries.append((f"{self.volume_series}_volume", self.vol_ref, self._recent_volume(), (0.0, np.log1p(self.volume_max)), True))
+
+        for name, ref, recent, (lo, hi), log_scale in entries:
+            n_bins = ref.shape[-1]
+            ref = np.concatenate([ref, ref.sum(axis=0, keepdims=True)])
+            recent = np.concatenate([recent, recent.sum(axis=0, keepdims=True)])
+            n_ref, n_recent = ref.sum(axis=1), recent.sum(axis=1)
+            ref_q50 = histogram_quantile(ref, 0.5, lo, hi)
+            recent_q50 = histogram_quantile(recent, 0.5, lo, hi)
+            if log_scale:
+                ref_q50, recent_q50 = np.expm1(ref_q50), np.expm1(recent_q50)
+
+            t = pd.DataFrame({
+                self.key_col: labels,
+                "series": name,
+                "n_reference": n_ref.round().astype(np.int64),
+                "n_recent": n_recent.round().astype(np.int64),
+                "psi": psi(ref, recent),
+                "ks": ks_distance(ref, recent),
+                "reference_q50": ref_q50,
+                "recent_q50": recent_q50,
+            })
+            t["psi_cutoff"] = np.fmax(psi_threshold, psi_noise(n_ref, n_recent, n_bins, quantile=noise_quantile))
+            need = min_days if log_scale else min_count
+            thin = (n_ref < need) | (n_recent < need)
+            t.loc[thin, ["psi", "ks"]] = np.nan
+            t["drift"] = ~thin & (t["psi"] >= t["psi_cutoff"])
+            frames.append(t)
+
+        return pd.concat(frames, ignore_index=True)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: Path) -> Path:
+        """Write arrays + meta.json into `path` (meta last, so a partial write is not picked up)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _STATE:
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, path / f"{name}.npy")
+
+        meta = {"version": FORMAT_VERSION, **self.spec(), "keys": self.keys}
+        tmp = path / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path / "meta.json")
+        return path
+
+    @classmethod
+    def load(cls, path: Path, **spec: Any) -> "DriftMonitor":
+        """
+        Saved monitor; a fresh one (from `spec`) when none exists, the format
+        changed or its spec differs from the one requested. Without `spec`
+        the saved spec is used.
+        """
+        path = Path(path)
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return cls(**spec)
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            return cls(**spec)
+
+        saved = {k: v for k, v in meta.items() if k not in ("version", "keys")}
+        monitor = cls(**(spec or saved))
+        if monitor.spec() != saved:
+            return monitor
+
+        monitor.keys = list(meta["keys"])
+        monitor._key_codes = {k: i for i, k in enumerate(monitor.keys)}
+        for name in _STATE:
+            setattr(monitor, name, np.load(path / f"{name}.npy"))
+        if monitor.ring.shape[1] != len(monitor.keys):
+            return cls(**(spec or saved))
+        return monitor
+
+
+# ---------------------------------------------------------
+# Pipeline hook
+# ---------------------------------------------------------
+def update_drift(
+    cfg: Dict[str, Any],
+    *,
+    name: str,
+    scored: pd.DataFrame,
+    features: Optional[pd.DataFrame] = None,
+    score_field: str = "compound",
+) -> Dict[str, Any]:
+    """
+    Stream newly scored rows (and the feature table's new days) into the
+    monitor described by a vader.yaml / finbert.yaml `drift` section, then
+    write its report.
+
+    Monitored: `score_field` per row (and its daily post volume), plus every
+    feature column listed under `features` ({column: [lo, hi]}).
+    """
+    feature_ranges = dict(cfg.get("features") or {})
+    series = {score_field: cfg.get("score_range", [-1.0, 1.0]), **feature_ranges}
+    state = PROJECT_ROOT / cfg["state"] if cfg.get("state") else DRIFT_DIR / name
+
+    monitor = DriftMonitor.load(
+        state,
+        series=series,
+        volume_series=score_field,
+        recent_days=int(cfg.get("recent_days", 30)),
+        bins=int(cfg.get("bins", 20)),
+        volume_max=float(cfg.get("volume_max", 1000)),
+        volume_bins=int(cfg.get("volume_bins", 5)),
+        reference_halflife=cfg.get("reference_halflife_days"),
+    )
+    monitor.update(scored, day_col="day", columns=[score_field])
+    if features is not None and feature_ranges:
+        monitor.update(features, day_col="date", columns=list(feature_ranges), new_days_only=True)
+    monitor.save(state)
+
+    report = monitor.report(
+        min_count=int(cfg.get("min_count", 200)),
+        min_days=int(cfg.get("min_days", 10)),
+        psi_threshold=float(cfg.get("psi_threshold", 0.25)),
+        noise_quantile=float(cfg.get("noise_quantile", 0.99)),
+    )
+    out_path = PROJECT_ROOT / cfg.get("report", f"artifacts/reports/drift/{name}_drift.csv")
+    write_csv(report, out_path)
+
+    flagged = report[report["drift"]]
+    return {
+        "drift_report": str(out_path),
+        "drift_flags": len(flagged),
+        "drift_pooled": sorted(flagged.loc[flagged[monitor.key_col] == "__all__", "series"]),
+        "drift_state_bytes": monitor.nbytes,
+    }
@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from common.config import load_config
+from common.daily_aggregates import DailyAggregates
+from common.io import read_parquet, write_csv, write_parquet
+from common.labeling import from_panel, har_terms, to_panel
+from common.paths import INTERIM_DATA_DIR, PROJECT_ROOT, REPORTS_DIR
+from evaluation.backtest import walk_forward
+from models.artifacts import resolve_type
+from pipelines.merge_features import merge_frames
+from pipelines.sentiment_features import features_from_daily
+
+CACHE_DIR = INTERIM_DATA_DIR / "search_cache"
+OUTPUT_DIR = REPORTS_DIR / "search"
+LABELS_PATH = "data/processed/labels/labels.parquet"
+MATRIX_VERSION = 3      # bump when build_feature_matrix's output changes
+
+# Metrics where larger is better; everything else is ranked ascending
+HIGHER_IS_BETTER = ("mz_r2", "hit_rate")
+
+
+# --------------------------------------------------
+# Grids
+# --------------------------------------------------
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of {name: [values]}; scalars count as one value."""
+    names = sorted(grid)
+    values = [v if isinstance(v, list) else [v] for v in (grid[n] for n in names)]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def config_key(obj: Any) -> str:
+    return hashlib.sha1(_canonical(obj).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    One feature-matrix configuration.
+
+    har_windows: trailing means of the one-day rv_d added as rv_<w>d (the
+    HAR terms).
+    sentiment: sources (vader / finbert) read from their daily aggregate
+    tables; for each, `sentiment_columns` x `sentiment_windows` become
+    <source>_<column>_<w>d (e.g. vader_compound_mean_5d).
+    """
+    har_windows: tuple = (5, 22)
+    sentiment: tuple = ()
+    sentiment_windows: tuple = (5,)
+    sentiment_columns: tuple = ("compound_mean", "n")
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "FeatureSpec":
+        return cls(
+            har_windows=tuple(sorted({int(w) for w in d.get("har_windows", (5, 22))})),
+            sentiment=tuple(sorted(d.get("sentiment") or ())),
+            sentiment_windows=tuple(sorted({int(w) for w in d.get("sentiment_windows", (5,))})),
+            sentiment_columns=tuple(d.get("sentiment_columns", ("compound_mean", "n"))),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {"har_windows": list(self.har_windows), "sentiment": list(self.sentiment)}
+        if self.sentiment:
+            # Window / column choices only matter when a source is used, so
+            # they do not split otherwise identical matrices
+            d["sentiment_windows"] = list(self.sentiment_windows)
+            d["sentiment_columns"] = list(self.sentiment_columns)
+        return d
+
+    @property
+    def har_columns(self) -> List[str]:
+        return ["rv_d"] + [f"rv_{w}d" for w in self.har_windows]
+
+    @property
+    def sentiment_feature_columns(self) -> List[str]:
+        return [f"{s}_{c}_{w}d" for s in self.sentiment for c in self.sentiment_columns for w in self.sentiment_windows]
+
+    @property
+    def columns(self) -> List[str]:
+        return self.har_columns + self.sentiment_feature_columns
+
+
+def feature_specs(grid: Dict[str, Any]) -> List[FeatureSpec]:
+    """Distinct FeatureSpecs of a feature grid (duplicates collapse)."""
+    specs: Dict[str, FeatureSpec] = {}
+    for combo in expand_grid(grid):
+        spec = FeatureSpec.from_dict(combo)
+        specs.setdefault(_canonical(spec.to_dict()), spec)
+    return list(specs.values())
+
+
+# --------------------------------------------------
+# Feature matrices (built once per spec, cached on disk)
+# --------------------------------------------------
+def _fingerprint(path: Path) -> Dict[str, Any]:
+    """Size + mtime of a file, or of every file under a directory."""
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    return {
+        str(p.relative_to(PROJECT_ROOT) if p.is_relative_to(PROJECT_ROOT) else p): [p.stat().st_size, p.stat().st_mtime_ns]
+        for p in files if p.exists()
+    }
+
+
+def _sentiment_table(source: str) -> Path:
+    agg = load_config(f"{source}.yaml")[source].get("aggregation", {})
+    return PROJECT_ROOT / agg.get("daily_table", f"data/interim/aggregates/{source}_features")
+
+
+def build_feature_matrix(spec: FeatureSpec, *, labels_path: Path, label_col: str) -> pd.DataFrame:
+    """
+    (ticker, date, label, rv, rv_d, rv_<w>d..., <source>_<col>_<w>d...) for
+    one spec; rv (the window vol known at forecast time) is kept as the
+    hit-rate reference, not as a feature.
+
+    HAR terms are the label table's rv_<w>d columns (labeling.har_terms on
+    its rv_d panel for other windows); sentiment features come from the
+    materialized daily aggregate tables (no scored history is re-read) and
+    are left-joined, days without posts filled with 0.
+    """
+    labels = read_parquet(labels_path).assign(_row=1.0)
+    # Windows the label table already holds are reused as is; others are
+    # built with the same rule (labeling.har_terms). Every label row is kept,
+    # so a spec is scored on the rows and warm-up NaNs the production model sees
+    have = [f"rv_{w}d" for w in spec.har_windows if f"rv_{w}d" in labels.columns]
+    tickers, dates, panels = to_panel(labels, ["_row", "rv", "rv_d", label_col, *have])
+    panels.update(har_terms(panels["rv_d"], [w for w in spec.har_windows if f"rv_{w}d" not in panels]))
+    base = from_panel(tickers, dates, panels, mask=~np.isnan(panels.pop("_row")))
+
+    frames = {"labels": base}
+    prefixes: Dict[str, str] = {}
+    for source in spec.sentiment:
+        table = DailyAggregates.load(_sentiment_table(source))
+        feats = features_from_daily(table.frame(), fields=table.fields, score_field=table.score_field, windows=spec.sentiment_windows)
+        wanted = [f"{c}_{w}d" for c in spec.sentiment_columns for w in spec.sentiment_windows]
+        missing = [c for c in wanted if c not in feats.columns and len(feats)]
+        if missing:
+            raise KeyError(f"{source} features have no columns {missing}")
+        frames[source] = feats.reindex(columns=["ticker", "date", *wanted])
+        prefixes[source] = f"{source}_"
+
+    df = merge_frames(frames, how="left", prefixes=prefixes)
+    sent = spec.sentiment_feature_columns
+    if sent:
+        df[sent] = df[sent].astype(np.float64).fillna(0.0)
+    return df[["ticker", "date", label_col, "rv", *spec.columns]]
+
+
+class FeatureCache:
+    """
+    Feature matrices on disk, keyed by feature spec + label + input fingerprints.
+
+    Each entry is <cache_dir>/<key>/features.parquet with a spec.json next to
+    it; a changed labels file or aggregate table gives a new key, so stale
+    matrices are never reused.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, *, labels_path: Path, label_col: str) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.labels_path = Path(labels_path)
+        self.label_col = label_col
+
+    def key(self, spec: FeatureSpec) -> str:
+        inputs = _fingerprint(self.labels_path)
+        for source in spec.sentiment:
+            inputs.update(_fingerprint(_sentiment_table(source)))
+        return config_key({"features": spec.to_dict(), "label": self.label_col, "inputs": inputs, "version": MATRIX_VERSION})
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key / "features.parquet"
+
+    def get(self, spec: FeatureSpec) -> tuple[str, Path, bool]:
+        """(key, path, built) — builds and writes the matrix only on a miss."""
+        key = self.key(spec)
+        path = self.path(key)
+        if path.exists():
+            return key, path, False
+
+        df = build_feature_matrix(spec, labels_path=self.labels_path, label_col=self.label_col)
+        write_parquet(df, path)
+        with open(path.parent / "spec.json", "w", encoding="utf-8") as f:
+            json.dump({"features": spec.to_dict(), "label": self.label_col, "rows": len(df)}, f, indent=2)
+        return key, path, True
+
+
+# --------------------------------------------------
+# Candidates
+# --------------------------------------------------
+@dataclass
+class Candidate:
+    model_type: str                  # "package.module:Class" of a BaseModel subclass
+    params: Dict[str, Any]
+    features: FeatureSpec
+    feature_key: str = ""
+    feature_path: str = ""
+    backtest: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return config_key({
+            "model_type": self.model_type,
+            "params": self.params,
+            "feature_key": self.feature_key,
+            "backtest": self.backtest,
+        })
+
+
+def _bind_features(cls: type, params: Dict[str, Any], spec: FeatureSpec) -> Dict[str, Any]:
+    """
+    Point models that name their inputs (HARModel's har_features /
+    sentiment_features) at the spec's columns, unless set explicitly.
+    """
+    accepted = inspect.signature(cls.__init__).parameters
+    bound = dict(params)
+    if "har_features" in accepted:
+        bound.setdefault("har_features", spec.har_columns)
+    if "sentiment_features" in accepted:
+        bound.setdefault("sentiment_features", spec.sentiment_feature_columns)
+    return bound
+
+
+# Worker-local: each process reads a feature matrix once, however many
+# candidates it fits on it
+_MATRICES: Dict[str, pd.DataFrame] = {}
+
+
+def _matrix(path: str) -> pd.DataFrame:
+    if path not in _MATRICES:
+        _MATRICES[path] = read_parquet(path)
+    return _MATRICES[path]
+
+
+def _run_candidate(c: Candidate, label_col: str, ref_col: Optional[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    cls = resolve_type(c.model_type)
+    factory = functools.partial(cls, **_bind_features(cls, c.params, c.features))
+    # Models that declare their inputs get exactly those columns, others all of the spec's
+    feature_cols = getattr(factory(), "feature_names", None) or c.features.columns
+
+    result = walk_forward(
+        _matrix(c.feature_path),
+        factory,
+        label_col=label_col,
+        feature_cols=feature_cols,
+        ref_col=ref_col,
+        n_jobs=1,
+        **c.backtest,
+    )
+    pooled = result.metrics[result.metrics["scope"] == "pooled"].iloc[0]
+    metrics = {k: (None if pd.isna(v) else float(v)) for k, v in pooled.items() if k in ("n_scored", "mse", "mae", "qlike", "mz_alpha", "mz_beta", "mz_r2", "hit_rate", "warm_started_share")}
+    return {
+        **metrics,
+        "folds": int((result.metrics["scope"] == "fold").sum()),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+# --------------------------------------------------
+# Results log
+# --------------------------------------------------
+def read_results(path: Path) -> List[Dict[str, Any]]:
+    """Records of a results JSONL (a truncated last line is ignored)."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _append(f, record: Dict[str, Any]) -> None:
+    f.write(json.dumps(record, default=str) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def summarize(records: Iterable[Dict[str, Any]], metric: str = "qlike") -> pd.DataFrame:
+    """Completed candidates ranked by `metric` (best first); params flattened."""
+    rows = []
+    for r in records:
+        if r.get("status") != "ok":
+            continue
+        rows.append({
+            "key": r["key"],
+            "model": r["model_type"].rpartition(":")[2],
+            "feature_key": r["feature_key"],
+            **{f"param.{k}": _canonical(v) if isinstance(v, (list, dict)) else v for k, v in r["params"].items()},
+            "features": _canonical(r["features"]),
+            **r["metrics"],
+        })
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df = df.drop_duplicates("key", keep="last")
+    return df.sort_values(metric, ascending=metric not in HIGHER_IS_BETTER, na_position="last", kind="stable").reset_index(drop=True)
+
+
+# --------------------------------------------------
+# Driver
+# --------------------------------------------------
+def run_search(
+    config_name: str = "search.yaml",
+    *,
+    n_jobs: Optional[int] = None,
+    restart: bool = False,
+    output_dir: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Walk-forward search over models x params x feature specs (search.yaml).
+
+    Every distinct feature spec is built once and cached (see FeatureCache);
+    candidates then run across a process pool, each worker reading a matrix
+    at most once. Every finished candidate is appended to results.jsonl
+    straight away, so an interrupted search resumes where it stopped:
+    candidates whose key already has an "ok" record are skipped (failures are
+    retried). restart=True discards the log. summary.csv ranks the results.
+    """
+    cfg = load_config(config_name)["search"]
+    label_col = cfg.get("label", "rv_1d")
+    ref_col = cfg.get("ref_col", "rv")
+    metric = cfg.get("metric", "qlike")
+    backtest = dict(cfg.get("backtest") or {})
+
+    output_dir = Path(output_dir or PROJECT_ROOT / cfg.get("output_dir", OUTPUT_DIR))
+    cache = FeatureCache(
+        Path(cache_dir or PROJECT_ROOT / cfg.get("cache_dir", CACHE_DIR)),
+        labels_path=PROJECT_ROOT / cfg.get("labels", LABELS_PATH),
+        label_col=label_col,
+    )
+    log_path = output_dir / "results.jsonl"
+    if restart and log_path.exists():
+        log_path.unlink()
+
+    # 1) Feature matrices: one per distinct spec
+    t0 = time.perf_counter()
+    matrices: Dict[FeatureSpec, tuple[str, str]] = {}
+    n_built = 0
+    for spec in feature_specs(cfg.get("features") or {}):
+        key, path, built = cache.get(spec)
+        matrices[spec] = (key, str(path))
+        n_built += built
+    print(f"Search: {len(matrices)} feature matrices ({n_built} built, {len(matrices) - n_built} cached) in {time.perf_counter() - t0:.1f}s")
+
+    # 2) Candidates
+    candidates: List[Candidate] = []
+    for m in cfg.get("models") or []:
+        for params in expand_grid(m.get("params") or {}):
+            for spec, (fkey, fpath) in matrices.items():
+                candidates.append(Candidate(m["type"], params, spec, fkey, fpath, backtest))
+
+    done = {r["key"] for r in read_results(log_path) if r.get("status") == "ok"}
+    todo = [c for c in candidates if c.key not in done]
+    print(f"Search: {len(candidates)} candidates, {len(candidates) - len(todo)} already done, {len(todo)} to run")
+
+    # 3) Fits: in parallel, logged as they finish
+    n_jobs = max(1, min(n_jobs or cfg.get("n_jobs") or os.cpu_count() or 1, max(len(todo), 1)))
+    n_failed = 0
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a+", encoding="utf-8") as log:
+        if log.tell():
+            # A run killed mid-write leaves a partial last line; start a new one
+            log.seek(log.tell() - 1)
+            if log.read(1) != "\n":
+                log.write("\n")
+
+        def record(c: Candidate, outcome: Dict[str, Any] | None, error: str | None) -> None:
+            nonlocal n_failed
+            rec = {
+                "key": c.key,
+                "status": "ok" if error is None else "error",
+                "model_type": c.model_type,
+                "params": c.params,
+                "features": c.features.to_dict(),
+                "feature_key": c.feature_key,
+                "backtest": c.backtest,
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            if error is None:
+                rec["seconds"] = outcome.pop("seconds")
+                rec["folds"] = outcome.pop("folds")
+                rec["metrics"] = outcome
+                print(f"  {c.model_type.rpartition(':')[2]} {c.params} {c.features.to_dict()}: {metric}={outcome.get(metric)}")
+            else:
+                rec["error"] = error
+                n_failed += 1
+                print(f"  FAILED {c.model_type} {c.params}: {error}")
+            _append(log, rec)
+
+        if n_jobs == 1:
+            for c in todo:
+                try:
+                    record(c, _run_candidate(c, label_col, ref_col), None)
+                except Exception as e:
+                    record(c, None, f"{type(e).__name__}: {e}")
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                futures = {pool.submit(_run_candidate, c, label_col, ref_col): c for c in todo}
+                for fut in as_completed(futures):
+                    c = futures[fut]
+                    try:
+                        record(c, fut.result(), None)
+                    except Exception as e:
+                        record(c, None, f"{type(e).__name__}: {e}")
+
+    # 4) Ranking over everything logged for this config
+    keys = {c.key for c in candidates}
+    summary = summarize((r for r in read_results(log_path) if r.get("key") in keys), metric)
+    summary_path = output_dir / "summary.csv"
+    write_csv(summary, summary_path)
+    if len(summary):
+        print(f"Best by {metric}:")
+        print(summary.head(5).to_string(index=False))
+
+    return {
+        "candidates": len(candidates),
+        "skipped": len(candidates) - len(todo),
+        "ran": len(todo),
+        "failed": n_failed,
+        "feature_matrices": len(matrices),
+        "built": n_built,
+        "results": str(log_path),
+        "summary": str(summary_path),
+        "seconds": time.perf_counter() - t0,
+    }
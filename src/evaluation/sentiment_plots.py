@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 import shutil
 
+from common import instrument, profiling
+from common.daily_aggregates import DailyAggregates
+
+_ALL_KEY = "_all"
+
 
 def _clean_directory(path: Path, verbose: bool = True) -> None:
     """
@@ -28,6 +38,12 @@ def _clean_directory(path: Path, verbose: bool = True) -> None:
         print(f"[sentiment-plots] Cleaned existing contents in: {path}")
 
 
+def _group_dir(out_dir: Path, group: Any) -> Path:
+    """Output folder of one group: its label, made safe as a single path component."""
+    name = str(group).replace("/", "_").replace("\\", "_").strip() or "_"
+    return out_dir / ("_" + name if name.startswith(".") else name)
+
+
 def read_jsonl(path: str | Path) -> pd.DataFrame:
     path = Path(path)
     rows: List[Dict[str, Any]] = []
@@ -46,27 +62,151 @@ def _mkdir(p: str | Path) -> Path:
     return p
 
 
-def daily_stats(df: pd.DataFrame, *, date_col: str, score_col: str, id_col: str = "id") -> pd.DataFrame:
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col, score_col]).sort_values(date_col)
-
-    daily = (
-        df.groupby(df[date_col].dt.date)
-          .agg(
-              n_posts=(id_col, "count"),
-              score_mean=(score_col, "mean"),
-              score_std=(score_col, "std"),
-              score_var=(score_col, "var"),
-              score_median=(score_col, "median"),
-          )
-          .reset_index()
-          .rename(columns={date_col: "day"})
+def _day_numbers(values: Any) -> np.ndarray:
+    """Calendar day (int64 days since epoch) per value, as DailyAggregates buckets it; NaT -> int64 min."""
+    ts = pd.DatetimeIndex(pd.to_datetime(pd.Series(values), errors="coerce"))
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def row_stats(
+    df: pd.DataFrame,
+    *,
+    date_col: str,
+    score_col: str,
+    id_col: Optional[str] = None,
+    key_col: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Exact per-day (or per (key, day) with `key_col`) stats the aggregate
+    table cannot give: score_median and, with `id_col`, n_posts as the count
+    of non-null ids. Taken over the same rows the table counts: a finite
+    score, a valid date and, per key, a non-empty key. Indexed by day
+    (datetime64) / (key, day).
+    """
+    days = _day_numbers(df[date_col])
+    score = pd.to_numeric(df[score_col], errors="coerce").to_numpy(dtype=np.float64)
+    ok = (days != np.iinfo(np.int64).min) & np.isfinite(score)
+    by = [pd.Series(days.astype("datetime64[D]").astype("datetime64[ns]"), index=df.index, name="day")]
+    if key_col:
+        ok &= df[key_col].notna().to_numpy() & (df[key_col] != "").to_numpy()
+        by.insert(0, df[key_col].astype(str))
+
+    cols = {"score_median": pd.Series(score, index=df.index)}
+    if id_col and id_col in df.columns:
+        cols["n_posts"] = df[id_col]
+    grouped = pd.DataFrame(cols)[ok].groupby([c[ok] for c in by], sort=False)
+    out = grouped["score_median"].median().to_frame()
+    if "n_posts" in cols:
+        out["n_posts"] = grouped["n_posts"].count()
+    return out
+
+
+def daily_stats(
+    table: DailyAggregates,
+    keys: Optional[Iterable[str]] = None,
+    *,
+    exact: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Daily volume / mean / std / var / median of the score, read from the
+    aggregate table. The median is the table's histogram estimate (within
+    one bin width) and n_posts its row count, unless per-day `exact` stats
+    (see row_stats) replace them.
+    """
+    daily = table.daily(keys).rename(
+        columns={
+            "n": "n_posts",
+            "mean": "score_mean",
+            "std": "score_std",
+            "var": "score_var",
+            "q50": "score_median",
+        }
     )
-    daily["day"] = pd.to_datetime(daily["day"])
+    if exact is not None:
+        for col in exact.columns:
+            daily[col] = exact[col].reindex(daily["day"]).to_numpy()
     return daily.sort_values("day")
 
 
+def _rolling_mean(values: np.ndarray, starts: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """
+    Trailing `window`-row mean of finite values that never crosses a group
+    start (rows sorted by group, then day): pandas rolling().mean() per group,
+    from one cumulative sum over all groups.
+    """
+    ok = np.isfinite(values)
+    cs = np.concatenate([[0.0], np.cumsum(np.where(ok, values, 0.0))])
+    cn = np.concatenate([[0], np.cumsum(ok)])
+    i = np.arange(len(values))
+    lo = np.maximum(starts, i - window + 1)
+    total, count = cs[i + 1] - cs[lo], cn[i + 1] - cn[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= max(min_periods, 1), total / count, np.nan)
+
+
+def grouped_daily_stats(
+    table: DailyAggregates,
+    rolling_window_days: int,
+    *,
+    exact: Optional[pd.DataFrame] = None,
+) -> tuple[pd.DataFrame, Dict[str, slice]]:
+    """
+    daily_stats() + rolling std for every key of the table in one pass
+    (`exact`: row_stats indexed by (key, day)).
+
+    Returns the stats of all keys stacked (sorted by key, then day) and each
+    key's row slice in it; frame.iloc[slice] is that key's daily table.
+    """
+    by_key = table.daily_by_key()
+    codes = by_key[table.key_col].cat.codes.to_numpy()
+    keys = by_key[table.key_col].cat.categories
+    starts = np.searchsorted(codes, np.arange(len(keys)))
+    stops = np.searchsorted(codes, np.arange(len(keys)), side="right")
+
+    daily = by_key.drop(columns=[table.key_col]).rename(
+        columns={
+            "n": "n_posts",
+            "mean": "score_mean",
+            "std": "score_std",
+            "var": "score_var",
+            "q50": "score_median",
+        }
+    )
+    if exact is not None:
+        cells = pd.MultiIndex.from_arrays([by_key[table.key_col].astype(str), by_key["day"]])
+        for col in exact.columns:
+            daily[col] = exact[col].reindex(cells).to_numpy()
+    daily["score_std_roll"] = _rolling_mean(daily["score_std"].to_numpy(), starts[codes], rolling_window_days, 2)
+    return daily, {str(k): slice(a, b) for k, a, b in zip(keys, starts, stops)}
+
+
+def update_aggregates(
+    df: pd.DataFrame,
+    *,
+    date_col: str,
+    score_col: str,
+    group_col: Optional[str] = None,
+    verbose: bool = True,
+) -> DailyAggregates:
+    """
+    Build the (group, day) aggregate table of the scored rows; without a
+    group column every row goes into one pooled key.
+
+    The table is rebuilt from the current input on every run, so re-scored
+    or removed rows never linger in the report.
+    """
+    key_col = group_col if group_col and group_col in df.columns else _ALL_KEY
+    rows = df if key_col != _ALL_KEY else df.assign(**{_ALL_KEY: "all"})
+
+    table = DailyAggregates(fields=[score_col], key_col=key_col)
+    update = table.ingest(rows, day_col=date_col, id_col=None)
+    if verbose:
+        print(f"[sentiment-plots] Aggregates: {update['rows_ingested']:,} rows in {len(table):,} (group, day) cells")
+    return table
+
+
 def plot_daily_post_volume(daily: pd.DataFrame, out_dir: Path, title_prefix: str) -> None:
     plt.figure()
     plt.plot(daily["day"], daily["n_posts"])
@@ -120,15 +260,18 @@ def plot_boxplot_recent_days(
     score_col: str,
     n_days: int = 14,
 ) -> None:
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col, score_col])
-    df["day"] = df[date_col].dt.normalize()
-
-    day_order = sorted(df["day"].unique())[-n_days:]
-    recent = df[df["day"].isin(day_order)]
-
-    data = [recent.loc[recent["day"] == d, score_col].values for d in day_order]
+    # make_sentiment_report passes rows with dates already parsed into "day"
+    day = df["day"] if "day" in df.columns else pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    ok = (day.notna() & df[score_col].notna()).to_numpy()
+    days = day.to_numpy()[ok]
+    values = df[score_col].to_numpy()[ok]
+
+    # Recent days' values split by day from one sort (not one mask per day)
+    day_order = np.unique(days)[-n_days:]
+    keep = np.isin(days, day_order)
+    order = np.argsort(days[keep], kind="stable")
+    bounds = np.searchsorted(days[keep][order], day_order, side="right")
+    data = np.split(values[keep][order], bounds[:-1])
     labels = [pd.to_datetime(d).strftime("%m-%d") for d in day_order]
 
     plt.figure()
@@ -142,6 +285,109 @@ def plot_boxplot_recent_days(
     plt.close()
 
 
+# -------------------------
+# Rendering
+# -------------------------
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+REPORT_FILES = (
+    "daily_sentiment_stats.csv",
+    "daily_volume.png",
+    "daily_compound_std.png",
+    "daily_mean_band.png",
+    "compound_boxplot_recent.png",
+)
+_COMBINED = "__all__"
+
+
+def _use_agg_backend() -> None:
+    """Worker initializer: render off-screen (no display, no GUI event loop)."""
+    plt.switch_backend("Agg")
+
+
+def render_group_report(
+    daily: pd.DataFrame,
+    rows: pd.DataFrame,
+    out_dir: Path,
+    title_prefix: str,
+    *,
+    date_col: str,
+    score_col: str,
+    rolling_window_days: int,
+    recent_days_for_boxplot: int,
+) -> float:
+    """Write the stats CSV + four PNGs of one report folder; returns seconds spent."""
+    t0 = time.perf_counter()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if "score_std_roll" not in daily.columns:
+        daily = daily.assign(score_std_roll=daily["score_std"].rolling(rolling_window_days, min_periods=2).mean())
+    daily.to_csv(out_dir / "daily_sentiment_stats.csv", index=False)
+
+    plot_daily_post_volume(daily, out_dir, title_prefix)
+    plot_daily_std(daily, out_dir, title_prefix, rolling_window_days)
+    plot_mean_with_std_band(daily, out_dir, title_prefix)
+    plot_boxplot_recent_days(
+        rows, out_dir, title_prefix, date_col=date_col, score_col=score_col, n_days=recent_days_for_boxplot
+    )
+    return time.perf_counter() - t0
+
+
+def _render_job(job: Tuple[str, pd.DataFrame, pd.DataFrame, Path, str, Dict[str, Any]]) -> Tuple[str, int, float]:
+    name, daily, rows, out_dir, title, kwargs = job
+    return name, len(rows), render_group_report(daily, rows, out_dir, title, **kwargs)
+
+
+# -------------------------
+# Manifest (incremental refresh)
+# -------------------------
+def _daily_hashes(daily: pd.DataFrame) -> np.ndarray:
+    """Per-row hashes of daily stats (rounded: summation order moves the last bits)."""
+    rounded = daily.round({c: 9 for c in daily.select_dtypes("number").columns})
+    return pd.util.hash_pandas_object(rounded, index=False).to_numpy()
+
+
+def _row_hashes(rows: pd.DataFrame, date_col: str, score_col: str) -> np.ndarray:
+    return pd.util.hash_pandas_object(rows[[date_col, score_col]].astype(str), index=False).to_numpy()
+
+
+def _content_hash(daily_hashes: np.ndarray, row_hashes: np.ndarray, title: str, kwargs: Dict[str, Any]) -> str:
+    """
+    Hash of everything a report folder is drawn from: its daily stats, its
+    raw (date, score) rows (order-independent) and the render settings.
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps({"title": title, **kwargs, "files": REPORT_FILES}, sort_keys=True).encode("utf-8"))
+    h.update(np.ascontiguousarray(daily_hashes).tobytes())
+    h.update(np.sort(row_hashes).tobytes())
+    return h.hexdigest()
+
+
+def _read_manifest(out_dir: Path) -> Optional[Dict[str, Any]]:
+    path = out_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def _write_manifest(out_dir: Path, groups: Dict[str, Dict[str, Any]]) -> None:
+    tmp = out_dir / f"{MANIFEST_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "groups": groups}, f, indent=2, sort_keys=True)
+    os.replace(tmp, out_dir / MANIFEST_FILE)
+
+
+def _is_current(entry: Optional[Dict[str, Any]], digest: str, folder: Path) -> bool:
+    return bool(entry) and entry.get("hash") == digest and all((folder / f).exists() for f in REPORT_FILES)
+
+
+@instrument.traced("sentiment_report")
+@profiling.profiled
 def make_sentiment_report(
     input_jsonl: str | Path,
     out_dir: str | Path,
@@ -152,15 +398,37 @@ def make_sentiment_report(
     id_col: str = "id",
     rolling_window_days: int = 5,
     recent_days_for_boxplot: int = 14,
-    clean_output: bool = True,   # NEW
+    clean_output: bool = False,  # True: wipe out_dir and re-render everything
+    n_jobs: Optional[int] = 1,
     verbose: bool = True,
-) -> None:
+) -> Dict[str, Any]:
+    """
+    Combined report in `out_dir` plus one sub-folder per `group_col` value.
+    Daily n_posts counts rows with a non-null `id_col` (all rows when the
+    input has no such column); the score stats cover every scored row.
+
+    Refreshes are incremental: manifest.json records a content hash per
+    report folder (its daily stats, raw rows and render settings), and only
+    folders whose hash changed, or whose files are missing, are re-rendered.
+    Folders of groups that no longer exist are removed. Without a readable
+    manifest (or with clean_output=True) the directory is wiped and every
+    folder rendered.
+
+    Every report folder is an independent job; with n_jobs != 1 (None = all
+    cores) the jobs are spread over worker processes rendering with the
+    non-interactive Agg backend. Folder names depend only on the group label,
+    so output paths are the same whatever the worker count. Per-group render
+    times are written to render_times.csv.
+    """
+    t_start = time.perf_counter()
     out_dir = Path(out_dir)
 
-    if clean_output:
+    manifest = None if clean_output else _read_manifest(out_dir)
+    if manifest is None:
         if verbose:
             print(f"\n[sentiment-plots] Cleaning output directory: {out_dir}")
         _clean_directory(out_dir, verbose=verbose)
+        manifest = {"groups": {}}
 
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -173,64 +441,135 @@ def make_sentiment_report(
     df = read_jsonl(input_jsonl)
     if df.empty:
         print("[sentiment-plots] No rows. Done.")
-        return
+        return {"groups": 0, "seconds": time.perf_counter() - t_start}
+
+    # "Overall" pools every row, including rows without a group
+    pooled = update_aggregates(df, date_col=date_col, score_col=score_col, verbose=False)
+
+    render_kwargs = {
+        "date_col": date_col,
+        "score_col": score_col,
+        "rolling_window_days": rolling_window_days,
+        "recent_days_for_boxplot": recent_days_for_boxplot,
+    }
+    # Dates are parsed once here; every plot reuses the "day" column
+    rows = df[[c for c in (group_col, date_col, score_col) if c and c in df.columns]]
+    rows = rows.assign(day=pd.to_datetime(rows[date_col], errors="coerce").dt.normalize())
+    instrument.rows("sentiment_report", rows_in=len(rows))
 
     # -------------------------
     # 1) Combined report
     # -------------------------
     if verbose:
         print(f"[sentiment-plots] Building COMBINED report ({len(df):,} rows)")
-
-    combined_daily = daily_stats(df, date_col=date_col, score_col=score_col, id_col=id_col)
-    combined_daily["score_std_roll"] = combined_daily["score_std"].rolling(
-        rolling_window_days, min_periods=2
-    ).mean()
-
-    combined_daily.to_csv(out_dir / "daily_sentiment_stats.csv", index=False)
-
-    plot_daily_post_volume(combined_daily, out_dir, "Overall")
-    plot_daily_std(combined_daily, out_dir, "Overall", rolling_window_days)
-    plot_mean_with_std_band(combined_daily, out_dir, "Overall")
-    plot_boxplot_recent_days(
-        df, out_dir, "Overall", date_col=date_col, score_col=score_col, n_days=recent_days_for_boxplot
-    )
+    combined = daily_stats(pooled, exact=row_stats(df, date_col=date_col, score_col=score_col, id_col=id_col))
+    combined["score_std_roll"] = combined["score_std"].rolling(rolling_window_days, min_periods=2).mean()
+    jobs = [(_COMBINED, combined, rows, out_dir, "Overall", render_kwargs)]
+    hashes = {_COMBINED: (_daily_hashes(combined), _row_hashes(rows, date_col, score_col))}
 
     # -------------------------
     # 2) Grouped reports
     # -------------------------
     if group_col and group_col in df.columns:
-        groups = sorted(df[group_col].dropna().unique())
+        # All groups' daily stats in one pass over the table, and the rows
+        # sorted by group once; each group gets slices of both
+        table = update_aggregates(df, date_col=date_col, score_col=score_col, group_col=group_col, verbose=verbose)
+        exact = row_stats(df, date_col=date_col, score_col=score_col, id_col=id_col, key_col=group_col)
+        daily, daily_slices = grouped_daily_stats(table, rolling_window_days, exact=exact)
+        codes, groups = pd.factorize(rows[group_col], sort=True)
+        order = np.argsort(codes, kind="stable")
+        sorted_rows = rows.iloc[order]
+        starts = np.searchsorted(codes[order], np.arange(len(groups)))
+        stops = np.searchsorted(codes[order], np.arange(len(groups)), side="right")
+        daily_h = _daily_hashes(daily)
+        rows_h = _row_hashes(sorted_rows, date_col, score_col)
 
         if verbose:
             print(f"\n[sentiment-plots] Building GROUPED reports by '{group_col}' ({len(groups)} groups)")
 
-        for g in groups:
-            g_df = df[df[group_col] == g].copy()
-            g_out = out_dir / str(g)
-            g_out.mkdir(parents=True, exist_ok=True)
-
-            if verbose:
-                print(f"[sentiment-plots] -> {group_col}={g} ({len(g_df):,} rows)")
-
-            daily = daily_stats(g_df, date_col=date_col, score_col=score_col, id_col=id_col)
-            daily["score_std_roll"] = daily["score_std"].rolling(
-                rolling_window_days, min_periods=2
-            ).mean()
-
-            daily.to_csv(g_out / "daily_sentiment_stats.csv", index=False)
-
-            plot_daily_post_volume(daily, g_out, f"{group_col}={g}")
-            plot_daily_std(daily, g_out, f"{group_col}={g}", rolling_window_days)
-            plot_mean_with_std_band(daily, g_out, f"{group_col}={g}")
-            plot_boxplot_recent_days(
-                g_df,
-                g_out,
-                f"{group_col}={g}",
-                date_col=date_col,
-                score_col=score_col,
-                n_days=recent_days_for_boxplot,
-            )
+        for g, a, b in zip(groups, starts, stops):
+            span = daily_slices.get(str(g), slice(0, 0))
+            jobs.append((str(g), daily.iloc[span], sorted_rows.iloc[a:b], _group_dir(out_dir, g), f"{group_col}={g}", render_kwargs))
+            hashes[str(g)] = (daily_h[span], rows_h[a:b])
 
+    # -------------------------
+    # 3) Diff against the manifest
+    # -------------------------
+    previous: Dict[str, Dict[str, Any]] = manifest.get("groups", {})
+    entries: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for job in jobs:
+        name, _, _, folder, title, kwargs = job
+        digest = _content_hash(*hashes[name], title, kwargs)
+        entries[name] = {"dir": str(folder.relative_to(out_dir)), "hash": digest}
+        if _is_current(previous.get(name), digest, folder):
+            entries[name].update({k: previous[name][k] for k in ("rendered_at", "seconds") if k in previous[name]})
+        else:
+            todo.append(job)
+
+    stale = [name for name in previous if name not in entries]
+    for name in stale:
+        folder = out_dir / previous[name].get("dir", "")
+        if name != _COMBINED and folder != out_dir and folder.is_dir():
+            shutil.rmtree(folder)
+
+    if verbose:
+        print(f"[sentiment-plots] {len(todo)} of {len(jobs)} reports changed, {len(stale)} stale removed")
+
+    # -------------------------
+    # 4) Render what changed
+    # -------------------------
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, max(len(todo), 1)))
+    timings: List[Tuple[str, int, float]] = []
+
+    def log(result: Tuple[str, int, float]) -> None:
+        timings.append(result)
+        name, n_rows, seconds = result
+        entries[name].update({"rendered_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(seconds, 3)})
+        if verbose:
+            label = "Overall" if name == _COMBINED else f"{group_col}={name}"
+            print(f"[sentiment-plots] -> {label} ({n_rows:,} rows) rendered in {seconds:.2f}s")
+
+    try:
+        if n_jobs == 1:
+            for job in todo:
+                log(_render_job(job))
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_use_agg_backend) as pool:
+                for fut in as_completed([pool.submit(_render_job, job) for job in todo]):
+                    log(fut.result())
+    finally:
+        # Record only folders known to be current, so an interrupted refresh
+        # re-renders whatever it did not finish
+        done = {name for name, _, _ in timings}
+        current = {name: e for name, e in entries.items() if name in done or name not in {j[0] for j in todo}}
+        _write_manifest(out_dir, current)
+
+    if timings:
+        times = pd.DataFrame(timings, columns=["group", "rows", "seconds"]).sort_values("seconds", ascending=False, kind="stable")
+        times.to_csv(out_dir / "render_times.csv", index=False)
+
+    elapsed = time.perf_counter() - t_start
+    render_seconds = float(sum(t for _, _, t in timings))
+    for _, _, t in timings:
+        instrument.observe("report_render_seconds", t, report=out_dir.name)
+    # Report folders still current per the manifest are cache hits
+    instrument.count("cache_lookups", len(jobs) - len(todo), cache=f"report_{out_dir.name}", result="hit")
+    instrument.count("cache_lookups", len(todo), cache=f"report_{out_dir.name}", result="miss")
     if verbose:
+        print(
+            f"\n[sentiment-plots] Rendered {len(todo)} of {len(jobs)} reports with {n_jobs} worker(s) in {elapsed:.1f}s "
+            f"(render time {render_seconds:.1f}s)"
+        )
         print("\n[sentiment-plots] Report generation complete.\n")
 
+    return {
+        "groups": len(jobs) - 1,
+        "rendered": len(todo),
+        "skipped": len(jobs) - len(todo),
+        "stale_removed": len(stale),
+        "workers": n_jobs,
+        "seconds": elapsed,
+        "render_seconds": render_seconds,
+        "manifest": str(out_dir / MANIFEST_FILE),
+    }
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+# ---------------------------------------------------------
+# Model state <-> (params, arrays)
+# ---------------------------------------------------------
+def _model_type(model: Any) -> str:
+    cls = type(model)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def resolve_type(model_type: str) -> type:
+    """Class for a "package.module:QualName" string."""
+    module, _, qualname = model_type.partition(":")
+    obj: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    return value
+
+
+def split_state(model: Any) -> tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Instance attributes as (JSON params, numeric arrays).
+
+    numpy arrays are stored as raw .npy files; everything else must be
+    JSON-serializable (numbers, strings, lists, dicts, None).
+    """
+    params: Dict[str, Any] = {}
+    arrays: Dict[str, np.ndarray] = {}
+    for name, value in vars(model).items():
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise TypeError(f"Array attribute {name!r} has object dtype; store it as a list instead")
+            arrays[name] = value
+            continue
+        value = _jsonable(value)
+        try:
+            json.dumps(value)
+        except TypeError as e:
+            raise TypeError(f"Attribute {name!r} of {_model_type(model)} is not JSON-serializable") from e
+        params[name] = value
+    return params, arrays
+
+
+# ---------------------------------------------------------
+# Save / load
+# ---------------------------------------------------------
+def save_artifact(model: Any, path: Path) -> Path:
+    """
+    Write a model as <path>/meta.json + one .npy per array attribute.
+
+    meta.json holds the format version, model type, feature list, the model's
+    own `version` (if any), scalar params and each array's dtype / shape.
+    The directory is built next to the target and swapped in at the end, so
+    a reader never sees a half-written artifact.
+    """
+    path = Path(path)
+    params, arrays = split_state(model)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "model_type": _model_type(model),
+        "model_version": params.get("version"),
+        "features": params.get("feature_names"),
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": params,
+        "arrays": {
+            name: {"file": f"{name}.npy", "dtype": str(a.dtype), "shape": list(a.shape)}
+            for name, a in arrays.items()
+        },
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+    try:
+        for name, a in arrays.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(a))
+        with open(tmp / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        if path.exists():
+            old = path.with_name(f".{path.name}.old")
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(path, old)
+            os.replace(tmp, path)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def read_meta(path: Path) -> Dict[str, Any]:
+    with open(Path(path) / META_FILE, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {meta.get('format_version')} in {path}")
+    return meta
+
+
+def load_artifact(path: Path, *, mmap: bool = True) -> Any:
+    """
+    Rebuild a model from an artifact directory.
+
+    With mmap=True (default) arrays are read-only memory maps: opening costs
+    the same whatever their size, and pages are read from disk only when a
+    prediction touches them. mmap=False reads everything into memory.
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    cls = resolve_type(meta["model_type"])
+
+    model = cls.__new__(cls)
+    model.__dict__.update(meta["params"])
+    for name, info in meta["arrays"].items():
+        model.__dict__[name] = np.load(path / info["file"], mmap_mode="r" if mmap else None)
+    return model
+
+
+def is_artifact(path: Path) -> bool:
+    return (Path(path) / META_FILE).is_file()
+
+
+# ---------------------------------------------------------
+# Load-time comparison
+# ---------------------------------------------------------
+def _timed(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def compare_with_pickle(path: Path, *, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Best-of-`repeats` load times of an artifact vs the same model pickled.
+
+    "artifact_touch" also reads every array once, i.e. the cost when a
+    prediction ends up needing all of the state.
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    model = load_artifact(path, mmap=False)
+
+    def touch() -> None:
+        m = load_artifact(path)
+        for name in meta["arrays"]:
+            np.asarray(getattr(m, name)).sum()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl = Path(tmp) / "model.pkl"
+        with open(pkl, "wb") as f:
+            pickle.dump(model, f)
+
+        def load_pickle() -> None:
+            with open(pkl, "rb") as f:
+                pickle.load(f)
+
+        result = {
+            "artifact": str(path),
+            "model_type": meta["model_type"],
+            "array_mb": round(sum(np.dtype(a["dtype"]).itemsize * int(np.prod(a["shape"])) for a in meta["arrays"].values()) / 2**20, 2),
+            "pickle_s": _timed(load_pickle, repeats),
+            "artifact_s": _timed(lambda: load_artifact(path), repeats),
+            "artifact_touch_s": _timed(touch, repeats),
+        }
+    result["speedup"] = round(result["pickle_s"] / max(result["artifact_s"], 1e-9), 1)
+    return result
+
+
+def find_artifacts(root: Path) -> List[Path]:
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(p.parent for p in root.rglob(META_FILE) if not p.parent.name.startswith("."))
+
+
+def print_comparison(results: List[Dict[str, Any]], out: Optional[Any] = None) -> None:
+    for r in results:
+        print(
+            f"{r['artifact']}  ({r['model_type']}, {r['array_mb']} MB arrays)\n"
+            f"  pickle.load     {r['pickle_s'] * 1e3:9.2f} ms\n"
+            f"  artifact (mmap) {r['artifact_s'] * 1e3:9.2f} ms   x{r['speedup']}\n"
+            f"  artifact + read {r['artifact_touch_s'] * 1e3:9.2f} ms",
+            file=out,
+        )
@@ -2,9 +2,30 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 import pickle
 
+import numpy as np
+import pandas as pd
+
+from models.artifacts import load_artifact, save_artifact
+
+
+def ticker_keys(values):
+    """
+    Ticker labels as models store and look them up (str, upper case), so
+    training and serving match "nvda" and "NVDA" the same way.
+    """
+    return pd.Index(np.asarray(values, dtype=object)).astype(str).str.upper()
+
 
 class BaseModel(ABC):
 
+    # Models that can reuse a previous fit (e.g. the prior walk-forward fold)
+    # as a starting point set this and override warm_start().
+    supports_warm_start = False
+
+    # Models with per-group (per-ticker) parameters set this; callers then
+    # pass the row labels as fit(X, y, groups=...) / predict(X, groups=...).
+    uses_groups = False
+
     @abstractmethod
     def fit(self, X, y):
         pass
@@ -13,13 +34,22 @@ class BaseModel(ABC):
     def predict(self, X):
         pass
 
+    def warm_start(self, previous):
+        """Seed state from a fitted model of the same type before fit()."""
+        pass
+
     def save(self, path):
-        path = Path(path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "wb") as f:
-            pickle.dump(self, f)
+        """
+        Write the model as a memory-mappable artifact directory (see
+        models.artifacts): numeric arrays as .npy, the rest in meta.json.
+        """
+        return save_artifact(self, Path(path))
 
     @classmethod
-    def load(cls, path):
-        with open(path, "rb") as f:
-            return pickle.load(f)
+    def load(cls, path, *, mmap=True):
+        path = Path(path)
+        if path.is_file():
+            # Models saved before the artifact format were whole-object pickles
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        return load_artifact(path, mmap=mmap)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from common import instrument, profiling
+from common.config import load_config
+from common.io import read_parquet
+from common.paths import MODELS_DIR, PROJECT_ROOT
+from models.base import BaseModel, ticker_keys
+
+HAR_FEATURES = ("rv_d", "rv_5d", "rv_22d")   # daily, weekly, monthly realized-vol terms
+
+
+def _design(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float64)
+    return np.concatenate([np.ones((len(X), 1)), X], axis=1)
+
+
+def grouped_normal_equations(A: np.ndarray, y: np.ndarray, codes: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-group A'A (G x k x k), A'y (G x k) and row counts in one pass.
+
+    Each of the k(k+1)/2 cross-products is a single np.bincount over the group
+    codes, so the cost is O(rows * k^2) with no Python loop over groups.
+    """
+    k = A.shape[1]
+    xtx = np.empty((n_groups, k, k))
+    for i in range(k):
+        for j in range(i, k):
+            xtx[:, i, j] = xtx[:, j, i] = np.bincount(codes, weights=A[:, i] * A[:, j], minlength=n_groups)
+    xty = np.stack([np.bincount(codes, weights=A[:, i] * y, minlength=n_groups) for i in range(k)], axis=1)
+    counts = np.bincount(codes, minlength=n_groups)
+    return xtx, xty, counts
+
+
+def _solve(xtx: np.ndarray, xty: np.ndarray, ridge: float) -> np.ndarray:
+    """Batched ridge solve of (A'A + ridge I) b = A'y; the intercept is not penalized."""
+    k = xtx.shape[-1]
+    penalty = np.eye(k) * ridge
+    penalty[0, 0] = 0.0
+    return np.linalg.solve(xtx + penalty, xty[..., None])[..., 0]
+
+
+class HARModel(BaseModel):
+    """
+    HAR-RV (Corsi 2009): next-period realized vol on its daily, weekly and
+    monthly averages, optionally plus sentiment features.
+
+        rv_{t+h} = b0 + b_d rv_d_t + b_w rv_5d_t + b_m rv_22d_t + c' s_t
+
+    rv_d is the one-day realized vol (|r_t| annualized) and rv_5d / rv_22d its
+    trailing means (see pipelines.make_labels), so no regressor is the
+    target's window vol lagged by a day. The configured label (labels.yaml)
+    is still a 20-day window vol, whose returns overlap rv_22d's span.
+
+    With `groups` (tickers) every ticker gets its own coefficients, fit for the
+    whole universe at once: per-ticker normal equations from grouped bincounts,
+    then one batched np.linalg.solve. Tickers with fewer than `min_obs` rows
+    (and tickers unseen at fit time) use the pooled fit. Ticker labels are
+    matched case-insensitively (ticker_keys) at fit and predict time.
+    """
+
+    uses_groups = True
+
+    def __init__(
+        self,
+        *,
+        har_features: Sequence[str] = HAR_FEATURES,
+        sentiment_features: Sequence[str] = (),
+        per_ticker: bool = True,
+        min_obs: int = 60,
+        ridge: float = 1e-6,
+        floor: float = 1e-6,
+        version: str = "har-1",
+    ) -> None:
+        self.har_features = list(har_features)
+        self.sentiment_features = list(sentiment_features)
+        self.feature_names = self.har_features + self.sentiment_features
+        self.per_ticker = per_ticker
+        self.min_obs = int(min_obs)
+        self.ridge = float(ridge)
+        self.floor = float(floor)
+        self.version = version
+
+        k = len(self.feature_names) + 1
+        self.tickers: list = []
+        self.coef = np.zeros((0, k))
+        self.pooled_coef = np.zeros(k)
+
+    def fit(self, X, y, groups=None):
+        A = _design(X)
+        y = np.asarray(y, dtype=np.float64)
+        ok = np.isfinite(y) & np.isfinite(A).all(axis=1)
+        A, y = A[ok], y[ok]
+        if len(y) == 0:
+            raise ValueError("No complete rows to fit HAR on")
+
+        xtx, xty, _ = grouped_normal_equations(A, y, np.zeros(len(y), dtype=np.int64), 1)
+        self.pooled_coef = _solve(xtx, xty, self.ridge)[0]
+
+        if self.per_ticker and groups is not None:
+            codes, uniques = pd.factorize(ticker_keys(np.asarray(groups)[ok]), sort=True)
+            xtx, xty, counts = grouped_normal_equations(A, y, codes, len(uniques))
+            coef = _solve(xtx, xty, self.ridge)
+
+            thin = (counts < max(self.min_obs, A.shape[1])) | ~np.isfinite(coef).all(axis=1)
+            coef[thin] = self.pooled_coef
+            self.tickers = [str(t) for t in uniques]
+            self.coef = coef
+        else:
+            self.tickers = []
+            self.coef = np.zeros((0, A.shape[1]))
+        return self
+
+    def coefficients(self, groups=None) -> np.ndarray:
+        """Coefficient row per group label (pooled for unknown / no groups)."""
+        if groups is None or not len(self.tickers):
+            n = 1 if groups is None else len(groups)
+            return np.broadcast_to(self.pooled_coef, (n, len(self.pooled_coef)))
+
+        # Look up each distinct label once, then broadcast through the codes
+        codes, uniques = pd.factorize(ticker_keys(groups))
+        idx = ticker_keys(self.tickers).get_indexer(uniques)[codes]
+        coef = np.asarray(self.coef)[np.maximum(idx, 0)]
+        coef[idx < 0] = self.pooled_coef
+        return coef
+
+    def predict(self, X, groups=None):
+        A = _design(X)
+        coef = self.coefficients(groups)
+        pred = np.einsum("ij,ij->i", A, np.broadcast_to(coef, A.shape))
+        return np.maximum(pred, self.floor)
+
+
+# --------------------------------------------------
+# Training entry point
+# --------------------------------------------------
+@instrument.traced("train_har")
+@profiling.profiled
+def train_har(config_name: str = "ensemble.yaml", output_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Fit HARModel on the merged table (ensemble.yaml `model` section) and save
+    it as the ensemble artifact served by scripts/30_predict.py.
+    """
+    cfg = load_config(config_name)["ensemble"]
+    mcfg = cfg.get("model") or {}
+    label = mcfg.get("label", "rv_1d")
+
+    out = cfg["output"]
+    df = read_parquet(PROJECT_ROOT / out["merged_dir"] / out["merged_table"])
+
+    model = HARModel(
+        har_features=mcfg.get("har_features", HAR_FEATURES),
+        sentiment_features=mcfg.get("sentiment_features", []),
+        per_ticker=bool(mcfg.get("per_ticker", True)),
+        min_obs=int(mcfg.get("min_obs", 60)),
+        ridge=float(mcfg.get("ridge", 1e-6)),
+    )
+
+    t0 = time.perf_counter()
+    model.fit(df[model.feature_names].to_numpy(dtype=np.float64), df[label].to_numpy(dtype=np.float64), groups=df["ticker"].to_numpy())
+    elapsed = time.perf_counter() - t0
+
+    output_dir = output_dir or MODELS_DIR / "ensemble"
+    model.save(output_dir)
+    instrument.rows("train_har", rows_in=len(df))
+    print(f"HAR: fit {len(df)} rows, {len(model.tickers)} tickers in {elapsed * 1e3:.1f} ms -> {output_dir}")
+
+    return {"output": str(output_dir), "rows": len(df), "tickers": len(model.tickers), "seconds": elapsed}
@@ -5,6 +5,8 @@ import torch
 import torch.nn.functional as F
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
+from common import instrument
+
 MODEL_NAME = "ProsusAI/finbert"
 MAX_LEN = 256
 
@@ -20,8 +22,9 @@ def _load() -> None:
         return
 
     _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    _model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).to(_device)
+    with instrument.timer("model_load_seconds", model="finbert"):
+        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        _model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).to(_device)
     _model.eval()
     _id2label = {int(k): str(v).lower() for k, v in _model.config.id2label.items()}
 
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from common.config import load_config
+from common.io import read_parquet
+from common.paths import PROJECT_ROOT
+from models.artifacts import META_FILE
+from models.base import BaseModel, ticker_keys
+
+
+# ---------------------------------------------------------
+# Local prediction daemon
+# ---------------------------------------------------------
+#   GET  /predict?tickers=NVDA,AMD     -> {"predictions": {ticker: value}, "as_of": {...}, "missing": [...]}
+#   POST /predict {"tickers": [...]}    same, for long ticker lists
+#   GET  /stats                         latency / throughput / batching counters
+#   POST /reload                        reload model + features now
+#   GET  /health
+
+
+@dataclass
+class ServerConfig:
+    model_dir: Path
+    features_path: Path
+    host: str = "127.0.0.1"
+    port: int = 8765
+    max_batch: int = 1024            # tickers per vectorized predict call
+    max_wait_ms: float = 2.0         # how long the first request waits for others to join its batch
+    reload_interval_s: float = 5.0   # artifact / feature-table poll period (0 = only POST /reload)
+    ticker_col: str = "ticker"
+    date_col: str = "date"
+
+
+def load_server_config(config_name: str = "ensemble.yaml", **overrides: Any) -> ServerConfig:
+    """ServerConfig from ensemble.yaml's `serving` section (features = merged table)."""
+    cfg = load_config(config_name)["ensemble"]
+    serving = dict(cfg.get("serving") or {})
+    serving.update({k: v for k, v in overrides.items() if v is not None})
+
+    out = cfg["output"]
+    return ServerConfig(
+        model_dir=PROJECT_ROOT / serving.pop("model_dir", "artifacts/models/ensemble"),
+        features_path=PROJECT_ROOT / serving.pop("features_path", Path(out["merged_dir"]) / out["merged_table"]),
+        **serving,
+    )
+
+
+# ---------------------------------------------------------
+# Model + latest features, swapped atomically on reload
+# ---------------------------------------------------------
+@dataclass
+class Snapshot:
+    model: BaseModel
+    tickers: Dict[str, int]          # ticker -> row of X
+    X: np.ndarray                    # latest feature row per ticker, in the model's feature order
+    as_of: np.ndarray                # date of each row (ISO strings)
+    version: str
+    fingerprint: Tuple[float, float]
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _fingerprint(cfg: ServerConfig) -> Tuple[float, float]:
+    return _mtime(cfg.model_dir / META_FILE), _mtime(cfg.features_path)
+
+
+def load_snapshot(cfg: ServerConfig) -> Snapshot:
+    """Load the model artifact and the latest feature row per ticker."""
+    fingerprint = _fingerprint(cfg)
+    model = BaseModel.load(cfg.model_dir)
+
+    df = read_parquet(cfg.features_path)
+    feature_names: Optional[Sequence[str]] = getattr(model, "feature_names", None)
+    if feature_names is None:
+        raise ValueError(f"Model in {cfg.model_dir} has no feature_names")
+    missing = [c for c in feature_names if c not in df.columns]
+    if missing:
+        raise ValueError(f"Feature table {cfg.features_path} lacks model features: {missing}")
+
+    latest = (
+        df.sort_values([cfg.ticker_col, cfg.date_col], kind="stable")
+          .drop_duplicates(cfg.ticker_col, keep="last")
+    )
+    tickers = ticker_keys(latest[cfg.ticker_col]).to_numpy()
+    return Snapshot(
+        model=model,
+        tickers={t: i for i, t in enumerate(tickers)},
+        X=latest[list(feature_names)].to_numpy(dtype=np.float64),
+        as_of=pd.to_datetime(latest[cfg.date_col]).dt.strftime("%Y-%m-%d").to_numpy(),
+        version=str(getattr(model, "version", "")),
+        fingerprint=fingerprint,
+    )
+
+
+# ---------------------------------------------------------
+# Counters
+# ---------------------------------------------------------
+class _Counters:
+    def __init__(self, window: int = 10_000) -> None:
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.tickers = 0
+        self.batches = 0
+        self.batched_tickers = 0
+        self.predict_s = 0.0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.latencies: deque = deque(maxlen=window)
+
+    def request_done(self, n_tickers: int, latency_s: float) -> None:
+        with self.lock:
+            self.requests += 1
+            self.tickers += n_tickers
+            self.latencies.append(latency_s)
+
+    def batch_done(self, n_tickers: int, seconds: float) -> None:
+        with self.lock:
+            self.batches += 1
+            self.batched_tickers += n_tickers
+            self.predict_s += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            lat = np.asarray(self.latencies) * 1e3
+            uptime = time.time() - self.started
+            p = np.percentile(lat, [50, 95, 99]) if len(lat) else [np.nan] * 3
+            return {
+                "uptime_s": round(uptime, 1),
+                "requests": self.requests,
+                "tickers": self.tickers,
+                "requests_per_s": round(self.requests / uptime, 2) if uptime else 0.0,
+                "batches": self.batches,
+                "mean_batch_tickers": round(self.batched_tickers / self.batches, 1) if self.batches else 0.0,
+                "predict_ms_total": round(self.predict_s * 1e3, 2),
+                "latency_ms_p50": round(float(p[0]), 3),
+                "latency_ms_p95": round(float(p[1]), 3),
+                "latency_ms_p99": round(float(p[2]), 3),
+                "reloads": self.reloads,
+                "reload_errors": self.reload_errors,
+            }
+
+
+# ---------------------------------------------------------
+# Service: micro-batching + hot reload
+# ---------------------------------------------------------
+class PredictionService:
+    """
+    Loads the model and feature snapshot once and answers ticker requests.
+
+    Concurrent requests are queued; a single batching thread takes the first
+    waiting request, collects whatever else arrives within max_wait_ms (up to
+    max_batch tickers) and serves them all with one vectorized predict() call.
+    A watcher thread reloads when the artifact's meta.json or the feature
+    table changes; in-flight batches keep using the snapshot they started with.
+    """
+
+    def __init__(self, cfg: ServerConfig) -> None:
+        self.cfg = cfg
+        self.counters = _Counters()
+        self._snapshot = load_snapshot(cfg)
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._stop = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._batch_loop, name="predict-batcher", daemon=True),
+            threading.Thread(target=self._watch_loop, name="predict-reloader", daemon=True),
+        ]
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def start(self) -> "PredictionService":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -----------------------------
+    # Requests
+    # -----------------------------
+    def submit(self, tickers: Sequence[str]) -> Future:
+        fut: Future = Future()
+        self._queue.put((list(ticker_keys(list(tickers))), fut))
+        return fut
+
+    def predict(self, tickers: Sequence[str], timeout: float = 30.0) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        result = self.submit(tickers).result(timeout=timeout)
+        self.counters.request_done(len(tickers), time.perf_counter() - t0)
+        return result
+
+    def _batch_loop(self) -> None:
+        wait_s = self.cfg.max_wait_ms / 1e3
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            n = len(first[0])
+            deadline = time.perf_counter() + wait_s
+            while n < self.cfg.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n += len(item[0])
+
+            try:
+                self._serve_batch(batch)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _serve_batch(self, batch: List[Tuple[List[str], Future]]) -> None:
+        snap = self._snapshot
+        wanted = {t for tickers, _ in batch for t in tickers}
+        known = [t for t in wanted if t in snap.tickers]
+        rows = np.fromiter((snap.tickers[t] for t in known), dtype=np.int64, count=len(known))
+
+        t0 = time.perf_counter()
+        X = snap.X[rows]
+        ok = np.isfinite(X).all(axis=1)
+        preds = np.full(len(known), np.nan)
+        if ok.any():
+            kw = {"groups": np.asarray(known, dtype=object)[ok]} if snap.model.uses_groups else {}
+            preds[ok] = np.asarray(snap.model.predict(X[ok], **kw), dtype=np.float64).ravel()
+        self.counters.batch_done(len(known), time.perf_counter() - t0)
+
+        by_ticker = {t: (None if not np.isfinite(p) else float(p), snap.as_of[r]) for t, p, r in zip(known, preds, rows)}
+        for tickers, fut in batch:
+            fut.set_result({
+                "predictions": {t: by_ticker[t][0] for t in tickers if t in by_ticker},
+                "as_of": {t: by_ticker[t][1] for t in tickers if t in by_ticker},
+                "missing": [t for t in tickers if t not in by_ticker],
+                "model_version": snap.version,
+            })
+
+    # -----------------------------
+    # Hot reload
+    # -----------------------------
+    def reload(self, force: bool = False) -> bool:
+        """Reload when the artifacts changed (or always with force); True if swapped."""
+        with self._reload_lock:
+            if not force and _fingerprint(self.cfg) == self._snapshot.fingerprint:
+                return False
+            try:
+                self._snapshot = load_snapshot(self.cfg)
+            except Exception as e:
+                with self.counters.lock:
+                    self.counters.reload_errors += 1
+                print(f"[predict-server] Reload failed, keeping previous model: {e}")
+                return False
+            with self.counters.lock:
+                self.counters.reloads += 1
+            print(f"[predict-server] Reloaded model {self._snapshot.version!r} ({len(self._snapshot.tickers)} tickers)")
+            return True
+
+    def _watch_loop(self) -> None:
+        if self.cfg.reload_interval_s <= 0:
+            return
+        while not self._stop.wait(self.cfg.reload_interval_s):
+            self.reload()
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            **self.counters.snapshot(),
+            "model_dir": str(self.cfg.model_dir),
+            "model_version": snap.version,
+            "tickers_loaded": len(snap.tickers),
+            "queue_depth": self._queue.qsize(),
+        }
+
+
+# ---------------------------------------------------------
+# HTTP front end
+# ---------------------------------------------------------
+def _make_handler(service: PredictionService):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:  # counters replace access logs
+            pass
+
+        def _send(self, status: int, payload: Any) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _predict(self, tickers: List[str]) -> None:
+            tickers = [t.strip() for t in tickers if t and t.strip()]
+            if not tickers:
+                return self._send(400, {"error": "no tickers given"})
+            try:
+                self._send(200, service.predict(tickers))
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def do_GET(self) -> None:
+            u = urlparse(self.path)
+            if u.path == "/predict":
+                q = parse_qs(u.query)
+                return self._predict([t for v in q.get("tickers", []) for t in v.split(",")])
+            if u.path == "/stats":
+                return self._send(200, service.stats())
+            if u.path == "/health":
+                return self._send(200, {"ok": True})
+            self._send(404, {"error": f"unknown path {u.path}"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            u = urlparse(self.path)
+            if u.path == "/predict":
+                try:
+                    body = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    return self._send(400, {"error": "invalid JSON"})
+                return self._predict(list(body.get("tickers") or []))
+            if u.path == "/reload":
+                return self._send(200, {"reloaded": service.reload(force=True), **service.stats()})
+            self._send(404, {"error": f"unknown path {u.path}"})
+
+    return Handler
+
+
+class PredictionServer:
+    """
+    Threaded HTTP server around a PredictionService.
+
+    Usage:
+        with PredictionServer(cfg) as srv:
+            requests.get(f"{srv.url}/predict", params={"tickers": "NVDA,AMD"})
+    """
+
+    def __init__(self, cfg: ServerConfig) -> None:
+        self.service = PredictionService(cfg)
+        self._httpd = ThreadingHTTPServer((cfg.host, cfg.port), _make_handler(self.service))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "PredictionServer":
+        self.service.start()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.service.start()
+        print(f"[predict-server] Serving {len(self.service.snapshot.tickers)} tickers on {self.url} (pid {os.getpid()})")
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self.service.stop()
+        if self._thread is not None:
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "PredictionServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
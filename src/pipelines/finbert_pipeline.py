@@ -1,25 +1,30 @@
 from __future__ import annotations
 
 import json
-import hashlib
 
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, Optional
-
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from common import instrument, profiling
+from common.config import load_config
+from common.paths import PROJECT_ROOT
+from common.timealign import session_dates_iso
+from pipelines.sentiment_features import write_feature_table
+from pipelines.news_dedupe import (
+    NEWS_RAW_DIR,
+    get_permalink,
+    group_representatives,
+    iter_jsonl,
+    latest_yahoo_jsonl,
+    link_hash,
+    make_yahoo_row_id,
+    merged_text,
+)
 from models.finbert.model import score_finbert
 
-NEWS_RAW_DIR = Path("data/raw/news")
 OUTPUT_PATH = Path("data/processed/news/yahoo_news_finbert_scored.jsonl")
 
 
-def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                yield json.loads(line)
-
-
 def _write_jsonl(path: Path, rows: Iterable[Dict[str, Any]]) -> int:
     path.parent.mkdir(parents=True, exist_ok=True)
     n = 0
@@ -30,60 +35,91 @@ def _write_jsonl(path: Path, rows: Iterable[Dict[str, Any]]) -> int:
     return n
 
 
-def _latest_yahoo_jsonl(raw_dir: Path) -> Path:
-    files = sorted(raw_dir.glob("yahoo_news_*.jsonl"))
-    if not files:
-        raise FileNotFoundError(f"No yahoo_news_*.jsonl found in {raw_dir.resolve()}")
-    return files[-1]
-
-
-def _get_permalink(row: Dict[str, Any]) -> str:
-    return row.get("permalink") or row.get("link") or row.get("url") or row.get("article_url") or ""
-
-
-def make_yahoo_row_id(row: Dict[str, Any], ticker: str) -> str:
-    permalink = _get_permalink(row)
-
-    # Use permalink as the stable unique base (best)
-    base = permalink
-
-    # Fallback if permalink missing
-    if not base:
-        title = (row.get("title") or "").strip()
-        summary = (row.get("description") or row.get("summary") or "").strip()
-        base = title + "|" + summary
-
-    h = hashlib.sha1(base.encode("utf-8")).hexdigest()[:10]  # 8–12 chars is fine
-    return f"yahoo:{h}:{ticker}"
-
-
-def run_finbert_on_yahoo_news(input_path: Optional[Path] = None) -> Dict[str, Any]:
-    input_path = input_path or _latest_yahoo_jsonl(NEWS_RAW_DIR)
+@instrument.traced("finbert.score")
+@profiling.profiled
+def run_finbert_on_yahoo_news(
+    input_path: Optional[Path] = None,
+    *,
+    dedupe_threshold: float = 0.8,
+    run_cfg: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Score Yahoo news rows with FinBERT.
+
+    The same article listed under several tickers is scored once (grouped by
+    link), and near-identical articles (syndicated wire stories repeated across
+    publishers) are clustered with MinHash; FinBERT runs once per cluster and
+    the scores are fanned out to every member row. `cluster_id` is kept on each
+    output row for diagnostics, and `session_date` is the trading session the
+    article can affect (published after the close -> next session).
+    """
+    input_path = input_path or latest_yahoo_jsonl(NEWS_RAW_DIR)
+    run_cfg = run_cfg or load_config("run.yaml")
+
+    rows: List[Dict[str, Any]] = list(iter_jsonl(input_path))
+    texts = [merged_text(r) for r in rows]
+    sessions = session_dates_iso([r.get("published_at") or r.get("date") for r in rows], run_cfg)
+    with instrument.timer("finbert_dedupe_seconds"):
+        reps, _ = group_representatives(rows, texts, dedupe_threshold)
+
+    # Score each cluster representative once
+    scores_by_rep: Dict[int, Dict[str, float]] = {}
 
     def scored_rows() -> Iterator[Dict[str, Any]]:
-        for row in _iter_jsonl(input_path):
+        for i, row in enumerate(rows):
             ticker = (row.get("symbol") or row.get("ticker") or "").upper()
             date_val = row.get("date")
-            permalink = _get_permalink(row)
+            permalink = get_permalink(row)
             row_id = make_yahoo_row_id(row, ticker)
 
-            title = (row.get("title") or "").strip()
-            desc = (row.get("description") or row.get("summary") or "").strip()
-            body = (row.get("text") or "").strip()
-            merged = " ".join([t for t in [title, desc, body] if t])
-
-            scores = score_finbert(merged)
+            rep = reps[i]
+            scores = scores_by_rep.get(rep)
+            if scores is None:
+                with instrument.timer("model_batch_seconds", model="finbert"):
+                    scores = scores_by_rep[rep] = score_finbert(texts[rep])
 
             yield {
                 "id": row_id,
                 "ticker": ticker,
                 "date": date_val,
+                "session_date": sessions[i],
                 "neg": scores["neg"],
                 "neu": scores["neu"],
                 "pos": scores["pos"],
                 "compound": scores["compound"],
                 "permalink": permalink,
+                "cluster_id": link_hash(rows[rep]),
             }
 
     n_written = _write_jsonl(OUTPUT_PATH, scored_rows())
-    return {"input": str(input_path), "output": str(OUTPUT_PATH), "rows_written": n_written}
+    instrument.rows("finbert.score", rows_in=len(rows), rows_out=n_written)
+    # Rows served from their cluster representative's scores
+    instrument.count("cache_lookups", n_written - len(scores_by_rep), cache="finbert_clusters", result="hit")
+    instrument.count("cache_lookups", len(scores_by_rep), cache="finbert_clusters", result="miss")
+    return {
+        "input": str(input_path),
+        "output": str(OUTPUT_PATH),
+        "rows_written": n_written,
+        "clusters": len(scores_by_rep),
+        "inference_saved": n_written - len(scores_by_rep),
+    }
+
+
+@instrument.traced("finbert.features")
+@profiling.profiled
+def build_finbert_features(config_name: str = "finbert.yaml") -> Dict[str, Any]:
+    """
+    Per-(ticker, day) FinBERT features (counts, mean/std, dispersion, polarity
+    shares and their trailing-window versions) from the scored rows.
+    """
+    cfg = load_config(config_name)["finbert"]
+    report = write_feature_table(PROJECT_ROOT / OUTPUT_PATH, cfg, name="finbert")
+    print(
+        f"FinBERT features: +{report['rows_ingested']} new rows "
+        f"({report['cells_updated']} day cells updated, {report['cells_added']} added) "
+        f"-> {report['rows_out']} (ticker, day) rows -> {report['output']}"
+    )
+    if "drift_report" in report:
+        pooled = ", ".join(report["drift_pooled"]) or "none"
+        print(f"FinBERT drift: {report['drift_flags']} flagged (ticker, series), pooled: {pooled} -> {report['drift_report']}")
+    return report
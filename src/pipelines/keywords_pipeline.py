@@ -1,4 +1,5 @@
-from apis.ollama_data import get_keywords
+from apis.ollama_data import get_keywords, load_cached_result, save_cached_result
+from common import instrument, profiling
 from common.paths import INTERIM_DATA_DIR  # Base path for interim (cached) data artifacts
 import json, os
 from collections import Counter
@@ -10,10 +11,13 @@ from collections import Counter
 from collections import Counter
 
 
+@instrument.traced("keywords")
+@profiling.profiled
 def build_keywords(
         tickers: list[str],
         k: int = 15,
-        runs: int = 30
+        runs: int = 30,
+        use_cache: bool = True
 ) -> dict[str, list[str]]:
     result = {}
 
@@ -23,13 +27,20 @@ def build_keywords(
     print(f"LLM runs per ticker: {runs}\n")
 
     for t in tickers:
+        # Reuse the aggregated result until it expires (skips the LLM entirely)
+        cached = load_cached_result("keywords", t, k, runs) if use_cache else None
+        if cached is not None:
+            print(f"\nUsing cached keywords for {t}: {cached}")
+            result[t] = cached
+            continue
+
         print(f"\nGenerating keywords for ticker: {t}")
         counter = Counter()
 
         for i in range(runs):
             print(f"  Run {i + 1}/{runs} for {t}...")
 
-            keywords = get_keywords(t, k=k)
+            keywords = get_keywords(t, k=k, sample=i)
             print(f"    Returned: {keywords}")
 
             # normalize slightly
@@ -40,6 +51,9 @@ def build_keywords(
         print(f"\nFinal selected keywords for {t}: {top_keywords}")
         result[t] = top_keywords
 
+        if top_keywords:
+            save_cached_result("keywords", t, k, runs, top_keywords)
+
     print("\nKeyword generation complete.\n")
 
     return result
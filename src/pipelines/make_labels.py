@@ -1,5 +1,297 @@
-def build_labels():
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from common import instrument, profiling
+from common.config import load_config
+from common.io import read_parquet, write_parquet
+from common.labeling import daily_realized_volatility, from_panel, har_terms, log_returns, realized_volatility, shift_days, to_panel
+from common.online_stats import STATE_PATH, OnlineStatsStore, RollingRealizedVol, RollingWindow, TickerState
+from common.paths import LABELS_PROCESSED_DATA_DIR, PROJECT_ROOT
+from common.timealign import normalize_session_dates
+
+OUTPUT_PATH = LABELS_PROCESSED_DATA_DIR / "labels.parquet"
+
+
+def _read_table(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path)
+    if path.suffix in (".xlsx", ".xls"):
+        return pd.read_excel(path)
+    raise ValueError(f"Unsupported market data file: {path}")
+
+
+def load_market_prices(source: str | Path, *, default_ticker: Optional[str] = None) -> pd.DataFrame:
     """
-    Entry point for building volatility labels.
+    Load daily prices from a file or a directory of parquet/csv/xlsx files.
+
+    Files without a `ticker` column (e.g. older stock_data.xlsx exports) are
+    tagged with `default_ticker`.
     """
-    print("Label pipeline invoked")
+    source = Path(source)
+    if not source.is_absolute():
+        source = PROJECT_ROOT / source
+
+    if source.is_dir():
+        files = sorted(p for p in source.iterdir() if p.suffix in (".parquet", ".csv", ".xlsx"))
+    else:
+        files = [source]
+    if not files:
+        raise FileNotFoundError(f"No market data found at {source}")
+
+    frames = []
+    for f in files:
+        df = _read_table(f)
+        if "ticker" not in df.columns:
+            if default_ticker is None:
+                raise KeyError(f"{f} has no 'ticker' column and no default_ticker was given")
+            df["ticker"] = default_ticker
+        frames.append(df)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _prepare_prices(prices: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+    date_col = cfg["alignment"].get("date_column", "date")
+    price_col = cfg["source"].get("price_column", "adjClose")
+
+    prices = prices[["ticker", date_col, price_col]].copy()
+    prices[date_col] = normalize_session_dates(prices[date_col]).to_numpy()
+    return prices
+
+
+def compute_labels(prices: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Realized-volatility labels for every ticker at once (see labels.yaml).
+
+    Output columns: ticker, date, rv (trailing window vol as of date), rv_d
+    (one-day realized vol, |r| annualized: the HAR daily term), rv_<w>d for
+    each `har_windows` entry (trailing mean of rv_d, the HAR weekly / monthly
+    terms) and <label.name> (rv `horizon_days` trading days ahead, the
+    prediction target).
+    """
+    definition = cfg["definition"]
+    if definition.get("type") != "realized_volatility" or definition.get("method") != "close_to_close":
+        raise ValueError(f"Unsupported label definition: {definition}")
+
+    date_col = cfg["alignment"].get("date_column", "date")
+    price_col = cfg["source"].get("price_column", "adjClose")
+
+    tickers, dates, panels = to_panel(_prepare_prices(prices, cfg), [price_col], date_col=date_col)
+    close = panels[price_col]
+
+    rv = realized_volatility(
+        close,
+        window_days=int(definition["window_days"]),
+        min_periods=definition.get("min_periods"),
+        annualize=bool(definition.get("annualize", True)),
+        trading_days_per_year=int(definition.get("trading_days_per_year", 252)),
+    )
+    target = shift_days(rv, int(cfg["label"].get("horizon_days", 1)))
+    daily = daily_realized_volatility(
+        close,
+        annualize=bool(definition.get("annualize", True)),
+        trading_days_per_year=int(definition.get("trading_days_per_year", 252)),
+    )
+
+    panels = {"rv": rv, "rv_d": daily}
+    panels.update(har_terms(daily, definition.get("har_windows", [])))
+    panels[cfg["label"]["name"]] = target
+
+    labels = from_panel(tickers, dates, panels, mask=~pd.isna(close))
+    return labels.rename(columns={"date": date_col})
+
+
+def _load_prices(cfg: Dict[str, Any]) -> pd.DataFrame:
+    run = load_config("run.yaml")
+    symbols = run.get("universe", {}).get("ticker_symbols") or [None]
+    return load_market_prices(cfg["source"]["market_data"], default_ticker=symbols[0])
+
+
+@instrument.traced("labels")
+@profiling.profiled
+def build_labels(
+    config_name: str = "labels.yaml",
+    output_path: Path = OUTPUT_PATH,
+    state_path: Optional[Path] = STATE_PATH,
+) -> Dict[str, Any]:
+    """
+    Entry point for building volatility labels over the full price history.
+
+    Also writes the online state (unless state_path is None) so that
+    update_labels can append the following days one at a time.
+    """
+    cfg = load_config(config_name)
+    prices = _load_prices(cfg)
+
+    t0 = time.perf_counter()
+    labels = compute_labels(prices, cfg)
+    elapsed = time.perf_counter() - t0
+
+    write_parquet(labels, output_path)
+    if state_path is not None:
+        seed_online_state(prices, cfg, state_path)
+    instrument.rows("labels", rows_in=len(prices), rows_out=len(labels))
+    print(f"Labels: {len(labels)} rows, {labels['ticker'].nunique()} tickers in {elapsed:.3f}s -> {output_path}")
+
+    return {"output": str(output_path), "rows": len(labels), "seconds": elapsed, "mode": "full"}
+
+
+# --------------------------------------------------
+# Online (one day at a time) updates
+# --------------------------------------------------
+def _new_online_store(cfg: Dict[str, Any]) -> OnlineStatsStore:
+    definition = cfg["definition"]
+    window = int(definition["window_days"])
+    return OnlineStatsStore(
+        window_days=window,
+        min_periods=int(definition.get("min_periods") or window),
+        trading_days_per_year=int(definition.get("trading_days_per_year", 252)),
+        annualize=bool(definition.get("annualize", True)),
+        har_windows=[int(w) for w in definition.get("har_windows", [])],
+    )
+
+
+def seed_online_state(prices: pd.DataFrame, cfg: Dict[str, Any], state_path: Path = STATE_PATH) -> OnlineStatsStore:
+    """
+    Online state as of the last day of `prices`, read off the batch panels:
+    only the last `window` slots of each rolling window are kept, so seeding
+    costs O(tickers x window) rather than a replay of the history.
+    """
+    date_col = cfg["alignment"].get("date_column", "date")
+    price_col = cfg["source"].get("price_column", "adjClose")
+    store = _new_online_store(cfg)
+
+    tickers, dates, panels = to_panel(_prepare_prices(prices, cfg), [price_col], date_col=date_col)
+    close = panels[price_col]
+    r = log_returns(close)
+    daily = daily_realized_volatility(close, annualize=store.annualize, trading_days_per_year=store.trading_days_per_year)
+    valid = np.isfinite(close) & (close > 0)
+    days = [d.date().isoformat() for d in dates]
+    n = len(days)
+
+    for i, ticker in enumerate(tickers):
+        seen = np.flatnonzero(valid[i])
+        if not len(seen):
+            continue
+        last = seen[-1]
+        rv = RollingRealizedVol(store.window_days, store.min_periods, store.trading_days_per_year, store.annualize)
+        rv.sq_returns = RollingWindow.from_values(store.window_days, store.min_periods, (r[i, max(seen[0], n - store.window_days):] ** 2).tolist())
+        rv.last_close = float(close[i, last])
+        rv.daily = float(daily[i, -1])
+        store.tickers[str(ticker)] = TickerState(
+            last_day=days[-1],
+            last_close_day=days[last],
+            rv=rv,
+            har={f"rv_{w}d": RollingWindow.from_values(w, max(1, w // 2), daily[i, max(seen[0], n - w):].tolist()) for w in store.har_windows},
+        )
+
+    if state_path is not None:
+        store.save(state_path)
+    return store
+
+
+def _stale_reason(store: OnlineStatsStore, prices: pd.DataFrame, cfg: Dict[str, Any]) -> Optional[str]:
+    """Why the saved state cannot be extended with `prices` (None when it can)."""
+    if not store.tickers:
+        return "no online state"
+    if store.settings() != _new_online_store(cfg).settings():
+        return "label settings changed"
+
+    date_col = cfg["alignment"].get("date_column", "date")
+    price_col = cfg["source"].get("price_column", "adjClose")
+    last_day = pd.Timestamp(store.last_day)
+    old = prices[prices[date_col] <= last_day]
+
+    # The last close each ticker was seen at must still be in the data unchanged
+    # (adjusted closes are revised backwards on splits / dividends)
+    known = {(t, pd.Timestamp(st.last_close_day)): st.rv.last_close for t, st in store.tickers.items() if st.last_close_day}
+    seen = old.set_index(["ticker", date_col])[price_col]
+    seen = seen[seen.index.isin(list(known))]
+    if len(seen) != len(known):
+        return "state days missing from the market data"
+    if not np.allclose(seen.to_numpy(dtype=np.float64), [known[k] for k in seen.index], rtol=1e-9, atol=0.0):
+        return "historical closes revised"
+    if not set(old["ticker"]) <= set(store.tickers):
+        return "new tickers with history before the last update"
+    return None
+
+
+@instrument.traced("labels.update")
+@profiling.profiled
+def update_labels(
+    config_name: str = "labels.yaml",
+    output_path: Path = OUTPUT_PATH,
+    state_path: Path = STATE_PATH,
+    *,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """
+    Daily entry point: append the trading days newer than the online state to
+    labels.parquet, each in O(1) per ticker, and fill the target of the rows
+    `horizon_days` back. Rebuilds everything with build_labels instead when
+    there is no state / labels yet, the label settings changed, or the market
+    data disagrees with the state (see _stale_reason).
+    """
+    cfg = load_config(config_name)
+    output_path, state_path = Path(output_path), Path(state_path)
+    store = OnlineStatsStore.load(state_path)
+
+    reason = "requested" if full else None
+    if reason is None and not output_path.exists():
+        reason = "no labels yet"
+    prices = None
+    if reason is None:
+        prices = _prepare_prices(_load_prices(cfg), cfg)
+        reason = _stale_reason(store, prices, cfg)
+    if reason is not None:
+        print(f"Labels: full rebuild ({reason})")
+        return build_labels(config_name, output_path, state_path)
+
+    date_col = cfg["alignment"].get("date_column", "date")
+    price_col = cfg["source"].get("price_column", "adjClose")
+    label_name = cfg["label"]["name"]
+    horizon = int(cfg["label"].get("horizon_days", 1))
+
+    new = prices[prices[date_col] > pd.Timestamp(store.last_day)]
+    new = new[np.isfinite(new[price_col].to_numpy(dtype=np.float64))]
+    if new.empty:
+        print(f"Labels: up to date ({store.last_day})")
+        return {"output": str(output_path), "rows": 0, "seconds": 0.0, "mode": "online"}
+
+    t0 = time.perf_counter()
+    labels = read_parquet(output_path)
+    axis = list(pd.DatetimeIndex(labels[date_col].unique()).sort_values()[-horizon:]) if horizon > 0 else []
+
+    rows, targets = [], []
+    for day, g in new.groupby(date_col, sort=True):
+        out = store.update_closes(day.date().isoformat(), dict(zip(g["ticker"], g[price_col].astype(float))))
+        rows += [{"ticker": t, date_col: day, **vals} for t, vals in out.items()]
+        # Target of the rows `horizon` panel days back = today's rv (NaN if no close today)
+        axis.append(day)
+        if horizon > 0 and len(axis) > horizon:
+            targets.append((axis[-1 - horizon], {t: vals["rv"] for t, vals in out.items()}))
+
+    columns = list(labels.columns)
+    labels = pd.concat([labels.astype({"ticker": str}), pd.DataFrame(rows)], ignore_index=True)
+    for target_day, rv in targets:
+        at = (labels[date_col] == target_day).to_numpy()
+        labels.loc[at, label_name] = labels.loc[at, "ticker"].map(rv).astype(np.float64).to_numpy()
+
+    labels["ticker"] = pd.Categorical(labels["ticker"], categories=sorted(labels["ticker"].unique()))
+    labels = labels.sort_values(["ticker", date_col], kind="stable", ignore_index=True)[columns]
+    elapsed = time.perf_counter() - t0
+
+    write_parquet(labels, output_path)
+    store.save(state_path)
+    instrument.rows("labels.update", rows_in=len(new), rows_out=len(rows))
+    print(f"Labels: +{len(rows)} rows over {new[date_col].nunique()} new day(s) (online) in {elapsed:.3f}s -> {output_path}")
+
+    return {"output": str(output_path), "rows": len(rows), "seconds": elapsed, "mode": "online"}
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import pandas as pd
+
+from common import instrument, profiling
+from common.config import load_config
+from common.io import write_parquet
+from common.labeling import from_panel, to_panel
+from common.paths import PROJECT_ROOT
+from common.range_vol import range_volatility
+from common.timealign import normalize_session_dates
+from pipelines.make_labels import load_market_prices
+
+
+def compute_range_vol_features(prices: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Range-based volatility features for every ticker in one vectorized pass.
+
+    Output: one row per (ticker, date) bar with `<estimator>_<w>d` columns.
+    """
+    cols = cfg["columns"]
+    rv_cfg = cfg["range_vol"]
+
+    ohlc = [cols["open"], cols["high"], cols["low"], cols["close"]]
+    prices = prices[["ticker", "date"] + ohlc].copy()
+    prices["date"] = normalize_session_dates(prices["date"]).to_numpy()
+
+    tickers, dates, panels = to_panel(prices, ohlc)
+    close = panels[cols["close"]]
+
+    features = range_volatility(
+        panels[cols["open"]],
+        panels[cols["high"]],
+        panels[cols["low"]],
+        close,
+        windows=rv_cfg.get("windows", [5, 10, 20]),
+        estimators=rv_cfg.get("estimators", ["parkinson", "garman_klass", "rogers_satchell", "yang_zhang"]),
+        min_periods_frac=float(rv_cfg.get("min_periods_frac", 0.75)),
+        annualize=bool(rv_cfg.get("annualize", True)),
+        trading_days_per_year=int(rv_cfg.get("trading_days_per_year", 252)),
+    )
+
+    return from_panel(tickers, dates, features, mask=~pd.isna(close))
+
+
+@instrument.traced("market_features")
+@profiling.profiled
+def build_market_features(config_name: str = "market.yaml") -> Dict[str, Any]:
+    """
+    Entry point: write range-vol features to the processed market folder.
+    """
+    cfg = load_config(config_name)["market_features"]
+    run = load_config("run.yaml")
+    symbols = run.get("universe", {}).get("ticker_symbols") or [None]
+
+    prices = load_market_prices(cfg["input"]["market_data"], default_ticker=symbols[0])
+
+    t0 = time.perf_counter()
+    features = compute_range_vol_features(prices, cfg)
+    elapsed = time.perf_counter() - t0
+
+    output_path = PROJECT_ROOT / Path(cfg["output"]["processed_dir"]) / cfg["output"]["feature_table"]
+    write_parquet(features, output_path)
+    instrument.rows("market_features", rows_in=len(prices), rows_out=len(features))
+    print(f"Range-vol features: {len(features)} rows, {features.shape[1] - 2} columns in {elapsed:.3f}s -> {output_path}")
+
+    return {"output": str(output_path), "rows": len(features), "seconds": elapsed}
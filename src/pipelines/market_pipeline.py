@@ -6,6 +6,7 @@ from typing import Any, Dict, List
 
 from apis.market_data import get_ticker_daily
 from apis.vix_data import get_vix_data
+from common import instrument, profiling
 
 
 OUTPUT_DIR = Path("data/processed/market")
@@ -13,6 +14,8 @@ STOCK_OUTPUT_PATH = OUTPUT_DIR / "stock_data.xlsx"
 VIX_OUTPUT_PATH = OUTPUT_DIR / "vix_data.xlsx"
 
 
+@instrument.traced("market")
+@profiling.profiled
 def run_market_pipeline(
     ticker_symbol: str,
     start_date: str,
@@ -38,6 +41,7 @@ def run_market_pipeline(
 
     # Convert to DataFrames for Excel output
     stock_df = pd.DataFrame(stock_data)
+    stock_df.insert(0, "ticker", ticker_symbol.upper())
     vix_df = pd.DataFrame(vix_data)
 
     # Strip timezone info from datetime columns (Excel doesn't support tz-aware datetimes)
@@ -51,6 +55,7 @@ def run_market_pipeline(
     stock_df.to_excel(STOCK_OUTPUT_PATH, index=False, engine="openpyxl")
     vix_df.to_excel(VIX_OUTPUT_PATH, index=False, engine="openpyxl")
 
+    instrument.rows("market", rows_out=len(stock_df) + len(vix_df))
     return {
         "stock_output": str(STOCK_OUTPUT_PATH),
         "vix_output": str(VIX_OUTPUT_PATH),
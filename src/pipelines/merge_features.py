@@ -1,5 +1,209 @@
-def merge_all_features():
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+from common import instrument, profiling
+from common.config import load_config
+from common.io import read_parquet, write_parquet
+from common.paths import PROJECT_ROOT
+
+_DAY_OFFSET = 1 << 31   # keeps day numbers before 1970 non-negative inside the key
+
+
+# --------------------------------------------------
+# Compact (ticker, date) keys
+# --------------------------------------------------
+def _local_codes(col: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Per-table ticker codes + their labels (free for categorical columns)."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(), pd.Index(col.cat.categories)
+    codes, uniques = pd.factorize(col)
+    return codes, pd.Index(uniques)
+
+
+def _day_numbers(col: pd.Series) -> np.ndarray:
+    days = pd.to_datetime(col).to_numpy().astype("datetime64[D]")
+    return days.astype(np.int64)
+
+
+def encode_keys(codes: np.ndarray, days: np.ndarray) -> np.ndarray:
     """
-    Entry point for merging vader + finbert features.
+    int64 key per row: ticker code in the high 32 bits, day number in the low 32.
+
+    Ordering by key == ordering by (ticker, date); no string key is built per row.
     """
-    print("Merge pipeline invoked")
+    return (codes.astype(np.int64) << 32) | (days + _DAY_OFFSET)
+
+
+def decode_keys(keys: np.ndarray, categories: pd.Index) -> Tuple[pd.Categorical, np.ndarray]:
+    codes = (keys >> 32).astype(np.int32)
+    days = (keys & 0xFFFFFFFF) - _DAY_OFFSET
+    return pd.Categorical.from_codes(codes, categories=categories), days.astype("datetime64[D]").astype("datetime64[ns]")
+
+
+def _sorted_keys(keys: np.ndarray, name: str) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(keys, kind="stable")
+    sk = keys[order]
+    if len(sk) > 1 and (sk[1:] == sk[:-1]).any():
+        raise ValueError(f"Duplicate (ticker, date) keys in {name}")
+    return sk, order
+
+
+# --------------------------------------------------
+# Merge
+# --------------------------------------------------
+def merge_frames(
+    frames: Dict[str, pd.DataFrame],
+    *,
+    keys: Tuple[str, str] = ("ticker", "date"),
+    how: str = "inner",
+    prefixes: Dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Sorted merge-join of several (ticker, date) tables on compact int64 keys.
+
+    how="inner" keeps keys present in every table; how="left" keeps every key
+    of the first table (missing values become NaN). Non-key columns get the
+    table's prefix from `prefixes` (if any).
+    """
+    if how not in ("inner", "left"):
+        raise ValueError(f"Unsupported join: {how}")
+
+    ticker_col, date_col = keys
+    prefixes = prefixes or {}
+    names = list(frames)
+
+    # Hash each table's tickers once, then remap local codes onto the shared
+    # sorted category set through the (small) table of unique tickers
+    local = {name: _local_codes(df[ticker_col]) for name, df in frames.items()}
+    categories = pd.Index([])
+    for _, uniques in local.values():
+        categories = categories.union(uniques)
+    categories = categories.sort_values()
+
+    sorted_keys: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for name, df in frames.items():
+        codes, uniques = local[name]
+        if (codes < 0).any():
+            raise ValueError(f"Missing {ticker_col} values in {name}")
+        shared = categories.get_indexer(uniques)[codes]
+        sorted_keys[name] = _sorted_keys(encode_keys(shared, _day_numbers(df[date_col])), name)
+
+    if how == "inner":
+        out_keys = sorted_keys[names[0]][0]
+        for name in names[1:]:
+            out_keys = np.intersect1d(out_keys, sorted_keys[name][0], assume_unique=True)
+    else:
+        out_keys = sorted_keys[names[0]][0]
+
+    tickers, dates = decode_keys(out_keys, categories)
+    columns: Dict[str, Any] = {ticker_col: tickers, date_col: dates}
+
+    for name, df in frames.items():
+        sk, order = sorted_keys[name]
+        if len(sk):
+            pos = np.minimum(np.searchsorted(sk, out_keys), len(sk) - 1)
+            found = sk[pos] == out_keys
+            rows = order[pos]
+        else:
+            found = np.zeros(len(out_keys), dtype=bool)
+            rows = None
+
+        prefix = prefixes.get(name, "")
+        for col in df.columns:
+            if col in keys:
+                continue
+            if rows is None:
+                columns[f"{prefix}{col}"] = np.full(len(out_keys), np.nan)
+                continue
+
+            values = df[col].to_numpy()[rows]
+            if not found.all():
+                # Unmatched rows of a left join become missing
+                values = values.astype(np.float64 if values.dtype.kind in "iubf" else object)
+                values[~found] = np.nan
+            columns[f"{prefix}{col}"] = values
+
+    return pd.DataFrame(columns)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _arrow_pool() -> Optional[Any]:
+    """pyarrow's default memory pool (None when pyarrow is not installed)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    return pa.default_memory_pool()
+
+
+@instrument.traced("merge")
+@profiling.profiled
+def merge_all_features(config_name: str = "ensemble.yaml") -> Dict[str, Any]:
+    """
+    Entry point for merging vader + finbert features with labels.
+    """
+    cfg = load_config(config_name)["ensemble"]
+    inputs = cfg["inputs"]
+    join = cfg.get("join", {})
+    keys = tuple(join.get("keys", ["ticker", "date"]))
+
+    # Arrow buffers (parquet reads) live outside the Python allocator, so the
+    # Arrow pool peak and the process RSS peak are reported rather than
+    # tracemalloc, which sees neither and slows the merge down. The Arrow
+    # fields are left out when pyarrow is not installed.
+    pool = _arrow_pool()
+    t0 = time.perf_counter()
+
+    frames = {name: read_parquet(PROJECT_ROOT / path) for name, path in inputs.items()}
+    rows_in = {name: len(df) for name, df in frames.items()}
+
+    merged = merge_frames(
+        frames,
+        keys=keys,
+        how=join.get("how", "inner"),
+        prefixes={"vader_features": "vader_", "finbert_features": "finbert_"},
+    )
+
+    elapsed = time.perf_counter() - t0
+
+    out_path = PROJECT_ROOT / Path(cfg["output"]["merged_dir"]) / cfg["output"]["merged_table"]
+    write_parquet(merged, out_path)
+    instrument.rows("merge", rows_in=sum(rows_in.values()), rows_out=len(merged))
+
+    report = {
+        "output": str(out_path),
+        "rows_in": rows_in,
+        "rows_out": len(merged),
+        "columns": merged.shape[1],
+        "peak_rss_mb": _peak_rss_mb(),
+        "seconds": round(elapsed, 3),
+    }
+    if pool is not None:
+        arrow_peak = pool.max_memory()
+        report["arrow_peak_mb"] = round(arrow_peak / 2**20, 1) if arrow_peak and arrow_peak > 0 else None
+        report["arrow_allocated_mb"] = round(pool.bytes_allocated() / 2**20, 1)
+    print(
+        f"Merged {rows_in} -> {report['rows_out']} rows x {report['columns']} cols "
+        f"(peak RSS {report['peak_rss_mb']} MB, Arrow peak {report.get('arrow_peak_mb')} MB, {report['seconds']}s) -> {out_path}"
+    )
+    return report
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import hashlib
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from common.neardup import cluster_near_duplicates
+
+# Yahoo news row identity and near-duplicate grouping. Kept free of model
+# imports so reports over the raw dumps run without torch / transformers.
+NEWS_RAW_DIR = Path("data/raw/news")
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def latest_yahoo_jsonl(raw_dir: Path) -> Path:
+    files = sorted(raw_dir.glob("yahoo_news_*.jsonl"))
+    if not files:
+        raise FileNotFoundError(f"No yahoo_news_*.jsonl found in {raw_dir.resolve()}")
+    return files[-1]
+
+
+def get_permalink(row: Dict[str, Any]) -> str:
+    return row.get("permalink") or row.get("link") or row.get("url") or row.get("article_url") or ""
+
+
+def make_yahoo_row_id(row: Dict[str, Any], ticker: str) -> str:
+    permalink = get_permalink(row)
+
+    # Use permalink as the stable unique base (best)
+    base = permalink
+
+    # Fallback if permalink missing
+    if not base:
+        title = (row.get("title") or "").strip()
+        summary = (row.get("description") or row.get("summary") or "").strip()
+        base = title + "|" + summary
+
+    h = hashlib.sha1(base.encode("utf-8")).hexdigest()[:10]  # 8–12 chars is fine
+    return f"yahoo:{h}:{ticker}"
+
+
+def merged_text(row: Dict[str, Any]) -> str:
+    title = (row.get("title") or "").strip()
+    desc = (row.get("description") or row.get("summary") or "").strip()
+    body = (row.get("text") or "").strip()
+    return " ".join([t for t in [title, desc, body] if t])
+
+
+def link_hash(row: Dict[str, Any]) -> str:
+    # Ticker-independent part of the row id, used to label near-duplicate clusters
+    return make_yahoo_row_id(row, "").rsplit(":", 2)[1]
+
+
+def group_representatives(rows: List[Dict[str, Any]], texts: List[str], threshold: float) -> tuple[List[int], int]:
+    """
+    Map every row to the index of the row whose FinBERT score it reuses.
+
+    Rows sharing a link (the same article fetched under several tickers) are
+    collapsed first; only one text per link goes through near-duplicate
+    clustering. Returns (representative index per row, number of distinct links).
+    """
+    link_keys = [link_hash(r) for r in rows]
+    first_by_link: Dict[str, int] = {}
+    for i, key in enumerate(link_keys):
+        first_by_link.setdefault(key, i)
+
+    uniq = list(first_by_link.values())
+    uniq_reps = cluster_near_duplicates([texts[i] for i in uniq], threshold=threshold)
+    rep_by_link = {link_keys[i]: uniq[int(r)] for i, r in zip(uniq, uniq_reps)}
+
+    return [rep_by_link[key] for key in link_keys], len(uniq)
+
+
+def near_duplicate_report(input_path: Optional[Path] = None, *, threshold: float = 0.8) -> Dict[str, Any]:
+    """
+    Count how many FinBERT calls link de-duplication and near-duplicate
+    clustering save on a news dump (no model inference is run).
+    """
+    input_path = input_path or latest_yahoo_jsonl(NEWS_RAW_DIR)
+    rows = list(iter_jsonl(input_path))
+    reps, n_links = group_representatives(rows, [merged_text(r) for r in rows], threshold)
+
+    n_rows = len(rows)
+    n_clusters = len(set(reps))
+    return {
+        "input": str(input_path),
+        "articles": n_rows,
+        "distinct_links": n_links,
+        "clusters": n_clusters,
+        "inference_saved": n_rows - n_clusters,
+        "inference_saved_pct": round(100.0 * (n_rows - n_clusters) / n_rows, 1) if n_rows else 0.0,
+    }
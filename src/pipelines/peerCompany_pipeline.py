@@ -1,4 +1,5 @@
-from apis.ollama_data import get_peer_tickers
+from apis.ollama_data import get_peer_tickers, load_cached_result, save_cached_result
+from common import instrument, profiling
 from common.paths import INTERIM_DATA_DIR  # Base path for interim (cached) data artifacts
 import json, os
 from collections import Counter
@@ -7,10 +8,13 @@ from collections import Counter
 # --------------------------------------------------
 # Build keywords for a list of tickers
 # --------------------------------------------------
+@instrument.traced("peer_companies")
+@profiling.profiled
 def build_peerCompanies(
         tickers: list[str],
         k: int = 5,
-        runs: int = 30
+        runs: int = 30,
+        use_cache: bool = True
 ) -> dict[str, list[str]]:
     result = {}
 
@@ -20,13 +24,20 @@ def build_peerCompanies(
     print(f"LLM runs per ticker: {runs}\n")
 
     for t in tickers:
+        # Reuse the aggregated result until it expires (skips the LLM entirely)
+        cached = load_cached_result("peers", t, k, runs) if use_cache else None
+        if cached is not None:
+            print(f"\nUsing cached peer companies for {t}: {cached}")
+            result[t] = cached
+            continue
+
         print(f"\nGenerating peer companies for ticker: {t}")
         counter = Counter()
 
         for i in range(runs):
             print(f"  Run {i + 1}/{runs} for {t}...")
 
-            peers = get_peer_tickers(t, k=k)
+            peers = get_peer_tickers(t, k=k, sample=i)
             print(f"    Returned: {peers}")
 
             # normalize
@@ -37,6 +48,9 @@ def build_peerCompanies(
         print(f"\nFinal selected peer companies for {t}: {top_peers}")
         result[t] = top_peers
 
+        if top_peers:
+            save_cached_result("peers", t, k, runs, top_peers)
+
     print("\nPeer company generation complete.\n")
 
     return result
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import json
-import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List
@@ -12,6 +11,8 @@ from apis.social_data import (
     fetch_subreddit_new,
     write_jsonl,
 )
+from common import instrument, profiling
+from common.keyword_matcher import KeywordMatcher
 
 
 @dataclass
@@ -36,13 +37,8 @@ def _load_keywords_map(path: Path) -> Dict[str, List[str]]:
     return {str(k): [str(x) for x in (v or [])] for k, v in data.items()}
 
 
-def _compile_keyword_regex(ticker: str, keywords: List[str]) -> re.Pattern:
-    terms = [ticker, f"${ticker}"] + keywords
-    escaped = [re.escape(t) for t in terms if t]
-    pattern = r"(" + r"|".join(escaped) + r")"
-    return re.compile(pattern, flags=re.IGNORECASE)
-
-
+@instrument.traced("reddit_social")
+@profiling.profiled
 def run_reddit_social_pipeline(
     run_cfg: Dict[str, Any],
     *,
@@ -95,33 +91,33 @@ def run_reddit_social_pipeline(
     raw_pool = dedupe_rows(raw_pool, key="id")
 
     # 2) Build CLEAN rows
-    processed_rows: List[Dict[str, Any]] = []
-
-    for ticker in tickers:
-        kws = (kw_map.get(ticker, []) or [])[:keyword_count]
-        rx = _compile_keyword_regex(ticker, kws)
-
-        matched_count = 0
+    # One automaton over every ticker's terms; each post is scanned once and
+    # yields the first matched term per ticker.
+    matcher = KeywordMatcher.for_tickers(
+        {ticker: (kw_map.get(ticker, []) or [])[:keyword_count] for ticker in tickers}
+    )
+    rows_by_ticker: Dict[str, List[Dict[str, Any]]] = {ticker: [] for ticker in tickers}
 
-        for r in raw_pool:
-            text = (r.get("text") or "").strip()
-            if not text:
-                continue
+    for r in raw_pool:
+        text = (r.get("text") or "").strip()
+        if not text:
+            continue
 
-            m = rx.search(text)
-            if not m:
+        for ticker, term in matcher.first_matches(text).items():
+            ticker_rows = rows_by_ticker[ticker]
+            if len(ticker_rows) >= cfg.max_posts_per_ticker:
                 continue
 
             source_id = r.get("id")
             row_id = f"reddit:{source_id}:{ticker}"  # unique row id
 
-            processed_rows.append(
+            ticker_rows.append(
                 {
                     "id": row_id,
                     "source_id": source_id,
                     "platform": "reddit",
                     "ticker": ticker,
-                    "matched_term": m.group(1),
+                    "matched_term": term,
                     "subreddit": r.get("subreddit"),
                     "author": r.get("author"),
                     "created_utc": r.get("created_utc"),
@@ -136,11 +132,11 @@ def run_reddit_social_pipeline(
                 }
             )
 
-            matched_count += 1
-            if matched_count >= cfg.max_posts_per_ticker:
-                break
+    # Keep the ticker-major row order of the output file
+    processed_rows: List[Dict[str, Any]] = [row for ticker in tickers for row in rows_by_ticker[ticker]]
 
     write_jsonl(processed_rows, str(output_path))
+    instrument.rows("reddit_social", rows_in=len(raw_pool), rows_out=len(processed_rows))
 
     if verbose_print_urls:
         print("\n=== Reddit scrape URLs ===")
@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import ast
+import fnmatch
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from common import instrument
+from common.config import load_config
+from common.paths import INTERIM_DATA_DIR, PROJECT_ROOT, REPORTS_DIR
+
+STATE_PATH = INTERIM_DATA_DIR / "pipeline" / "state.json"
+SRC_DIR = PROJECT_ROOT / "src"
+LOG_DIR = REPORTS_DIR / "pipeline"
+STATE_VERSION = 1
+
+
+# --------------------------------------------------
+# Stage graph
+# --------------------------------------------------
+@dataclass
+class Stage:
+    """
+    One script of the pipeline with the files it reads and writes.
+
+    Paths are relative to the project root and may be globs. `deps` is
+    filled by build_graph from matching outputs / inputs plus `after`.
+    """
+    name: str
+    script: str
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    args: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+    deps: List[str] = field(default_factory=list)
+
+
+def load_stages(cfg: Dict[str, Any]) -> Dict[str, Stage]:
+    stages = {}
+    for name, s in (cfg.get("stages") or {}).items():
+        stages[name] = Stage(
+            name=name,
+            script=s["script"],
+            inputs=list(s.get("inputs") or []),
+            outputs=list(s.get("outputs") or []),
+            args=[str(a) for a in s.get("args") or []],
+            after=list(s.get("after") or []),
+        )
+    return stages
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """Whether two path patterns can name the same file."""
+    return a == b or fnmatch.fnmatchcase(a, b) or fnmatch.fnmatchcase(b, a)
+
+
+def build_graph(stages: Dict[str, Stage]) -> List[str]:
+    """
+    Fill every stage's `deps` and return the stage names in topological order
+    (ties keep config order). Raises ValueError on unknown `after` targets,
+    outputs claimed by two stages, or cycles.
+    """
+    for s in stages.values():
+        for other in s.after:
+            if other not in stages:
+                raise ValueError(f"Stage {s.name!r}: unknown stage in after: {other!r}")
+
+    names = list(stages)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            clash = [o for o in stages[a].outputs if any(_overlaps(o, p) for p in stages[b].outputs)]
+            if clash:
+                raise ValueError(f"Stages {a!r} and {b!r} both write {clash[0]!r}")
+
+    for s in stages.values():
+        producers = [
+            p.name for p in stages.values()
+            if p.name != s.name and any(_overlaps(i, o) for i in s.inputs for o in p.outputs)
+        ]
+        s.deps = [n for n in names if n in producers or n in s.after]
+
+    order: List[str] = []
+    done: set = set()
+    while len(order) < len(names):
+        ready = [n for n in names if n not in done and all(d in done for d in stages[n].deps)]
+        if not ready:
+            raise ValueError(f"Cycle between stages: {sorted(set(names) - done)}")
+        order += ready
+        done.update(ready)
+    return order
+
+
+def upstream(stages: Dict[str, Stage], targets: Iterable[str]) -> List[str]:
+    """`targets` and every stage they (transitively) depend on, in config order."""
+    keep: set = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in stages:
+            raise KeyError(f"Unknown stage: {name!r} (known: {', '.join(stages)})")
+        if name not in keep:
+            keep.add(name)
+            todo += stages[name].deps
+    return [n for n in stages if n in keep]
+
+
+def waves(stages: Dict[str, Stage], order: Sequence[str]) -> Dict[str, int]:
+    """Earliest round each stage can start in; stages of one wave are independent."""
+    level: Dict[str, int] = {}
+    for n in order:
+        level[n] = 1 + max((level[d] for d in stages[n].deps if d in level), default=0)
+    return level
+
+
+# --------------------------------------------------
+# Fingerprints
+# --------------------------------------------------
+def _expand(pattern: str) -> List[Path]:
+    if any(c in pattern for c in "*?["):
+        return sorted(p for p in PROJECT_ROOT.glob(pattern) if p.is_file())
+    p = PROJECT_ROOT / pattern
+    return [p] if p.is_file() else []
+
+
+class FileHasher:
+    """
+    sha1 of file contents, cached by (size, mtime) so unchanged files are
+    not re-read between runs. The cache lives in the runner state file.
+    """
+
+    def __init__(self, cache: Optional[Dict[str, List[Any]]] = None) -> None:
+        self.cache: Dict[str, List[Any]] = dict(cache or {})
+
+    def __call__(self, path: Path) -> str:
+        rel = path.relative_to(PROJECT_ROOT).as_posix()
+        st = path.stat()
+        hit = self.cache.get(rel)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.cache[rel] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+
+# Imported module names per source file, keyed by (path, mtime)
+_IMPORTS: Dict[Tuple[Path, int], List[str]] = {}
+
+
+def _imported_modules(path: Path, package: str) -> List[str]:
+    """
+    Dotted names of every module `path` imports anywhere in its body (also
+    inside functions). For `from x import y` both x and x.y are listed,
+    since y may be a submodule; names that are not modules simply do not
+    resolve to a file later.
+    """
+    key = (path, path.stat().st_mtime_ns)
+    if key not in _IMPORTS:
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        except (SyntaxError, UnicodeDecodeError):
+            tree = ast.Module(body=[], type_ignores=[])
+        names: List[str] = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names += [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    parts = package.split(".") if package else []
+                    parts = parts[:len(parts) - (node.level - 1)] if node.level > 1 else parts
+                    base = ".".join([*parts, base] if base else parts)
+                names.append(base)
+                names += [f"{base}.{a.name}" if base else a.name for a in node.names if a.name != "*"]
+        _IMPORTS[key] = [n for n in names if n]
+    return _IMPORTS[key]
+
+
+def _module_files(name: str, roots: Sequence[Path]) -> List[Path]:
+    """Files a module name loads from the first root that has it: parent package __init__s + the module."""
+    parts = name.split(".")
+    for root in roots:
+        target = root.joinpath(*parts)
+        module = target.with_suffix(".py") if target.with_suffix(".py").is_file() else target / "__init__.py"
+        if module.is_file():
+            inits = [root.joinpath(*parts[:i], "__init__.py") for i in range(1, len(parts))]
+            return [p for p in inits if p.is_file()] + [module]
+    return []
+
+
+def source_files(script: Path) -> List[Path]:
+    """
+    Project source files `script` runs: the transitive closure of its
+    imports that resolve under its own folder or src/ (third-party and
+    standard library modules are not followed).
+    """
+    roots = [script.parent, SRC_DIR]
+    seen = {script}
+    todo = [script]
+    while todo:
+        path = todo.pop()
+        root = next((r for r in roots if path.is_relative_to(r)), script.parent)
+        package = ".".join(path.relative_to(root).parent.parts) if path != script else ""
+        for name in _imported_modules(path, package):
+            for dep in _module_files(name, roots):
+                if dep not in seen:
+                    seen.add(dep)
+                    todo.append(dep)
+    return sorted(seen - {script})
+
+
+def stage_fingerprint(stage: Stage, hasher: FileHasher) -> str:
+    """
+    Hash of the stage's script, args, the contents of all its inputs and of
+    every project module the script (transitively) imports.
+    """
+    files = {}
+    for pattern in [stage.script, *stage.inputs]:
+        files[pattern] = {p.relative_to(PROJECT_ROOT).as_posix(): hasher(p) for p in _expand(pattern)}
+    script = PROJECT_ROOT / stage.script
+    sources = {p.relative_to(PROJECT_ROOT).as_posix(): hasher(p) for p in source_files(script)} if script.is_file() else {}
+    blob = json.dumps({"script": stage.script, "args": stage.args, "files": files, "sources": sources}, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def missing_outputs(stage: Stage) -> List[str]:
+    return [o for o in stage.outputs if not _expand(o)]
+
+
+def _read_state(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"version": STATE_VERSION, "stages": {}, "files": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "stages": {}, "files": {}}
+    return state
+
+
+def _write_state(path: Path, state: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _reason(stage: Stage, fingerprint: str, state: Dict[str, Any], force: Iterable[str]) -> Optional[str]:
+    """Why the stage has to run, or None when it is up to date."""
+    if stage.name in force:
+        return "forced"
+    last = state["stages"].get(stage.name)
+    if last is None:
+        return "never run"
+    if last.get("fingerprint") != fingerprint:
+        return "inputs changed"
+    missing = missing_outputs(stage)
+    if missing:
+        return f"missing {missing[0]}"
+    return None
+
+
+# --------------------------------------------------
+# Plan (dry run)
+# --------------------------------------------------
+def plan(
+    stages: Dict[str, Stage],
+    order: Sequence[str],
+    state: Dict[str, Any],
+    hasher: FileHasher,
+    *,
+    force: Iterable[str] = (),
+) -> Dict[str, Optional[str]]:
+    """
+    {stage: reason or None} against the files on disk now.
+
+    Downstream of a stage that runs is reported as "upstream runs"; the real
+    run re-fingerprints after upstream finishes, so a stage whose inputs come
+    out byte-identical is still skipped.
+    """
+    force = set(force)
+    reasons: Dict[str, Optional[str]] = {}
+    for name in order:
+        s = stages[name]
+        reason = _reason(s, stage_fingerprint(s, hasher), state, force)
+        if reason is None and any(reasons.get(d) for d in s.deps):
+            reason = "upstream runs"
+        reasons[name] = reason
+    return reasons
+
+
+def print_plan(stages: Dict[str, Stage], order: Sequence[str], reasons: Dict[str, Optional[str]]) -> None:
+    level = waves(stages, order)
+    width = max(len(n) for n in order)
+    for n in sorted(order, key=lambda n: (level[n], order.index(n))):
+        deps = ", ".join(stages[n].deps) or "-"
+        status = f"RUN   ({reasons[n]})" if reasons[n] else "skip  (up to date)"
+        print(f"  wave {level[n]}  {n:<{width}}  {status:<32} after: {deps}")
+    n_run = sum(1 for r in reasons.values() if r)
+    print(f"{n_run} of {len(order)} stages would run, in {max(level.values(), default=0)} waves")
+
+
+# --------------------------------------------------
+# Execution
+# --------------------------------------------------
+def _run_stage(stage: Stage, log_path: Path) -> Tuple[int, float]:
+    """Run one script from the project root, output to its log file."""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [sys.executable, stage.script, *stage.args],
+            cwd=PROJECT_ROOT,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+    return proc.returncode, time.perf_counter() - t0
+
+
+def _tail(path: Path, n: int = 10) -> str:
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return ""
+    return "\n".join(f"    | {line}" for line in lines[-n:])
+
+
+def run_pipeline(
+    config_name: str = "pipeline.yaml",
+    *,
+    targets: Optional[Sequence[str]] = None,
+    force: Sequence[str] = (),
+    n_jobs: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the stage graph of configs/pipeline.yaml.
+
+    `targets` limits the run to those stages and their upstream; `force`
+    runs stages even when up to date ("all" forces every stage). A stage
+    starts as soon as all of its upstream stages are done, with up to n_jobs
+    scripts running at once. Skipping is decided right before a stage would
+    start, from the fingerprint of its inputs at that moment. A failed stage
+    blocks its downstream but not independent branches.
+
+    Returns {stage: {"status", "reason", "seconds"}}; status is one of
+    ran / skipped / failed / blocked (or planned in a dry run).
+    """
+    cfg = load_config(config_name)["pipeline"]
+    stages = load_stages(cfg)
+    order = build_graph(stages)
+    if targets:
+        keep = set(upstream(stages, targets))
+        order = [n for n in order if n in keep]
+    force = set(order) if "all" in force else set(force)
+    unknown = force - set(stages)
+    if unknown:
+        raise KeyError(f"Unknown stage in force: {sorted(unknown)}")
+
+    state_path = PROJECT_ROOT / cfg["state"] if cfg.get("state") else STATE_PATH
+    log_dir = PROJECT_ROOT / cfg["log_dir"] if cfg.get("log_dir") else LOG_DIR
+    state = _read_state(state_path)
+    hasher = FileHasher(state.get("files"))
+
+    if dry_run:
+        reasons = plan(stages, order, state, hasher, force=force)
+        print_plan(stages, order, reasons)
+        return {n: {"status": "planned" if reasons[n] else "skipped", "reason": reasons[n], "seconds": 0.0} for n in order}
+
+    n_jobs = max(1, n_jobs or int(cfg.get("n_jobs") or os.cpu_count() or 1))
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = list(order)
+    running: Dict[Any, Tuple[str, str, str]] = {}
+    t0 = time.perf_counter()
+
+    def finish(name: str, status: str, reason: Optional[str], seconds: float = 0.0) -> None:
+        results[name] = {"status": status, "reason": reason, "seconds": round(seconds, 3)}
+        instrument.count("pipeline_stages", stage=name, status=status)
+        if status in ("ran", "failed"):
+            instrument.observe("stage_seconds", seconds, stage=name)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                s = stages[name]
+                deps = [d for d in s.deps if d in order]
+                if any(d not in results for d in deps):
+                    continue
+                pending.remove(name)
+
+                bad = [d for d in deps if results[d]["status"] in ("failed", "blocked")]
+                if bad:
+                    finish(name, "blocked", f"{bad[0]} did not finish")
+                    print(f"[blocked] {name} ({bad[0]} did not finish)")
+                    continue
+
+                fingerprint = stage_fingerprint(s, hasher)
+                reason = _reason(s, fingerprint, state, force)
+                if reason is None:
+                    finish(name, "skipped", None)
+                    print(f"[skip]    {name} (up to date)")
+                    continue
+
+                print(f"[start]   {name} ({reason})")
+                fut = pool.submit(_run_stage, s, log_dir / f"{name}.log")
+                running[fut] = (name, fingerprint, reason)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, fingerprint, reason = running.pop(fut)
+                log_path = log_dir / f"{name}.log"
+                try:
+                    code, seconds = fut.result()
+                except OSError as e:
+                    code, seconds = -1, 0.0
+                    print(f"  could not start {stages[name].script}: {e}")
+
+                if code == 0 and not missing_outputs(stages[name]):
+                    finish(name, "ran", reason, seconds)
+                    state["stages"][name] = {
+                        "fingerprint": fingerprint,
+                        "seconds": round(seconds, 3),
+                        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    }
+                    print(f"[done]    {name} in {seconds:.1f}s")
+                else:
+                    why = f"exit code {code}" if code else f"did not write {missing_outputs(stages[name])[0]}"
+                    finish(name, "failed", why, seconds)
+                    state["stages"].pop(name, None)
+                    print(f"[FAILED]  {name}: {why} (log: {log_path})\n{_tail(log_path)}")
+
+                state["files"] = hasher.cache
+                _write_state(state_path, state)
+
+    counts = {k: sum(1 for r in results.values() if r["status"] == k) for k in ("ran", "skipped", "failed", "blocked")}
+    print(
+        f"Pipeline finished in {time.perf_counter() - t0:.1f}s: "
+        + ", ".join(f"{v} {k}" for k, v in counts.items())
+    )
+    state["files"] = {k: v for k, v in hasher.cache.items() if (PROJECT_ROOT / k).exists()}
+    _write_state(state_path, state)
+    return {n: results[n] for n in order}
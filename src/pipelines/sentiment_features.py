@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from common import instrument
+from common.daily_aggregates import AGGREGATES_DIR, NEG_THRESHOLD, POS_THRESHOLD, DailyAggregates
+from common.io import write_parquet
+from common.labeling import cumulative, window_total
+from common.paths import PROJECT_ROOT
+from common.timealign import normalize_session_dates
+from evaluation.diagnostics import update_drift
+
+
+# --------------------------------------------------
+# Business-day grid
+# --------------------------------------------------
+def _day_numbers(values: pd.Series) -> np.ndarray:
+    return pd.to_datetime(values).to_numpy().astype("datetime64[D]")
+
+
+def _grid(tickers: pd.Series, days: np.ndarray) -> tuple[np.ndarray, pd.Index, np.ndarray, int]:
+    """
+    Flat ticker x business-day cell index per row.
+
+    Weekend days (only possible without session alignment) fall into the
+    next business day's slot, same as a session roll-forward.
+    """
+    codes, uniques = pd.factorize(tickers, sort=True)
+    start = days.min()
+    day_idx = np.busday_count(start, days)
+    n_days = int(day_idx.max()) + 1
+    return codes * n_days + day_idx, pd.Index(uniques), np.busday_offset(start, np.arange(n_days), roll="forward"), n_days
+
+
+def _to_long(panels: Dict[str, np.ndarray], tickers: pd.Index, days: np.ndarray, mask: np.ndarray) -> pd.DataFrame:
+    ti, di = np.nonzero(mask)
+    out: Dict[str, object] = {
+        "ticker": pd.Categorical.from_codes(ti, categories=tickers),
+        "date": days[di].astype("datetime64[ns]"),
+    }
+    for name, p in panels.items():
+        out[name] = p[ti, di]
+    return pd.DataFrame(out)
+
+
+# --------------------------------------------------
+# Per-(ticker, day) sufficient statistics
+# --------------------------------------------------
+def daily_sufficient_stats(
+    scored: pd.DataFrame,
+    *,
+    fields: Sequence[str] = ("compound",),
+    score_field: str = "compound",
+    ticker_col: str = "ticker",
+    day_col: str = "session_date",
+) -> pd.DataFrame:
+    """
+    n, n_pos, n_neg and <field>_sum / <field>_sumsq per (ticker, day).
+
+    One np.bincount per statistic over a flat ticker x day cell index; no
+    per-group Python work. These sums are all the feature stage needs.
+    """
+    df = scored.dropna(subset=[ticker_col, day_col, score_field])
+    if df.empty:
+        return pd.DataFrame(columns=["ticker", "date", "n", "n_pos", "n_neg"])
+
+    cell, tickers, days, n_days = _grid(df[ticker_col], _day_numbers(df[day_col]))
+    size = len(tickers) * n_days
+    shape = (len(tickers), n_days)
+
+    score = df[score_field].to_numpy(dtype=np.float64)
+    panels = {
+        "n": np.bincount(cell, minlength=size).reshape(shape).astype(np.float64),
+        "n_pos": np.bincount(cell, weights=(score > POS_THRESHOLD), minlength=size).reshape(shape),
+        "n_neg": np.bincount(cell, weights=(score < NEG_THRESHOLD), minlength=size).reshape(shape),
+    }
+    for f in fields:
+        x = df[f].to_numpy(dtype=np.float64)
+        panels[f"{f}_sum"] = np.bincount(cell, weights=x, minlength=size).reshape(shape)
+        panels[f"{f}_sumsq"] = np.bincount(cell, weights=x * x, minlength=size).reshape(shape)
+
+    return _to_long(panels, tickers, days, panels["n"] > 0)
+
+
+# --------------------------------------------------
+# Features from sufficient statistics
+# --------------------------------------------------
+def _moments(n: np.ndarray, s: np.ndarray, ss: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s / n
+        var = np.maximum(ss - s * mean, 0.0) / (n - 1)
+    mean[n == 0] = np.nan
+    var[n < 2] = np.nan
+    return mean, np.sqrt(var)
+
+
+def _polarity(n: np.ndarray, n_pos: np.ndarray, n_neg: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """share_pos, share_neg and disagreement sqrt(1 - B^2), B = (pos - neg) / (pos + neg)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share_pos = n_pos / n
+        share_neg = n_neg / n
+        b = (n_pos - n_neg) / (n_pos + n_neg)
+        dispersion = np.sqrt(np.maximum(1.0 - b * b, 0.0))
+    dispersion[(n_pos + n_neg) == 0] = np.nan
+    return share_pos, share_neg, dispersion
+
+
+def features_from_daily(
+    daily: pd.DataFrame,
+    *,
+    fields: Sequence[str] = ("compound",),
+    score_field: str = "compound",
+    windows: Iterable[int] = (3, 5, 20),
+) -> pd.DataFrame:
+    """
+    Per-(ticker, day) features plus trailing-window versions.
+
+    Daily: n, <field>_mean for every field, <score>_std, dispersion,
+    share_pos, share_neg. For each window w (business days): n_<w>d,
+    <score>_mean_<w>d, <score>_std_<w>d, dispersion_<w>d, share_pos_<w>d,
+    share_neg_<w>d, pooled over every row in the window.
+
+    All statistics are stacked and cumulated once; each window is two slices.
+    A row is emitted for every day with at least one row in its largest window.
+    """
+    windows = sorted({int(w) for w in windows})
+    if daily.empty:
+        return pd.DataFrame(columns=["ticker", "date"])
+
+    cell, tickers, days, n_days = _grid(daily["ticker"], _day_numbers(daily["date"]))
+    size = len(tickers) * n_days
+    shape = (len(tickers), n_days)
+
+    stat_names: List[str] = ["n", "n_pos", "n_neg"]
+    for f in fields:
+        stat_names += [f"{f}_sum", f"{f}_sumsq"]
+
+    # bincount (not assignment) so rows sharing a business-day slot add up
+    stats = np.stack([
+        np.bincount(cell, weights=daily[name].to_numpy(dtype=np.float64), minlength=size).reshape(shape)
+        for name in stat_names
+    ])
+    idx = {name: i for i, name in enumerate(stat_names)}
+
+    def features(s: np.ndarray, suffix: str) -> Dict[str, np.ndarray]:
+        n = s[idx["n"]]
+        out: Dict[str, np.ndarray] = {f"n{suffix}": n}
+        for f in (fields if not suffix else [score_field]):
+            mean, std = _moments(n, s[idx[f"{f}_sum"]], s[idx[f"{f}_sumsq"]])
+            out[f"{f}_mean{suffix}"] = mean
+            if f == score_field:
+                out[f"{f}_std{suffix}"] = std
+        share_pos, share_neg, dispersion = _polarity(n, s[idx["n_pos"]], s[idx["n_neg"]])
+        out[f"dispersion{suffix}"] = dispersion
+        out[f"share_pos{suffix}"] = share_pos
+        out[f"share_neg{suffix}"] = share_neg
+        return out
+
+    panels = features(stats, "")
+    cs, _ = cumulative(stats)
+    mask = None
+    for w in windows:
+        win = window_total(cs, w)
+        panels.update(features(win, f"_{w}d"))
+        mask = win[idx["n"]] > 0
+
+    return _to_long(panels, tickers, days, mask if mask is not None else stats[idx["n"]] > 0)
+
+
+def build_sentiment_features(
+    scored: pd.DataFrame,
+    *,
+    fields: Sequence[str] = ("compound",),
+    windows: Iterable[int] = (3, 5, 20),
+    ticker_col: str = "ticker",
+    day_col: str = "session_date",
+) -> pd.DataFrame:
+    """Scored rows -> per-(ticker, day) features (sufficient stats, then features)."""
+    fields = list(fields)
+    daily = daily_sufficient_stats(scored, fields=fields, score_field=fields[0], ticker_col=ticker_col, day_col=day_col)
+    return features_from_daily(daily, fields=fields, score_field=fields[0], windows=windows)
+
+
+# --------------------------------------------------
+# Feature tables
+# --------------------------------------------------
+def load_scored_rows(path: Path, fields: Sequence[str]) -> pd.DataFrame:
+    """
+    Scored JSONL -> (id, ticker, day, fields...) frame.
+
+    `day` is the row's session_date, falling back to its calendar date for
+    rows scored before session alignment existed.
+    """
+    records: List[Dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return pd.DataFrame(columns=["id", "ticker", "day", *fields])
+
+    day = normalize_session_dates(df["session_date"]) if "session_date" in df else pd.Series(pd.NaT, index=df.index)
+    if "date" in df:
+        day = day.fillna(normalize_session_dates(df["date"]))
+
+    out = pd.DataFrame({
+        "id": df["id"] if "id" in df else None,
+        "ticker": df["ticker"].where(df["ticker"] != ""),
+        "day": day,
+    })
+    for f in fields:
+        out[f] = pd.to_numeric(df[f], errors="coerce") if f in df else np.nan
+    return out
+
+
+def write_feature_table(scored_path: Path, section: Dict[str, Any], *, name: str) -> Dict[str, Any]:
+    """
+    Build and write the feature table described by a vader.yaml / finbert.yaml
+    section (aggregation.sentiment_fields / windows / daily_table,
+    output.feature_table).
+
+    New scored rows are folded into the materialized (ticker, session day)
+    table first; features are then derived from its sufficient statistics
+    instead of the full scored history. With a `drift` section, the same new
+    rows (and new feature days) also update the drift monitor.
+    """
+    agg = section.get("aggregation", {})
+    if agg.get("time_bucket", "1D") != "1D":
+        raise ValueError(f"Unsupported time_bucket: {agg.get('time_bucket')} (only 1D)")
+
+    fields = list(agg.get("sentiment_fields", ["compound"]))
+    windows = agg.get("windows", [3, 5, 20])
+    table_path = PROJECT_ROOT / agg["daily_table"] if agg.get("daily_table") else AGGREGATES_DIR / f"{name}_features"
+
+    with instrument.span("features.ingest", source=name):
+        scored = load_scored_rows(scored_path, fields)
+        table = DailyAggregates.load(table_path, fields=fields, key_col="ticker")
+        new = table.new_rows(scored, day_col="day", id_col="id") if section.get("drift") else None
+        update = table.ingest(scored, day_col="day", id_col="id")
+        table.save(table_path)
+
+    with instrument.span("features.build", source=name):
+        features = features_from_daily(table.frame(), fields=table.fields, score_field=table.score_field, windows=windows)
+        out_path = PROJECT_ROOT / section["output"]["processed_dir"] / section["output"]["feature_table"]
+        write_parquet(features, out_path)
+
+    drift: Dict[str, Any] = {}
+    if new is not None:
+        with instrument.span("features.drift", source=name):
+            drift = update_drift(section["drift"], name=name, scored=scored[new], features=features, score_field=table.score_field)
+
+    instrument.rows(f"{name}_features", rows_in=len(scored), rows_out=len(features))
+    # Rows already folded into the daily table are cache hits
+    instrument.count("cache_lookups", update["rows_skipped"], cache=f"{name}_daily_table", result="hit")
+    instrument.count("cache_lookups", update["rows_ingested"], cache=f"{name}_daily_table", result="miss")
+
+    return {
+        "input": str(scored_path),
+        "output": str(out_path),
+        "daily_table": str(table_path),
+        "rows_in": len(scored),
+        **update,
+        "rows_out": len(features),
+        "tickers": int(features["ticker"].nunique()) if len(features) else 0,
+        **drift,
+    }
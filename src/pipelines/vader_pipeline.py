@@ -2,8 +2,13 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
+from common import instrument, profiling
+from common.config import load_config
+from common.paths import PROJECT_ROOT
+from common.timealign import session_dates_iso
+from pipelines.sentiment_features import write_feature_table
 from models.vader.model import score_vader
 
 
@@ -32,22 +37,44 @@ def _write_jsonl(path: Path, rows: Iterable[Dict[str, Any]]) -> int:
     return n
 
 
-def run_vader_on_reddit_posts() -> Dict[str, Any]:
+@instrument.traced("vader.score")
+@profiling.profiled
+def run_vader_on_reddit_posts(run_cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Score the clean Reddit rows with VADER.
+
+    The social pipeline emits one row per (post, ticker) match, so a post is
+    scored once (keyed by source_id) and its scores are fanned out to all of
+    its ticker rows. `session_date` is the trading session each post can
+    affect (posts after the close roll to the next session, see run.yaml).
+    """
+    run_cfg = run_cfg or load_config("run.yaml")
+    scores_by_source: Dict[str, Dict[str, float]] = {}
+
+    rows: List[Dict[str, Any]] = list(_iter_jsonl(INPUT_PATH))
+    sessions = session_dates_iso([r.get("created_utc") for r in rows], run_cfg)
 
     def scored_rows() -> Iterator[Dict[str, Any]]:
-        for row in _iter_jsonl(INPUT_PATH):
+        for row, session_date in zip(rows, sessions):
             text = row.get("text", "")
             row_id = row.get("id")
             match_term = row.get("matched_term")
             date = row.get("date_utc")
             permalink = row.get("permalink")
 
-            scores = score_vader(text)
+            # Fall back to the text itself when a row has no source_id
+            key = row.get("source_id") or text
+            scores = scores_by_source.get(key)
+            if scores is None:
+                with instrument.timer("model_batch_seconds", model="vader"):
+                    scores = scores_by_source[key] = score_vader(text)
 
             yield {
                 "id": row_id,
+                "ticker": row.get("ticker"),
                 "match_term": match_term,
                 "date": date,
+                "session_date": session_date,
                 "neg": scores["neg"],
                 "neu": scores["neu"],
                 "pos": scores["pos"],
@@ -56,9 +83,34 @@ def run_vader_on_reddit_posts() -> Dict[str, Any]:
             }
 
     n_written = _write_jsonl(OUTPUT_PATH, scored_rows())
+    instrument.rows("vader.score", rows_in=len(rows), rows_out=n_written)
+    # Rows that reuse an already scored post
+    instrument.count("cache_lookups", n_written - len(scores_by_source), cache="vader_scores", result="hit")
+    instrument.count("cache_lookups", len(scores_by_source), cache="vader_scores", result="miss")
 
     return {
         "input": str(INPUT_PATH),
         "output": str(OUTPUT_PATH),
         "rows_written": n_written,
-    }
\ No newline at end of file
+        "texts_scored": len(scores_by_source),
+    }
+
+
+@instrument.traced("vader.features")
+@profiling.profiled
+def build_vader_features(config_name: str = "vader.yaml") -> Dict[str, Any]:
+    """
+    Per-(ticker, day) VADER features (counts, mean/std, dispersion, polarity
+    shares and their trailing-window versions) from the scored rows.
+    """
+    cfg = load_config(config_name)["vader"]
+    report = write_feature_table(PROJECT_ROOT / OUTPUT_PATH, cfg, name="vader")
+    print(
+        f"VADER features: +{report['rows_ingested']} new rows "
+        f"({report['cells_updated']} day cells updated, {report['cells_added']} added) "
+        f"-> {report['rows_out']} (ticker, day) rows -> {report['output']}"
+    )
+    if "drift_report" in report:
+        pooled = ", ".join(report["drift_pooled"]) or "none"
+        print(f"VADER drift: {report['drift_flags']} flagged (ticker, series), pooled: {pooled} -> {report['drift_report']}")
+    return report
@@ -3,7 +3,8 @@ import os
 from datetime import date, timedelta
 
 from apis.news_data import fetch_yahoo_news
-from apis.ollama_data import get_peer_tickers
+from apis.ollama_data import get_peer_tickers, load_cached_result
+from common import instrument, profiling
 from common.paths import NEWS_RAW_DATA_DIR
 
 
@@ -11,7 +12,12 @@ from common.paths import NEWS_RAW_DATA_DIR
 # Expand base tickers using Ollama peer tickers
 # --------------------------------------------------
 def expand_tickers_with_peers(base_tickers: list[str], peer_k: int = 6) -> list[str]:
-    """Return a de-duplicated list of base tickers plus Ollama-derived peer tickers."""
+    """
+    Return a de-duplicated list of base tickers plus Ollama-derived peer tickers.
+
+    Peers aggregated by build_peerCompanies (peertickers.json) are reused from
+    the Ollama result cache; the LLM is only queried when none are cached.
+    """
     seen = set()
     out = []
 
@@ -22,7 +28,11 @@ def expand_tickers_with_peers(base_tickers: list[str], peer_k: int = 6) -> list[
             seen.add(t)
             out.append(t)
 
-        for p in get_peer_tickers(t, k=peer_k):
+        peers = load_cached_result("peers", t, peer_k)
+        if peers is None:
+            peers = get_peer_tickers(t, k=peer_k)
+
+        for p in peers:
             p = p.upper()
             if p not in seen:
                 seen.add(p)
@@ -34,6 +44,8 @@ def expand_tickers_with_peers(base_tickers: list[str], peer_k: int = 6) -> list[
 # --------------------------------------------------
 # Fetch and save Yahoo news for tickers in a date range
 # --------------------------------------------------
+@instrument.traced("yahoo_news")
+@profiling.profiled
 def fetch_and_save_yahoo_news(
     base_tickers: list[str],
     peer_tickers: list[str],
@@ -72,6 +84,7 @@ def fetch_and_save_yahoo_news(
     out_path = os.path.join(out_dir, filename)
 
     # Fetch per ticker and write one JSON object per line (JSONL)
+    n_rows = 0
     with open(out_path, "w", encoding="utf-8") as f:
         for t in tickers_used:
             rows = fetch_yahoo_news(
@@ -82,5 +95,7 @@ def fetch_and_save_yahoo_news(
             )
             for row in rows:
                 f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            n_rows += len(rows)
 
+    instrument.rows("yahoo_news", rows_out=n_rows)
     return out_path, tickers_used